@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# tbot, Embedded Automation Tool
+# Copyright (C) 2026  Harald Seiler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Compare the boot profiles of boards across tbot runs.
+
+Reads the ``["board", "boot-profile", ...]`` events from one or more logfiles
+and prints a table with the time of each boot milestone (or with ``--phases``,
+the duration of each phase) per boot.  The first boot is the baseline; later
+boots which are slower than the baseline by at least ``--threshold`` seconds
+are highlighted.
+"""
+import argparse
+import sys
+import typing
+
+import logparser
+
+
+class Profile(typing.NamedTuple):
+    label: str
+    board: str
+    milestones: typing.Dict[str, float]
+    phases: typing.Dict[str, float]
+
+
+def read_profiles(filenames: typing.List[str]) -> typing.Iterator[Profile]:
+    """Collect all boot profiles from the given logfiles."""
+    for filename in filenames:
+        count = 0
+        for ev in logparser.logfile(filename):
+            if ev.type[:2] != ["board", "boot-profile"]:
+                continue
+            count += 1
+            milestones = dict(
+                sorted(ev.data["milestones"].items(), key=lambda item: item[1])
+            )
+            phases = {p["name"]: p["duration"] for p in ev.data["phases"]}
+            yield Profile(f"{filename}#{count}", ev.type[2], milestones, phases)
+
+
+def table(
+    profiles: typing.List[Profile], key: str, threshold: float, color: bool
+) -> typing.Iterator[str]:
+    """Render a comparison table with one column per boot."""
+    names: typing.List[str] = []
+    for profile in profiles:
+        for name in getattr(profile, key):
+            if name not in names:
+                names.append(name)
+
+    yield f"{'':24}" + "".join(f"{i:>12}" for i in range(len(profiles)))
+    baseline = getattr(profiles[0], key)
+    for name in names:
+        cells = []
+        for profile in profiles:
+            value = getattr(profile, key).get(name)
+            if value is None:
+                cells.append(f"{'-':>12}")
+                continue
+            base = baseline.get(name)
+            if base is None or value - base < threshold:
+                cells.append(f"{value:12.3f}")
+            elif color:
+                cells.append(f"\x1B[1;31m{value:12.3f}\x1B[0m")
+            else:
+                # Without colors, mark regressions with an asterisk
+                cells.append(f"{value:11.3f}*")
+        yield f"{name:24}" + "".join(cells)
+
+
+def main() -> None:
+    """Compare boot profiles."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("logfiles", nargs="+", help="tbot logfiles")
+    parser.add_argument("--board", help="only show profiles of this board")
+    parser.add_argument(
+        "--phases",
+        action="store_true",
+        help="show the duration of each phase instead of the milestone times",
+    )
+    parser.add_argument(
+        "--threshold",
+        metavar="SECONDS",
+        type=float,
+        default=0.5,
+        help="highlight regressions of at least SECONDS (default: 0.5)",
+    )
+    args = parser.parse_args()
+
+    profiles = [
+        p
+        for p in read_profiles(args.logfiles)
+        if args.board is None or p.board == args.board
+    ]
+    if profiles == []:
+        sys.stderr.write("No boot profiles found.\n")
+        sys.exit(1)
+
+    color = sys.stdout.isatty()
+    for board in sorted({p.board for p in profiles}):
+        board_profiles = [p for p in profiles if p.board == board]
+        print(f"# {board}")
+        for i, profile in enumerate(board_profiles):
+            print(f"#  {i}: {profile.label}")
+        key = "phases" if args.phases else "milestones"
+        for line in table(board_profiles, key, args.threshold, color):
+            print(line)
+        print()
+
+
+if __name__ == "__main__":
+    main()
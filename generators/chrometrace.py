@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# tbot, Embedded Automation Tool
+# Copyright (C) 2026  Harald Seiler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Generate a Chrome Trace Event file.
+
+The resulting JSON can be opened in ``chrome://tracing`` or in Perfetto
+(https://ui.perfetto.dev) to look at a tbot run as a timeline.  Testcases,
+commands, and spans (machine initialization phases and, with
+``--trace-channel``, channel waits) are shown with their durations.
+"""
+import json
+import typing
+
+import logparser
+
+PID = 1
+TID = 1
+
+
+def us(seconds: float) -> int:
+    """Convert seconds to the microseconds used by the trace format."""
+    return int(seconds * 1_000_000)
+
+
+def trace_event(
+    ev: logparser.LogEvent,
+) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """Convert a log event into a trace event (or ``None`` to drop it)."""
+    base = {"pid": PID, "tid": TID}
+
+    if ev.type == ["tc", "begin"]:
+        return {
+            **base,
+            "ph": "B",
+            "cat": "testcase",
+            "name": ev.data["name"],
+            "ts": us(ev.time),
+        }
+    elif ev.type == ["tc", "end"]:
+        args = {"success": ev.data["success"], "skipped": ev.data.get("skipped", False)}
+        return {**base, "ph": "E", "cat": "testcase", "ts": us(ev.time), "args": args}
+    elif ev.type[0] == "cmd":
+        name = f"[{ev.type[1]}] {ev.data['cmd']}"
+        if "start" not in ev.data:
+            return {
+                **base,
+                "ph": "i",
+                "s": "t",
+                "cat": "command",
+                "name": name,
+                "ts": us(ev.time),
+            }
+        return {
+            **base,
+            "ph": "X",
+            "cat": "command",
+            "name": name,
+            "ts": us(ev.data["start"]),
+            "dur": us(ev.time - ev.data["start"]),
+        }
+    elif ev.type[0] == "span":
+        args = {
+            k: v for k, v in ev.data.items() if k not in ("name", "start", "duration")
+        }
+        return {
+            **base,
+            "ph": "X",
+            "cat": ev.type[1],
+            "name": ev.data["name"],
+            "ts": us(ev.data["start"]),
+            "dur": us(ev.data["duration"]),
+            "args": args,
+        }
+    elif ev.type[0] == "board":
+        name = f"board {' '.join(ev.type[1:])}"
+        return {
+            **base,
+            "ph": "i",
+            "s": "p",
+            "cat": "board",
+            "name": name,
+            "ts": us(ev.time),
+        }
+    elif ev.type[0] == "exception":
+        name = f"exception: {ev.data['name']}"
+        return {
+            **base,
+            "ph": "i",
+            "s": "p",
+            "cat": "exception",
+            "name": name,
+            "ts": us(ev.time),
+        }
+
+    return None
+
+
+def main() -> None:
+    """Generate a Chrome Trace Event file."""
+    log = logparser.from_argv()
+
+    # Write the trace event by event so arbitrarily large logs can be converted.
+    print('{"displayTimeUnit": "ms", "traceEvents": [')
+    print(
+        json.dumps(
+            {"pid": PID, "ph": "M", "name": "process_name", "args": {"name": "tbot"}}
+        ),
+        end="",
+    )
+    for ev in log:
+        tev = trace_event(ev)
+        if tev is not None:
+            print(",\n" + json.dumps(tev), end="")
+    print("\n]}")
+
+
+if __name__ == "__main__":
+    main()
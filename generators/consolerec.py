@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# tbot, Embedded Automation Tool
+# Copyright (C) 2026  Harald Seiler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Render a raw console recording (``newbot --record-console``) as a timeline.
+
+Each line shows the time since the start of the recording, the time since
+the previous record, the direction (``<`` received, ``>`` sent, ``#``
+marker), and the data.  Pauses longer than ``--gap`` seconds are highlighted,
+which makes late prompts and slow echoes easy to spot.
+"""
+import argparse
+import json
+import struct
+import sys
+import typing
+
+MAGIC = b"TBOTREC 1 "
+RECORD = struct.Struct("<dcI")
+
+DIRECTIONS = {b"r": "<", b"t": ">", b"m": "#"}
+
+
+class Record(typing.NamedTuple):
+    time: float
+    kind: bytes
+    data: bytes
+
+
+def read_recording(
+    f: typing.BinaryIO,
+) -> typing.Tuple[typing.Dict[str, typing.Any], typing.Iterator[Record]]:
+    """Parse a recording into its header and an iterator over its records."""
+    header_line = f.readline()
+    if not header_line.startswith(MAGIC):
+        raise ValueError("not a tbot console recording")
+    header = json.loads(header_line[len(MAGIC) :])
+
+    def records() -> typing.Iterator[Record]:
+        while True:
+            raw = f.read(RECORD.size)
+            if len(raw) < RECORD.size:
+                # A truncated record at the end means tbot was killed while
+                # writing.  Just stop there.
+                return
+            t, kind, length = RECORD.unpack(raw)
+            data = f.read(length)
+            yield Record(t, kind, data)
+
+    return header, records()
+
+
+def escape(data: bytes) -> str:
+    """Show data as text with control characters made visible."""
+    text = data.decode("utf-8", errors="backslashreplace")
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\r", "\\r")
+        .replace("\n", "\\n")
+        .replace("\x1b", "\\e")
+        .replace("\t", "\\t")
+    )
+
+
+def render(
+    records: typing.Iterable[Record], gap: typing.Optional[float], merge: float
+) -> typing.Iterator[str]:
+    """
+    Render records as lines of text.
+
+    Consecutive records of the same direction which are less than ``merge``
+    seconds apart are shown as one line.
+    """
+    last_time = 0.0
+    pending: typing.Optional[Record] = None
+    pending_delta = 0.0
+
+    def line(rec: Record, delta: float) -> str:
+        direction = DIRECTIONS.get(rec.kind, "?")
+        return f"{rec.time:12.6f} {delta:+10.6f} {direction} {escape(rec.data)}"
+
+    for rec in records:
+        if (
+            pending is not None
+            and rec.kind == pending.kind
+            and rec.kind != b"m"
+            and rec.time - last_time < merge
+        ):
+            pending = Record(pending.time, pending.kind, pending.data + rec.data)
+            last_time = rec.time
+            continue
+
+        if pending is not None:
+            yield line(pending, pending_delta)
+        delta = rec.time - last_time
+        if gap is not None and delta >= gap:
+            yield f"{'':12} --- {delta:.3f} s without activity ---"
+        pending, pending_delta = rec, delta
+        last_time = rec.time
+
+    if pending is not None:
+        yield line(pending, pending_delta)
+
+
+def main() -> None:
+    """Render a raw console recording."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("recording", help="recording file (*.tbotrec)")
+    parser.add_argument(
+        "--gap",
+        metavar="SECONDS",
+        type=float,
+        help="highlight pauses of at least SECONDS",
+    )
+    parser.add_argument(
+        "--merge",
+        metavar="SECONDS",
+        type=float,
+        default=0.01,
+        help="merge chunks in the same direction arriving within SECONDS (default: 0.01)",
+    )
+    args = parser.parse_args()
+
+    with open(args.recording, "rb") as f:
+        header, records = read_recording(f)
+        print(f"# channel of {header.get('name')!r}, started at {header['start']}")
+        for line in render(records, args.gap, args.merge):
+            sys.stdout.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,158 +20,293 @@ Generate an html log.
 
 Create an html representation of the log,
 using U-Boot's python test suite's html log
-generator as a base
+generator as a base.
+
+By default, a single html document is written to stdout.  For very long runs,
+pass ``--split <directory>`` instead:  This writes a lightweight
+``index.html`` with the testcase tree and stores command output in separate
+chunk files which are only loaded by the browser once a block is expanded.
 """
-import sys
-import re
+import argparse
+import json
 import pathlib
+import re
 import string
+import sys
+import typing
+
 import logparser
 
+ANSI_ESCAPES = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
 
-def main() -> None:
-    """Generate an html log."""
+CHUNK_SIZE = 1024 * 1024
+INLINE_LIMIT = 512
+
+
+def escape(text: str) -> str:
+    """Escape text for inclusion in html."""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class InlineOutput:
+    """Put all output directly into the html document."""
+
+    def __call__(self, text: str) -> str:
+        return f"<pre>\n{escape(text)}</pre>"
+
+    def close(self) -> None:
+        pass
+
+
+class ChunkedOutput:
+    """Defer output into chunk files which are loaded lazily by the browser."""
+
+    def __init__(self, directory: pathlib.Path, chunk_size: int = CHUNK_SIZE) -> None:
+        self.directory = directory / "chunks"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.chunk = -1
+        self.chunk_file: typing.Optional[typing.TextIO] = None
+        self.chunk_len = 0
+        self.next_id = 0
+
+    def _open_chunk(self) -> typing.TextIO:
+        if self.chunk_file is None or self.chunk_len >= self.chunk_size:
+            self.close()
+            self.chunk += 1
+            self.chunk_len = 0
+            self.chunk_file = open(self.directory / f"chunk-{self.chunk:04}.js", "w")
+            self.chunk_file.write(f'tbotChunk("{self.chunk:04}", {{\n')
+        return self.chunk_file
+
+    def __call__(self, text: str) -> str:
+        # Small outputs are cheaper to keep inline than to load lazily.
+        if len(text) <= INLINE_LIMIT:
+            return f"<pre>\n{escape(text)}</pre>"
+
+        f = self._open_chunk()
+        output_id = self.next_id
+        self.next_id += 1
+
+        entry = f'"{output_id}": {json.dumps(ANSI_ESCAPES.sub("", text))},\n'
+        f.write(entry)
+        self.chunk_len += len(entry)
+
+        lines = text.count("\n")
+        return (
+            f'<pre class="lazy" id="out-{output_id}" data-chunk="{self.chunk:04}">'
+            + f"&lt;{len(text)} bytes, {lines} lines&gt;</pre>"
+        )
+
+    def close(self) -> None:
+        if self.chunk_file is not None:
+            self.chunk_file.write("});\n")
+            self.chunk_file.close()
+            self.chunk_file = None
+
+
+BOARD_EVENTS = {
+    "on": "BOARD POWER-ON",
+    "off": "BOARD POWER-OFF",
+    "uboot": "BOARD UBOOT START",
+    "linux": "BOARD LINUX BOOT",
+    "uboot-latency": "BOARD UBOOT LATENCY",
+    "boot-profile": "BOARD BOOT PROFILE",
+}
 
-    log = logparser.from_argv()
 
-    # pylint: disable=too-many-return-statements
-    def gen_html(ev: logparser.LogEvent) -> str:
-        """Generate html for a log message."""
-        if ev.type == ["tc", "begin"]:
+def board_event(
+    ev: logparser.LogEvent,
+) -> typing.Tuple[str, typing.Optional[str]]:
+    """Get the title and the text to show for a ``board`` event."""
+    kind = ev.type[1]
+    name = BOARD_EVENTS.get(kind, f"BOARD {kind.upper()}")
+    if len(ev.type) > 2:
+        name += f" ({escape(ev.type[2])})"
+
+    if "output" in ev.data:
+        return name, ev.data["output"]
+    if kind == "uboot-latency":
+        text = f"prompt {ev.data['prompt']:.3f}s after {ev.data['reference']}\n"
+        if "autoboot" in ev.data:
+            text += (
+                f"autoboot {ev.data['autoboot']:.3f}s after {ev.data['reference']}\n"
+            )
+        return name, text
+    if kind == "boot-profile":
+        text = "".join(
+            f"{p['start']:>20} -> {p['name']:<20} {p['duration']:8.3f}s\n"
+            for p in ev.data["phases"]
+        )
+        return name, text + f"{'total':>44} {ev.data['total']:8.3f}s\n"
+    if ev.data:
+        # Board events from newer tbot versions; show whatever they carry.
+        return name, json.dumps(ev.data, indent=2, sort_keys=True) + "\n"
+    return name, None
+
+
+# pylint: disable=too-many-return-statements
+def gen_html(
+    ev: logparser.LogEvent,
+    output: typing.Optional[typing.Callable[[str], str]] = None,
+) -> str:
+    """Generate html for a log message."""
+    if output is None:
+        output = InlineOutput()
+
+    if ev.type == ["tc", "begin"]:
+        return f"""\
+                   <div class="section block">
+                     <div class="section-header block-header">
+                       <span class="testcase">{ev.data['name']}</span>
+                     </div>
+                     <div class="section-content block-content">
+                       """
+    elif ev.type == ["tc", "end"]:
+        if ev.data.get("skipped", False):
             return f"""\
-                       <div class="section block">
-                         <div class="section-header block-header">
-                           <span class="testcase">{ev.data['name']}</span>
+                       <div class="status-skipped">
+                         <pre>Skipped ({ev.data['skip_reason']}),
+Time: {ev.data['duration']:.3f}s</pre>
+                       </div>
+                     </div>
+                   </div>"""
+        if ev.data["success"]:
+            return f"""\
+                       <div class="status-pass">
+                         <pre>OK, Time: {ev.data['duration']:.3f}s</pre>
+                       </div>
+                     </div>
+                   </div>"""
+        return f"""\
+                       <div class="status-fail">
+                         <pre>FAIL, Time: {ev.data['duration']:.3f}s</pre>
+                       </div>
+                     </div>
+                   </div>"""
+    elif ev.type[0] == "cmd":
+        shell_type = f'[<span class="host">{ev.type[1]}</span>]'
+        command = ev.data["cmd"]
+        try:
+            content = output(ev.data["stdout"][:-1])
+        except KeyError:
+            content = "<pre>\n&lt;no output&gt;</pre>"
+        return f"""\
+                       <div class="block">
+                         <div class="block-header">
+                           {shell_type} {command}
                          </div>
-                         <div class="section-content block-content">
-                           """
-        elif ev.type == ["tc", "end"]:
-            if ev.data.get("skipped", False):
-                return f"""\
-                           <div class="status-skipped">
-                             <pre>Skipped ({ev.data['skip_reason']}),
-    Time: {ev.data['duration']:.3f}s</pre>
-                           </div>
+                         <div class="block-content">
+                           {content}
                          </div>
                        </div>"""
-            if ev.data["success"]:
-                return f"""\
-                           <div class="status-pass">
-                             <pre>OK, Time: {ev.data['duration']:.3f}s</pre>
-                           </div>
+    elif ev.type[0] == "board":
+        ev_name, text = board_event(ev)
+        content = output(text) if text is not None else "<pre>\n&lt;no output&gt;</pre>"
+        return f"""\
+                       <div class="block">
+                         <div class="block-header">
+                           -&gt; <b>{ev_name}</b>
+                         </div>
+                         <div class="block-content">
+                           {content}
                          </div>
                        </div>"""
-            return f"""\
-                           <div class="status-fail">
-                             <pre>FAIL, Time: {ev.data['duration']:.3f}s</pre>
+    elif ev.type[0] == "msg":
+        text = escape(ev.data["text"]) + "\n"
+        first_line, message = text.split("\n", maxsplit=1)
+        return f"""\
+                       <div class="block">
+                         <div class="block-header">
+                           Message ({ev.type[1]}): {first_line}
+                         </div>
+                         <div class="block-content">
+                           <pre>
+{text}</pre>
+                           <div class="level-{ev.type[1]}" style="color: #aaa">
+                              <i>Loglevel: {ev.type[1]}</i>
                            </div>
                          </div>
                        </div>"""
-        elif ev.type[0] == "cmd":
-            shell_type = f'[<span class="host">{ev.type[1]}</span>]'
-            command = ev.data["cmd"]
-            try:
-                output = (
-                    ev.data["stdout"][:-1]
-                    .replace("&", "&amp;")
-                    .replace("<", "&lt;")
-                    .replace(">", "&gt;")
-                )
-            except KeyError:
-                output = "&lt;no output&gt;"
-            return f"""\
-                           <div class="block">
-                             <div class="block-header">
-                               {shell_type} {command}
-                             </div>
-                             <div class="block-content">
-                               <pre>
-{output}</pre>
-                             </div>
-                           </div>"""
-        elif ev.type[0] == "board":
-            idx = ["on", "off", "uboot", "linux"].index(ev.type[1])
-
-            ev_name = [
-                "BOARD POWER-ON",
-                "BOARD POWER-OFF",
-                "BOARD UBOOT START",
-                "BOARD LINUX BOOT",
-            ][idx]
-            try:
-                output = (
-                    ev.data["output"]
-                    .replace("&", "&amp;")
-                    .replace("<", "&lt;")
-                    .replace(">", "&gt;")
-                )
-            except KeyError:
-                output = "<no output>"
-            return f"""\
-                           <div class="block">
-                             <div class="block-header">
-                               -&gt; <b>{ev_name}</b>
-                             </div>
-                             <div class="block-content">
-                               <pre>
-{output}</pre>
-                             </div>
-                           </div>"""
-        elif ev.type[0] == "msg":
-            output = (
-                ev.data["text"]
-                .replace("&", "&amp;")
-                .replace("<", "&lt;")
-                .replace(">", "&gt;")
-            ) + "\n"
-            first_line, message = output.split("\n", maxsplit=1)
-            return f"""\
-                           <div class="block">
-                             <div class="block-header">
-                               Message ({ev.type[1]}): {first_line}
-                             </div>
-                             <div class="block-content">
-                               <pre>
-{output}</pre>
-                               <div class="level-{ev.type[1]}" style="color: #aaa">
-                                  <i>Loglevel: {ev.type[1]}</i>
-                               </div>
-                             </div>
-                           </div>"""
-        elif ev.type[0] == "exception":
-            return f"""\
-                           <div class="block">
-                             <div class="block-header">
-                               Exception: {ev.data['name']}
-                             </div>
-                             <div class="block-content">
-                               <pre>
+    elif ev.type[0] == "exception":
+        return f"""\
+                       <div class="block">
+                         <div class="block-header">
+                           Exception: {ev.data['name']}
+                         </div>
+                         <div class="block-content">
+                           <pre>
 {ev.data['trace']}</pre>
-                             </div>
-                           </div>"""
-        elif (
-            ev.type == ["tbot", "end"]
-            or ev.type == ["tbot", "info"]
-            or ev.type[0] == "custom"
-            or ev.type[0] == "doc"
-            or ev.type[0] == "__debug__"
-        ):
-            return ""
-
-        raise Exception(f"Unknown event {ev!r}")
+                         </div>
+                       </div>"""
+    elif (
+        ev.type == ["tbot", "end"]
+        or ev.type == ["tbot", "info"]
+        or ev.type[0] == "custom"
+        or ev.type[0] == "span"
+        or ev.type[0] == "doc"
+        or ev.type[0] == "__debug__"
+    ):
+        return ""
+
+    raise Exception(f"Unknown event {ev!r}")
+
+
+def render(
+    log: typing.Iterable[logparser.LogEvent],
+    out: typing.TextIO,
+    title: str,
+    output: typing.Optional[typing.Callable[[str], str]] = None,
+) -> None:
+    """Render the log page event by event into ``out``."""
+    if output is None:
+        output = InlineOutput()
 
     with open(pathlib.Path(__file__).parent / "template.html") as f:
         template_string = f.read()
 
-    data = {
-        "page_title": f"tbot log: {pathlib.Path(pathlib.Path(sys.argv[1]).stem)}",
-        "content": "\n".join(map(gen_html, log)),
-    }
+    head, tail = template_string.split("${content}", 1)
+    out.write(string.Template(head).safe_substitute(page_title=title))
+    for ev in log:
+        out.write(ANSI_ESCAPES.sub("", gen_html(ev, output)))
+        out.write("\n")
+    out.write(tail)
+
+
+def main() -> None:
+    """Generate an html log."""
+    parser = argparse.ArgumentParser(description="Generate an html log.")
+    parser.add_argument("logfile", help="tbot logfile to render")
+    parser.add_argument(
+        "--split",
+        metavar="DIR",
+        help="write index.html and lazily loaded output chunks into DIR",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="approximate size of each output chunk in bytes",
+    )
+    args = parser.parse_args()
+
+    if not pathlib.Path(args.logfile).is_file():
+        sys.stderr.write(f"\x1B[31mopen failed: {args.logfile!r}\x1B[0m\n")
+        sys.exit(1)
 
-    page = string.Template(template_string).safe_substitute(data)
+    log = logparser.logfile(args.logfile)
+    title = f"tbot log: {pathlib.Path(args.logfile).stem}"
 
-    ansi_escapes = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
-    print(ansi_escapes.sub("", page))
+    if args.split is None:
+        render(log, sys.stdout, title)
+    else:
+        directory = pathlib.Path(args.split)
+        chunked = ChunkedOutput(directory, args.chunk_size)
+        try:
+            with open(directory / "index.html", "w") as f:
+                render(log, f, title, chunked)
+        finally:
+            chunked.close()
 
 
 if __name__ == "__main__":
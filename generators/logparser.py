@@ -40,8 +40,19 @@ READ_SIZE = 8192
 Log = typing.Generator[LogEvent, None, None]
 
 
-def logfile(filename: str) -> Log:
-    """Parse a logfile."""
+def _resolve_spills(
+    data: typing.Dict[str, typing.Any], base: pathlib.Path
+) -> typing.Dict[str, typing.Any]:
+    """Load event data which was spilled into separate files."""
+    for key, value in data.items():
+        if isinstance(value, dict) and set(value.keys()) == {"spill", "length"}:
+            data[key] = (base / value["spill"]).read_text()
+    return data
+
+
+def _events(
+    filename: str,
+) -> typing.Generator[typing.Dict[str, typing.Any], None, None]:
     with open(filename, "r") as f:
         buf = f.read(READ_SIZE)
 
@@ -58,11 +69,30 @@ def logfile(filename: str) -> Log:
                     buf = buf.lstrip()
                 continue
 
-            yield LogEvent(raw_ev)
+            yield raw_ev
 
             buf = buf[idx:].lstrip()
 
 
+def logfile(filename: str) -> Log:
+    """
+    Parse a logfile.
+
+    If ``filename`` is the manifest of a rotated log, all segments are parsed
+    in order.  Event data which was spilled into separate files is loaded
+    transparently.
+    """
+    base = pathlib.Path(filename).parent
+    for raw_ev in _events(filename):
+        if "segments" in raw_ev and "type" not in raw_ev:
+            for segment in raw_ev["segments"]:
+                yield from logfile(str(base / segment))
+            return
+
+        raw_ev["data"] = _resolve_spills(raw_ev["data"], base)
+        yield LogEvent(raw_ev)
+
+
 def from_argv() -> Log:
     """Read logfile from location specified on commandline."""
     try:
@@ -0,0 +1,60 @@
+"""
+Microbenchmark for the per-event overhead of tbot's logging.
+
+Run it from the repository root:
+
+    python3 selftest/bench_log.py [-n ITERATIONS]
+
+It measures emitting a command event with a bit of output, once for each
+verbosity level and once with a logfile being written.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tbot import log, log_event  # noqa: E402
+
+OUTPUT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n" * 4
+
+
+def emit() -> None:
+    ev = log_event.command("bench", "cat /tmp/lorem-ipsum.txt")
+    ev.write(OUTPUT)
+    ev.data["stdout"] = ev.getvalue()
+    ev.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("-n", type=int, default=20000, help="iterations per run")
+    args = parser.parse_args()
+
+    runs = [(v.name, v, False) for v in log.Verbosity] + [
+        ("QUIET + logfile", log.Verbosity.QUIET, True)
+    ]
+
+    results = []
+    for name, verbosity, with_logfile in runs:
+        sink = io.StringIO()
+        old_logfile = log.LOGFILE
+        log.LOGFILE = io.StringIO() if with_logfile else None
+        try:
+            with contextlib.redirect_stdout(sink), log.with_verbosity(verbosity):
+                t = min(timeit.repeat(emit, number=args.n, repeat=3))
+        finally:
+            log.LOGFILE = old_logfile
+        results.append((name, t / args.n * 1e6))
+
+    print(f"{args.n} events per run")
+    for name, usec in results:
+        print(f"{name:>16}: {usec:8.2f} µs/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ import testmachines
 def tbot_context() -> Iterator[tbot.Context]:
     tbot.log.VERBOSITY = tbot.log.Verbosity.STDOUT
     tbot.log.NESTING = 1
+    # Keep board facts of the mock hardware out of the user's cache
+    tbot.machine.board.facts.CACHE_FILE = None
     with tbot.Context(keep_alive=True, reset_on_error_by_default=True) as ctx:
         testmachines.register_machines(ctx)
 
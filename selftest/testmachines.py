@@ -224,6 +224,167 @@ class MocksshClient(connector.SSHConnector, linux.Bash, tbot.role.Role):
         self.exec0("mkdir", self.workdir)
 
 
+# Receiving side of `loadx`/`loady` and `crc32` for the mock board.  Memory is
+# a sparse file.  A file `mockhw-load-fail` containing `nak:N`, `abort:N`, or
+# `corrupt:N` makes the next transfer reject, abort, or silently corrupt data
+# block N.
+MOCKHW_LOAD = """\
+import binascii, os, select, sys, termios, tty, zlib
+
+mode, mem = sys.argv[1:3]
+addr = int(sys.argv[3], 16)
+
+if mode == "crc32":
+    size = int(sys.argv[4], 16)
+    data = b""
+    if os.path.exists(mem):
+        with open(mem, "rb") as f:
+            f.seek(addr)
+            data = f.read(size)
+    print(f"{zlib.crc32(data.ljust(size, bytes(1))):08x}")
+    sys.exit(0)
+
+if mode in ("md", "mw"):
+    width = int(sys.argv[5])
+    if mode == "md":
+        size = int(sys.argv[4], 16) * width
+        data = b""
+        if os.path.exists(mem):
+            with open(mem, "rb") as f:
+                f.seek(addr)
+                data = f.read(size)
+        data = data.ljust(size, bytes(1))
+        for i in range(0, size, 16):
+            line = data[i : i + 16]
+            values = [
+                int.from_bytes(line[j : j + width], "little")
+                for j in range(0, len(line), width)
+            ]
+            text = "".join(chr(c) if 0x20 <= c < 0x7F else "." for c in line)
+            hexvalues = "".join(f" {v:0{2 * width}x}" for v in values)
+            print(f"{addr + i:08x}:{hexvalues}    {text}")
+    else:
+        value = int(sys.argv[4], 16).to_bytes(width, "little")
+        count = int(sys.argv[6], 16) if len(sys.argv) > 6 else 1
+        with open(mem, "r+b" if os.path.exists(mem) else "wb") as f:
+            f.seek(addr)
+            f.write(value * count)
+    sys.exit(0)
+
+fail = None
+failfile = os.path.join(os.path.dirname(mem), "mockhw-load-fail")
+if os.path.exists(failfile):
+    with open(failfile) as f:
+        kind, block = f.read().strip().split(":")
+    fail = (kind, int(block))
+    os.unlink(failfile)
+
+print(f"## Ready for binary ({mode}) download to 0x{addr:08X} at 115200 bps...")
+sys.stdout.flush()
+
+old = termios.tcgetattr(0)
+tty.setraw(0)
+
+
+def getc(timeout):
+    r, _, _ = select.select([0], [], [], timeout)
+    return os.read(0, 1)[0] if r else None
+
+
+def read(n):
+    buf = b""
+    while len(buf) < n:
+        r, _, _ = select.select([0], [], [], 2)
+        if not r:
+            break
+        buf += os.read(0, n - len(buf))
+    return buf
+
+
+def put(c):
+    os.write(1, bytes([c]))
+
+
+def finish(msg, code):
+    # Consume any trailing data
+    while getc(0.3) is not None:
+        pass
+    termios.tcsetattr(0, termios.TCSAFLUSH, old)
+    print(msg)
+    sys.exit(code)
+
+
+expected = 0 if mode == "ymodem" else 1
+started = False
+size = None
+data = bytearray()
+put(ord("C"))
+while True:
+    c = getc(1.0)
+    if c is None:
+        put(ord("C") if not started else 0x15)
+        continue
+    started = True
+    if c == 0x18:
+        finish("## Binary download aborted", 1)
+    if c == 0x04:
+        put(0x06)
+        if mode == "ymodem":
+            put(ord("C"))
+            getc(2)
+            read(2 + 128 + 2)
+            put(0x06)
+        break
+    if c not in (0x01, 0x02):
+        continue
+
+    length = 128 if c == 0x01 else 1024
+    packet = read(2 + length + 2)
+    num, payload = packet[0], packet[2 : 2 + length]
+    if (
+        len(packet) != 2 + length + 2
+        or num + packet[1] != 255
+        or binascii.crc_hqx(payload, 0) != int.from_bytes(packet[-2:], "big")
+    ):
+        put(0x15)
+        continue
+
+    if num == (expected - 1) & 0xFF:
+        put(0x06)
+        continue
+    if num != expected & 0xFF:
+        put(0x18)
+        finish("## Wrong block", 1)
+
+    if fail is not None and fail[1] == expected:
+        kind, fail = fail[0], None
+        if kind == "nak":
+            put(0x15)
+            continue
+        if kind == "corrupt":
+            payload = bytes([payload[0] ^ 0xFF]) + payload[1:]
+        else:
+            os.write(1, b"\\x18\\x18\\x18")
+            finish("## Binary download aborted", 1)
+
+    if expected == 0:
+        size = int(payload.split(b"\\0")[1].split(b" ")[0])
+        put(0x06)
+        put(ord("C"))
+    else:
+        data += payload
+        put(0x06)
+    expected += 1
+
+if size is not None:
+    data = data[:size]
+with open(mem, "r+b" if os.path.exists(mem) else "wb") as f:
+    f.seek(addr)
+    f.write(data)
+finish(f"## Total Size      = 0x{len(data):08x} = {len(data)} Bytes", 0)
+"""
+
+
 class MockhwBoard(
     connector.ConsoleConnector,
     machine.PreConnectInitializer,
@@ -239,8 +400,10 @@ class MockhwBoard(
         self.host.exec0("rm", "-rf", workdir)
         self.host.exec0("mkdir", workdir)
         self._mockhw_script = workdir / "mockhw-script.sh"
+        (workdir / "mockhw-load.py").write_text(MOCKHW_LOAD)
         self._mockhw_script.write_text(
-            """\
+            f"MOCKHW_DIR={workdir.at_host(self.host)}\n"
+            + """\
 # This script "simulates" a serial session with a board.
 
 # Make sure nothing enters the history
@@ -266,7 +429,9 @@ function version() {
 }
 function printenv() {
     if [ $# = 0 ]; then
-        set | grep -E '^U'
+        (set -o posix; set) | grep -E '^(U|[a-z])' | sed "s/'//g"
+        echo ""
+        echo "Environment size: 1234/8188 bytes"
     else
         set | grep "$1" | sed "s/'//g"
     fi
@@ -274,12 +439,39 @@ function printenv() {
 function setenv() {
     local var="$1"
     shift
-    eval "$var=\\"$*\\""
+    if [ $# = 0 ]; then
+        unset "$var"
+    else
+        eval "$var=\\"$*\\""
+    fi
+}
+function bdinfo() {
+    echo "boot_params = 0x00000000"
+    echo "DRAM bank   = 0x00000000"
+    echo "-> start    = 0x40000000"
+    echo "-> size     = 0x20000000"
 }
 function crc32() {
     printf "crc32 for %s ... %s ==> " "$1" "$1"
     sleep 0.2
-    echo "deadb33f"
+    python3 "$MOCKHW_DIR/mockhw-load.py" crc32 "$MOCKHW_DIR/mockhw-mem" "$1" "$2"
+}
+function _mem() {
+    python3 "$MOCKHW_DIR/mockhw-load.py" "$1" "$MOCKHW_DIR/mockhw-mem" "$3" "$4" "$2" "${5:-1}"
+}
+function md.b() { _mem md 1 "$@"; }
+function md.w() { _mem md 2 "$@"; }
+function md.l() { _mem md 4 "$@"; }
+function md.q() { _mem md 8 "$@"; }
+function mw.b() { _mem mw 1 "$@"; }
+function mw.w() { _mem mw 2 "$@"; }
+function mw.l() { _mem mw 4 "$@"; }
+function mw.q() { _mem mw 8 "$@"; }
+function loadx() {
+    python3 "$MOCKHW_DIR/mockhw-load.py" xmodem "$MOCKHW_DIR/mockhw-mem" "$1"
+}
+function loady() {
+    python3 "$MOCKHW_DIR/mockhw-load.py" ymodem "$MOCKHW_DIR/mockhw-mem" "$1"
 }
 function boot() {
     echo "Pretending to boot Linux..."
@@ -291,6 +483,55 @@ function boot() {
     echo ""
 
     # Now undo the U-Boot hacks and make this look like a Linux
+    PS1="bash@target-linux$ "
+    unset -f printenv
+    unset -f setenv
+    unset -f version
+}
+function boot_nopw() {
+    echo "Pretending to boot Linux without a password..."
+    read -p "Please press Enter to activate this console."
+    read -p "login: "
+    echo "[    1.234567] random: crng init done"
+
+    PS1="bash@target-linux$ "
+    unset -f printenv
+    unset -f setenv
+    unset -f version
+}
+function boot_login_loop() {
+    echo "Pretending to boot Linux, asking for the username forever..."
+    read -p "Please press Enter to activate this console."
+    while true; do
+        read -p "login: "
+    done
+}
+function boot_lastlogin() {
+    echo "Pretending to boot Linux with a last-login banner..."
+    read -p "Please press Enter to activate this console."
+    read -p "login: "
+    read -s -p "password: "
+    echo ""
+    echo "Last login: Mon Oct 19 12:00:00 2026 on ttyS0"
+    sleep 0.2
+
+    PS1="bash@target-linux$ "
+    unset -f printenv
+    unset -f setenv
+    unset -f version
+}
+function boot_retry() {
+    echo "Pretending to boot Linux, rejecting the first login..."
+    read -p "Please press Enter to activate this console."
+    read -p "login: "
+    read -s -p "password: "
+    echo ""
+    sleep 0.1
+    echo "Login incorrect"
+    read -p "login: "
+    read -s -p "password: "
+    echo ""
+
     PS1="bash@target-linux$ "
     unset -f printenv
     unset -f setenv
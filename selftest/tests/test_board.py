@@ -1,8 +1,15 @@
+import re
+import time
+from typing import Any, Optional
+
 import pytest
 import testmachines
 
 import tbot
-from tbot.machine import board
+from tbot.machine import board, linux
+from tbot.machine.board import facts, profile
+
+from .test_log import capture_log
 
 
 def test_board_power(tbot_context: tbot.Context) -> None:
@@ -20,6 +27,55 @@ def test_board_power(tbot_context: tbot.Context) -> None:
         assert not power_path.exists()
 
 
+def test_board_powercycle_delay(tbot_context: tbot.Context) -> None:
+    class BoardA(testmachines.MockhwBoard):
+        name = "powercycle-a"
+        powercycle_delay = 0.5
+
+    class BoardB(BoardA):
+        name = "powercycle-b"
+
+    with tbot_context.request(tbot.role.LabHost) as lh:
+        a = BoardA(lh)
+        assert a.powercycle_remaining() == 0
+        a._record_poweroff()
+        assert 0.4 < a.powercycle_remaining() <= 0.5
+
+        # Another board of the same class is not affected...
+        assert BoardB(lh).powercycle_remaining() == 0
+        # ... but a new instance for the same physical board is
+        assert BoardA(lh).powercycle_remaining() > 0.4
+
+        start = time.monotonic()
+        a._wait_powercycle()
+        assert time.monotonic() - start > 0.3
+        assert a.powercycle_remaining() == 0
+
+        # Two machines for the same physical board can't be powered on at once
+        with a._claim_powercycle_key():
+            with pytest.raises(tbot.error.PowercycleKeyConflictError):
+                with BoardA(lh)._claim_powercycle_key():
+                    pass
+            with BoardB(lh)._claim_powercycle_key():
+                pass
+        with BoardA(lh)._claim_powercycle_key():
+            pass
+
+        tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+        tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+        tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+        power_path = lh.workdir / "mockhw-power-status"
+        power_path.write_text("on")
+        start = time.monotonic()
+        a.powercycle()
+        assert time.monotonic() - start > 0.4
+        assert power_path.read_text() == "on"
+        # The delay starts over after the next poweroff only
+        assert a.powercycle_remaining() == 0
+        a.poweroff()
+
+
 def test_uboot_simple_commands(tbot_context: tbot.Context) -> None:
     with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
         ub.exec0("version")
@@ -46,6 +102,74 @@ def test_uboot_simple_environment(tbot_context: tbot.Context) -> None:
         assert ub.env("tbot_test_env_var") == value
 
 
+def test_uboot_env_snapshot(tbot_context: tbot.Context) -> None:
+    with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+        ub.env_update(
+            {
+                "tbot_snap_a": "foo bar",
+                "tbot_snap_b": "12 ; echo nope",
+                "tbot_snap_c": None,
+            }
+        )
+        env = ub.env_snapshot()
+        assert env["tbot_snap_a"] == "foo bar"
+        assert env["tbot_snap_b"] == "12 ; echo nope"
+        assert "tbot_snap_c" not in env
+        assert "Environment size" not in env
+
+        # Reads are served from the snapshot
+        assert ub._env_cache is not None
+        ub._env_cache["tbot_snap_a"] = "cached"
+        assert ub.env("tbot_snap_a") == "cached"
+
+        # ... until something changes the environment
+        ub.env("tbot_snap_b", "new")
+        assert ub._env_cache is None
+        assert ub.env("tbot_snap_a") == "foo bar"
+        assert ub.env_snapshot()["tbot_snap_b"] == "new"
+
+        ub.env_update({"tbot_snap_a": None})
+        assert "tbot_snap_a" not in ub.env_snapshot()
+
+        # Read-only commands keep the snapshot, also in compound lines
+        ub.exec0("printenv", "tbot_snap_b", linux.Then, "echo", "x")
+        assert ub._env_cache is not None
+        with pytest.raises(ValueError):
+            ub.exec0()
+
+        # ... but not if any part of the line changes the environment
+        ub.exec0("printenv", "tbot_snap_b", linux.Then, "setenv", "tbot_snap_b")
+        assert ub._env_cache is None
+        assert "tbot_snap_b" not in ub.env_snapshot()
+        ub.exec0("echo", "x", linux.AndThen, "setenv", "tbot_snap_b", "y")
+        assert ub._env_cache is None
+        assert ub.env_snapshot()["tbot_snap_b"] == "y"
+
+
+def test_uboot_env_update_split(tbot_context: tbot.Context) -> None:
+    with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+        variables = {f"tbot_split_{i:02}": f"value-{i:02}" * 4 for i in range(40)}
+        ub.env_update(variables)
+        env = ub.env_snapshot()
+        for var, value in variables.items():
+            assert env[var] == value
+
+
+def test_uboot_env_update_no_hush(tbot_context: tbot.Context) -> None:
+    with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+        ub.exec_single_roundtrip = False
+        try:
+            with capture_log() as events:
+                ub.env_update({"tbot_nohush_a": "foo", "tbot_nohush_b": None})
+        finally:
+            ub.exec_single_roundtrip = True
+        assert ub.env("tbot_nohush_a") == "foo"
+
+    cmds = [ev["data"]["cmd"] for ev in events if ev["type"][0] == "cmd"]
+    setenvs = [cmd for cmd in cmds if cmd.startswith("setenv")]
+    assert setenvs == ["setenv tbot_nohush_a foo", "setenv tbot_nohush_b"]
+
+
 def test_uboot_simple_control(tbot_context: tbot.Context) -> None:
     with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
         out = ub.exec0(
@@ -67,6 +191,273 @@ def test_uboot_crc32_workaround(tbot_context: tbot.Context) -> None:
         assert ub.exec0("echo", "Hello World") == "Hello World\n"
 
 
+def test_uboot_single_roundtrip(tbot_context: tbot.Context, capsys: Any) -> None:
+    with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+        assert ub.exec_single_roundtrip
+        assert ub.exec("false") == (1, "")
+        assert ub._single_roundtrip_ok
+
+        capsys.readouterr()
+        with tbot.log.with_verbosity(tbot.log.Verbosity.STDOUT):
+            out = ub.exec0("echo", "Hello World")
+        assert out == "Hello World\n"
+        log = capsys.readouterr().out
+        assert "Hello World" in log
+        assert "__tbot_rc_" not in log
+
+        # Output without a trailing newline directly precedes the sentinel
+        assert ub.exec0("printf", "__tbot") == "__tbot"
+
+
+def test_uboot_two_roundtrips(tbot_context: tbot.Context) -> None:
+    with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+        ub.exec_single_roundtrip = False
+        try:
+            assert ub.test("true")
+            assert not ub.test("false")
+            assert ub.exec0("echo", "Hello World") == "Hello World\n"
+            ub.exec0("crc32", "0x10000008", "0x42")
+            assert ub.exec0("echo", "$?", "!#") == "$? !#\n"
+        finally:
+            ub.exec_single_roundtrip = True
+
+
+@pytest.mark.parametrize(  # type: ignore
+    "protocol,block_size,fail",
+    [
+        ("ymodem", 1024, None),
+        ("xmodem", 1024, None),
+        ("xmodem", 128, None),
+        ("ymodem", 1024, "nak:2"),
+        ("ymodem", 1024, "abort:3"),
+    ],
+)
+def test_uboot_load_serial(
+    tbot_context: tbot.Context,
+    protocol: str,
+    block_size: int,
+    fail: Optional[str],
+) -> None:
+    with tbot_context.request(tbot.role.LabHost) as lh:
+        with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+            payload = bytes((i * 7 + i // 256) & 0xFF for i in range(5000))
+            src = lh.workdir / "tbot-load-serial.bin"
+            src.write_bytes(payload)
+
+            if fail is not None:
+                mockhw_dir = linux.Workdir.xdg_runtime(lh, "selftest-data-mockhw")
+                (mockhw_dir / "mockhw-load-fail").write_text(fail)
+
+            size = ub.load_serial(src, 0x1000, protocol=protocol, block_size=block_size)
+            assert size == len(payload)
+
+
+def test_uboot_load_serial_verify(tbot_context: tbot.Context) -> None:
+    with tbot_context.request(tbot.role.LabHost) as lh:
+        with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+            src = lh.workdir / "tbot-load-serial.bin"
+            src.write_bytes(b"Hello Board!\n" * 10)
+
+            mockhw_dir = linux.Workdir.xdg_runtime(lh, "selftest-data-mockhw")
+            (mockhw_dir / "mockhw-load-fail").write_text("corrupt:1")
+            with pytest.raises(tbot.error.TransferError):
+                ub.load_serial(src, 0x1000)
+
+            (mockhw_dir / "mockhw-load-fail").write_text("corrupt:1")
+            ub.load_serial(src, 0x1000, verify=False)
+
+
+@pytest.mark.parametrize("width", [1, 2, 4, 8])  # type: ignore
+def test_uboot_read_write_mem(tbot_context: tbot.Context, width: int) -> None:
+    with tbot_context.request(testmachines.MockhwBoardUBoot) as ub:
+        data = b"0123456789abcdef:  \x00\xff" * 3 + bytes(40) + b"end!"
+        ub.write_mem(0x4000, data, width=width)
+        assert ub.read_mem(0x4000, len(data), width=width) == data
+
+        # Chunked and unaligned
+        assert ub.read_mem(0x4002, 30, width=width, chunk_size=16) == data[2:32]
+        with pytest.raises(ValueError):
+            ub.read_mem(0x4000, 16, width=width, chunk_size=width - 1)
+
+        # One `mw` per round-trip without the hush parser
+        ub.exec_single_roundtrip = False
+        try:
+            ub.write_mem(0x5000, data[:24], width=width)
+        finally:
+            ub.exec_single_roundtrip = True
+        assert ub.read_mem(0x5000, 24, width=width) == data[:24]
+
+        # Big-endian interpretation of the same memory
+        if width > 1:
+            swapped = ub.read_mem(
+                0x4000, 16, width=width, byteorder="big", verify=False
+            )
+            assert swapped[:width] == data[:width][::-1]
+
+
+def test_board_fact_cache(tmp_path: Any) -> None:
+    bootlog = """\
+U-Boot SPL 2024.01 (Jan 08 2024 - 10:27:12 +0100)
+DRAM:  1 GiB
+
+U-Boot 2024.01-00123-gdeadbeef (Jan 08 2024 - 10:27:12 +0100)
+
+Hit any key to stop autoboot:  0
+"""
+    version = facts.banner_version(bootlog)
+    assert version == "2024.01-00123-gdeadbeef (Jan 08 2024 - 10:27:12 +0100)"
+    assert facts.banner_version("Mockhw U-Boot, running ...") is None
+
+    path = str(tmp_path / "facts.json")
+    cache = facts.FactCache(path)
+    cache.set("board-a", version, "ram_base", 0x40000000)
+    cache.set("board-b", version, "ram_base", 0x80000000)
+
+    # Persisted across runs
+    cache = facts.FactCache(path)
+    assert cache.get("board-a", version) == {"ram_base": 0x40000000}
+
+    # A different build invalidates the facts of this board only
+    assert cache.get("board-a", "2024.04 (Apr 02 2024 - 12:00:00 +0200)") == {}
+    cache.set("board-a", "2024.04 (Apr 02 2024 - 12:00:00 +0200)", "x", 1)
+    assert cache.get("board-a", version) == {}
+    assert cache.get("board-b", version) == {"ram_base": 0x80000000}
+
+    cache.invalidate("board-b")
+    assert facts.FactCache(path).get("board-b", version) == {}
+
+
+def test_uboot_ram_base_cached(tbot_context: tbot.Context, tmp_path: Any) -> None:
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+    old_cache_file = facts.CACHE_FILE
+    facts.CACHE_FILE = str(tmp_path / "facts.json")
+    try:
+        with capture_log() as events:
+            # Power-cycle the board in between
+            for _ in range(2):
+                with tbot_context.request(
+                    testmachines.MockhwBoard, exclusive=True
+                ) as b, testmachines.MockhwBoardUBoot(b) as ub:
+                    assert ub.ram_base == 0x40000000
+                    assert ub.ram_base == 0x40000000
+
+        # Without the fact cache, invalidating leaves the persisted facts alone
+        persisted = (tmp_path / "facts.json").read_text()
+        with tbot_context.request(
+            testmachines.MockhwBoard, exclusive=True
+        ) as b, testmachines.MockhwBoardUBoot(b) as ub:
+            ub.fact_cache = False
+            ub.invalidate_board_facts()
+        assert (tmp_path / "facts.json").read_text() == persisted
+    finally:
+        facts.CACHE_FILE = old_cache_file
+
+    cmds = [ev["data"]["cmd"] for ev in events if ev["type"][0] == "cmd"]
+    assert len([cmd for cmd in cmds if cmd == "bdinfo"]) == 1
+    # The mock has no boot banner so the version is queried once per instance
+    assert len([cmd for cmd in cmds if cmd == "version"]) == 2
+
+
+class SpamUBoot(testmachines.MockhwBoardUBoot):
+    autoboot_spam_interval = 0.05
+
+
+@pytest.mark.parametrize("spam", [False, True])  # type: ignore
+def test_uboot_prompt_latency(tbot_context: tbot.Context, spam: bool) -> None:
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+    cls = SpamUBoot if spam else testmachines.MockhwBoardUBoot
+    with capture_log() as events:
+        with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+            with cls(b) as ub:
+                assert ub.exec0("echo", "Hello World") == "Hello World\n"
+
+    latency = [ev for ev in events if ev["type"][:2] == ["board", "uboot-latency"]]
+    assert len(latency) == 1
+    data = latency[0]["data"]
+    assert data["reference"] == "poweron"
+    assert 0 < data["autoboot"] < data["prompt"]
+
+
+def test_boot_profiler_milestones() -> None:
+    milestones = [
+        profile.Milestone("spl", re.compile("SPL")),
+        profile.Milestone("uboot", re.compile(r"U-Boot \d+")),
+        profile.Milestone("kernel", re.compile("Starting kernel")),
+    ]
+    profiler = profile.BootProfiler("board", milestones, time.monotonic() - 1.0)
+
+    # Split across writes and skipping the missing SPL milestone
+    profiler.feed("DRAM: 1 GiB\nU-Boot 20")
+    profiler.feed("24\nStarting ")
+    assert list(profiler.timestamps) == ["poweron", "uboot"]
+    # Earlier milestones are not searched anymore
+    profiler.feed("SPL\nStarting kernel ...\n")
+    assert list(profiler.timestamps) == ["poweron", "uboot", "kernel"]
+
+    profiler.mark("custom")
+    assert 1.0 <= profiler.timestamps["uboot"] <= profiler.timestamps["custom"]
+    phases = profiler.phases()
+    assert [(p["start"], p["name"]) for p in phases] == [
+        ("poweron", "uboot"),
+        ("uboot", "kernel"),
+        ("kernel", "custom"),
+    ]
+
+
+def test_boot_profile_event(tbot_context: tbot.Context) -> None:
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+    with capture_log() as events:
+        with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+            assert b.boot_profiler is not None
+            with testmachines.MockhwBoardUBoot(b) as ub:
+                with testmachines.MockhwBoardLinux(ub) as lnx:
+                    lnx.exec0("true")
+            assert b.boot_profiler is not None
+
+    profiles = [ev for ev in events if ev["type"][:2] == ["board", "boot-profile"]]
+    assert len(profiles) == 1
+    data = profiles[0]["data"]
+    milestones = data["milestones"]
+    assert sorted(milestones, key=lambda name: milestones[name]) == [
+        "poweron",
+        "autoboot",
+        "autoboot-intercept",
+        "uboot-prompt",
+        "login",
+        "linux-login",
+    ]
+    assert data["total"] == milestones["linux-login"]
+    assert abs(sum(p["duration"] for p in data["phases"]) - data["total"]) < 1e-6
+
+
+def test_boot_profile_powercycle(tbot_context: tbot.Context) -> None:
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+    with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+        first = b.boot_profiler
+        assert first is not None
+        b.powercycle()
+
+        # The boot after the powercycle is profiled from the new poweron
+        second = b.boot_profiler
+        assert second is not None and second is not first
+        with testmachines.MockhwBoardUBoot(b) as ub:
+            ub.exec0("true")
+        assert "uboot-prompt" in second.timestamps
+        assert "uboot-prompt" not in first.timestamps
+
+
 def test_linux_boot(tbot_context: tbot.Context) -> None:
     with tbot_context.request(testmachines.MockhwBoardLinux) as lnx:
         out = lnx.exec0("echo", "Hello World")
@@ -77,3 +468,74 @@ def test_linux_boot(tbot_context: tbot.Context) -> None:
 
         with pytest.raises(tbot.error.CommandFailure):
             lnx.exec0("false")
+
+
+class NoPasswordLinux(testmachines.MockhwBoardLinux):
+    login_shell_prompt = "target-linux$ "
+
+    def do_boot(self, ub: board.UBootShell) -> Any:
+        return ub.boot("boot_nopw")
+
+
+class RetryLoginLinux(testmachines.MockhwBoardLinux):
+    login_shell_prompt = "target-linux$ "
+
+    def do_boot(self, ub: board.UBootShell) -> Any:
+        return ub.boot("boot_retry")
+
+
+class LastLoginLinux(testmachines.MockhwBoardLinux):
+    login_shell_prompt = "target-linux$ "
+
+    def do_boot(self, ub: board.UBootShell) -> Any:
+        return ub.boot("boot_lastlogin")
+
+
+class LoginLoopLinux(testmachines.MockhwBoardLinux):
+    def do_boot(self, ub: board.UBootShell) -> Any:
+        return ub.boot("boot_login_loop")
+
+
+@pytest.mark.parametrize("attempts", [1, 3])  # type: ignore
+def test_linux_login_state_machine(tbot_context: tbot.Context, attempts: int) -> None:
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+    with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+        # A password is configured but never asked for
+        with testmachines.MockhwBoardUBoot(b) as ub:
+            start = time.monotonic()
+            with NoPasswordLinux(ub) as lnx:
+                assert lnx.no_password_timeout is not None
+                assert time.monotonic() - start < lnx.no_password_timeout
+                assert lnx.exec0("echo", "Hello World") == "Hello World\n"
+
+    with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+        with testmachines.MockhwBoardUBoot(b) as ub:
+            retry = RetryLoginLinux(ub)
+            retry.login_attempts = attempts
+            if attempts == 1:
+                with pytest.raises(tbot.error.LoginFailedError):
+                    with retry:
+                        pass
+            else:
+                with retry as lnx:
+                    assert lnx.exec0("echo", "Hello World") == "Hello World\n"
+
+    with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+        # The "Last login: ..." banner is not mistaken for a login prompt
+        with testmachines.MockhwBoardUBoot(b) as ub:
+            lastlogin = LastLoginLinux(ub)
+            lastlogin.login_attempts = attempts
+            with lastlogin as lnx:
+                assert lnx.exec0("echo", "Hello World") == "Hello World\n"
+
+    with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+        # The username is asked for again and again without a password prompt
+        with testmachines.MockhwBoardUBoot(b) as ub:
+            loop = LoginLoopLinux(ub)
+            loop.login_attempts = attempts
+            with pytest.raises(tbot.error.LoginFailedError):
+                with loop:
+                    pass
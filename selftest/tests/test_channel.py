@@ -1,9 +1,15 @@
-from typing import Iterator, Match
+import asyncio
+import contextlib
+import json
+import pathlib
+import time
+import typing
+from typing import Iterator, List, Match, Optional
 
 import pytest
 
 import tbot
-from tbot.machine import board, channel, connector
+from tbot.machine import board, channel, connector, linux
 
 
 @pytest.fixture
@@ -76,6 +82,19 @@ def test_simple_expect3(ch: channel.Channel) -> None:
     assert res.match.group(1) == b"1337"
 
 
+def test_expect_buffered(ch: channel.Channel) -> None:
+    ch.sendline("echo one two; sleep 0.1; echo three", read_back=True)
+    buf = bytearray()
+    res = ch._expect_buffered(buf, ["one", "three"])
+    assert res.i == 0
+    # "two" was read in the same chunk and is kept for the next call
+    assert b"two" in buf
+    res = ch._expect_buffered(buf, ["two", "three"], timeout=1.0)
+    assert res.i == 0
+    res = ch._expect_buffered(buf, ["two", "three"], timeout=1.0)
+    assert res.i == 1
+
+
 def test_borrowing(ch: channel.Channel) -> None:
     ch.sendline("echo Hello")
 
@@ -160,3 +179,238 @@ def test_nullchannel_machine() -> None:
         assert not m.ch.closed
 
     assert m.ch.closed
+
+
+def test_async_channel(ch: channel.Channel) -> None:
+    async def run() -> None:
+        ach = channel.AsyncChannel(ch)
+
+        await ach.write(b"1234567890ABCDEF")
+        assert await ach.read(10) == b"1234567890"
+        assert await ach.read() == b"ABCDEF"
+        ch.sendintr()
+        await ach.read_until_timeout(0.2)
+
+        await ach.sendline("echo Lorem Ipsum", read_back=True)
+        res = await ach.expect(["Lol", "Ip"])
+        assert res.i == 1
+        assert res.before.strip() == "Lorem"
+
+        with pytest.raises(TimeoutError):
+            await ach.expect("never appears", timeout=0.3)
+
+        await ach.sendline("PS1=AIO-PROMPT", read_back=True)
+        await ach.read_until_prompt("AIO-PROMPT")
+        await ach.sendline("echo Hello; echo World", read_back=True)
+        out = await ach.read_until_prompt("AIO-PROMPT")
+        assert out == "Hello\nWorld\n"
+
+    asyncio.run(run())
+
+
+def test_async_channel_concurrent() -> None:
+    async def run(ach: channel.AsyncChannel) -> str:
+        await ach.sendline("sleep 0.5; echo DONE", read_back=True)
+        res = await ach.expect("DONE", timeout=5)
+        return str(res.match)
+
+    async def main(chans: List[channel.Channel]) -> None:
+        start = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*(run(channel.AsyncChannel(c)) for c in chans))
+        assert results == ["DONE"] * len(chans)
+        # All channels were waited on at the same time
+        assert asyncio.get_running_loop().time() - start < 1.5
+
+    with channel.SubprocessChannel() as ch1, channel.SubprocessChannel() as ch2:
+        with channel.SubprocessChannel() as ch3:
+            asyncio.run(main([ch1, ch2, ch3]))
+
+
+def test_reactor() -> None:
+    with contextlib.ExitStack() as cx:
+        chans = [cx.enter_context(channel.SubprocessChannel()) for _ in range(3)]
+        reactor = cx.enter_context(channel.Reactor())
+
+        for i, ch in enumerate(chans):
+            ch.sendline(f"sleep 0.{5 - i}; echo DONE-$((40 + {i}))")
+
+        start = time.monotonic()
+        waits = [reactor.expect(ch, tbot.Re(r"DONE-\d\d")) for ch in chans]
+        reactor.run(timeout=5)
+        # All channels were waited on at the same time
+        assert time.monotonic() - start < 1.0
+        results = [w.result() for w in waits]
+        assert [typing.cast(Match[bytes], r.match)[0] for r in results] == [
+            b"DONE-40",
+            b"DONE-41",
+            b"DONE-42",
+        ]
+
+        # Timeouts only affect their own wait
+        chans[0].sendline("echo FOO")
+        ok = reactor.expect(chans[0], "FOO", timeout=2)
+        never = reactor.expect(chans[1], "never appears", timeout=0.3)
+        reactor.run()
+        assert ok.result().match == "FOO"
+        with pytest.raises(TimeoutError):
+            never.result()
+
+        # Prompts
+        chans[2].sendline("PS1=REACTOR-PROMPT")
+        reactor.read_until_prompt(chans[2], "REACTOR-PROMPT")
+        reactor.run(timeout=2)
+        chans[2].sendline("echo Hello")
+        out = reactor.read_until_prompt(chans[2], "REACTOR-PROMPT")
+        reactor.run(timeout=2)
+        assert out.result().endswith("Hello\n")
+
+        # Death strings are checked for all channels
+        with chans[1].with_death_string("FATAL"):
+            chans[1].sendline("echo FAT''AL")
+            death = reactor.expect(chans[1], "never appears", timeout=5)
+            reactor.run()
+            with pytest.raises(channel.DeathStringException):
+                death.result()
+
+
+def test_drain(ch: channel.Channel) -> None:
+    ch.start_drain()
+    ch.sendline("echo Hello World", read_back=True)
+    time.sleep(0.2)
+    assert ch.read().startswith(b"Hello World")
+
+    # Death-strings are detected in the background and raised by the next read
+    with ch.with_death_string("FATAL"):
+        ch.sendline("echo FAT''AL")
+        time.sleep(0.2)
+        with pytest.raises(channel.DeathStringException):
+            ch.read(timeout=1)
+    ch.read_until_timeout(0.2)
+
+    # Borrowed channels keep draining and use their own death-strings
+    with ch.borrow() as ch2:
+        with ch2.with_death_string("BORROWED"):
+            ch2.sendline("echo BORR''OWED")
+            with pytest.raises(channel.DeathStringException):
+                ch2.read_until_timeout(1)
+
+
+@pytest.mark.parametrize("spill", [True, False])  # type: ignore
+def test_drain_overflow(
+    ch: channel.Channel, tmp_path: pathlib.Path, spill: bool
+) -> None:
+    ch.sendline("PS1=DRAIN-PROMPT", read_back=True)
+    ch.read_until_prompt("DRAIN-PROMPT")
+    ch.start_drain(max_memory=1024, spill_dir=str(tmp_path) if spill else None)
+
+    ch.sendline("seq 1 2000", read_back=True)
+    # Let the output pile up in the buffer
+    time.sleep(0.5)
+    with tbot.log.with_verbosity(tbot.log.Verbosity.QUIET):
+        out = ch.read_until_prompt("DRAIN-PROMPT", timeout=5)
+
+    lines = out.split()
+    if spill:
+        assert lines == [str(i) for i in range(1, 2001)]
+    else:
+        # The start was dropped but the end is intact
+        assert lines[-1] == "2000"
+        assert len(lines) < 2000
+
+
+def test_recording(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "ch.tbotrec"
+    with channel.SubprocessChannel() as ch:
+        recorder = ch.start_recording(str(path), "test")
+        assert ch.recorder is recorder
+        assert ch.start_recording(str(tmp_path / "other")) is recorder
+
+        ch.sendline("echo RECO''RDED", read_back=True)
+        ch.expect("RECORDED")
+        recorder.record(channel.record.MARKER, b"marker")
+        # Data which is never read is not recorded
+        ch.sendline("echo UNREAD")
+        time.sleep(0.2)
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        assert header.startswith(channel.record.MAGIC)
+        assert json.loads(header[len(channel.record.MAGIC) :])["name"] == "test"
+
+        records = []
+        while True:
+            raw = f.read(channel.record.RECORD.size)
+            if raw == b"":
+                break
+            t, kind, length = channel.record.RECORD.unpack(raw)
+            records.append((t, kind, f.read(length)))
+
+    times = [t for t, _, _ in records]
+    assert times == sorted(times)
+    sent = b"".join(data for _, kind, data in records if kind == b"t")
+    received = b"".join(data for _, kind, data in records if kind == b"r")
+    assert b"echo RECO''RDED\r" in sent
+    assert b"RECORDED" in received
+    assert b"UNREAD" not in received
+    assert (b"m", b"marker") in [(kind, data) for _, kind, data in records]
+
+
+class RecordedBash(connector.SubprocessConnector, linux.Bash):
+    name = "recorded-bash"
+
+
+class ReplayedBash(connector.Connector, linux.Bash):
+    name = "replayed-bash"
+    recording = ""
+    speed: Optional[float] = None
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[channel.Channel]:
+        with channel.record.ReplayChannel(self.recording, self.speed) as ch:
+            yield ch
+
+    @classmethod
+    @contextlib.contextmanager
+    def from_context(cls, ctx: tbot.Context) -> Iterator["ReplayedBash"]:
+        with cls() as m:
+            yield m
+
+    def clone(self) -> "ReplayedBash":
+        raise NotImplementedError()
+
+
+def test_replay(tmp_path: pathlib.Path) -> None:
+    # Record the whole session, starting with the shell initialization
+    channel.record.RECORD_DIR = str(tmp_path)
+    try:
+        with RecordedBash() as rec:
+            rec.exec0("echo", "Hello World")
+            rec.exec0("sleep", "0.3")
+            rec.test("false")
+    finally:
+        channel.record.RECORD_DIR = None
+
+    (path,) = tmp_path.glob("*-recorded-bash.tbotrec")
+    ReplayedBash.recording = str(path)
+
+    # Replaying with the original timing
+    ReplayedBash.speed = 1.0
+    with ReplayedBash() as m:
+        assert m.exec0("echo", "Hello World") == "Hello World\n"
+        start = time.monotonic()
+        m.exec0("sleep", "0.3")
+        assert time.monotonic() - start >= 0.25
+        assert not m.test("false")
+
+    # As fast as possible
+    ReplayedBash.speed = None
+    with ReplayedBash() as m:
+        m.exec0("echo", "Hello World")
+        start = time.monotonic()
+        m.exec0("sleep", "0.3")
+        assert time.monotonic() - start < 0.25
+
+    # Diverging from the recording
+    with ReplayedBash() as m:
+        with pytest.raises(tbot.error.ReplayMismatchError):
+            m.exec0("echo", "Goodbye World")
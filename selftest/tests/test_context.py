@@ -1,3 +1,8 @@
+import contextlib
+import threading
+import time
+from typing import Iterator, List, Tuple
+
 import pytest
 import testmachines
 
@@ -239,6 +244,88 @@ def test_reset_on_error_by_default_context() -> None:
             assert inner2.env("TBOT_CTX_TESTS") != "inner1"
 
 
+def test_threaded_exclusive_context() -> None:
+    """
+    An exclusive request from another thread waits instead of failing.
+    """
+    ctx = tbot.Context()
+    testmachines.register_machines(ctx)
+    order: List[str] = []
+
+    def worker() -> None:
+        with ctx.request(tbot.role.LabHost, exclusive=True) as lh:
+            order.append("worker")
+            lh.exec0("true")
+
+    with ctx:
+        with ctx.request(tbot.role.LabHost) as lh:
+            thread = threading.Thread(target=worker)
+            thread.start()
+            # Give the worker a chance to (wrongly) grab the instance
+            time.sleep(0.2)
+            lh.exec0("true")
+            order.append("main")
+        thread.join(10)
+
+    assert not thread.is_alive()
+    assert order == ["main", "worker"]
+
+
+def test_threaded_shared_context() -> None:
+    """
+    Threads requesting the same role take turns instead of using it concurrently.
+    """
+    ctx = tbot.Context(keep_alive=True)
+    testmachines.register_machines(ctx)
+    lock = threading.Lock()
+    active: List[int] = []
+    overlaps: List[int] = []
+    outputs: List[str] = []
+
+    def worker(i: int) -> None:
+        with tbot.log.isolated_state():
+            with ctx.request(testmachines.Localhost) as lh:
+                with lock:
+                    if active:
+                        overlaps.append(i)
+                    active.append(i)
+                outputs.append(lh.exec0("echo", f"worker-{i}"))
+                time.sleep(0.1)
+                outputs.append(lh.exec0("echo", f"worker-{i}"))
+                with lock:
+                    active.remove(i)
+
+    with ctx:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert overlaps == []
+    assert sorted(outputs) == sorted(f"worker-{i}\n" for i in range(3) for _ in "ab")
+
+
+def test_isolated_log_state() -> None:
+    nesting = tbot.log._nesting()
+    inner: List[int] = []
+
+    def worker() -> None:
+        with tbot.log.isolated_state():
+            with tbot.log.with_verbosity(tbot.log.Verbosity.QUIET, nesting=10):
+                time.sleep(0.05)
+                inner.append(tbot.log._nesting())
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.01)
+    assert tbot.log._nesting() == nesting
+    thread.join()
+    assert inner == [10]
+    assert tbot.log._nesting() == nesting
+
+
 def test_my_rolemodel() -> None:
     assert tbot.role.isrole(tbot.role.BoardLinux)
     assert not tbot.role.isrole(tbot.machine.Machine)
@@ -246,3 +333,183 @@ def test_my_rolemodel() -> None:
     assert (
         tbot.role.rolename(testmachines.MocksshServer) == "<testmachines.MocksshServer>"
     )
+
+
+def test_prewarm_context() -> None:
+    """
+    A prewarmed instance is initialized in the background and shared with later requests.
+    """
+    ctx = tbot.Context()
+    testmachines.register_machines(ctx)
+    ctx.register(OtherMachine, [OtherMachine])
+
+    with pytest.raises(tbot.error.ContextError, match="active context"):
+        ctx.prewarm(tbot.role.LabHost)
+
+    with ctx:
+        ctx.prewarm(tbot.role.LabHost)
+        for thread in ctx._prewarm_threads:
+            thread.join()
+        with ctx.request(tbot.role.LabHost) as lh:
+            assert ctx._instances[testmachines.Localhost].prewarmed
+            lh.exec0("true")
+
+        # Prewarmed instances which are never requested are torn down silently
+        ctx.prewarm(OtherMachine)
+
+    assert not ctx._instances[OtherMachine].is_alive()
+
+
+class OtherMachine(testmachines.Localhost):
+    pass
+
+
+class BrokenMachine(testmachines.Localhost):
+    def init(self) -> None:
+        raise ContextTestException("broken")
+
+
+class DependentMachine(testmachines.Localhost):
+    @classmethod
+    @contextlib.contextmanager
+    def from_context(cls, ctx: tbot.Context) -> Iterator["DependentMachine"]:
+        with ctx.request(tbot.role.LabHost), cls() as m:
+            yield m
+
+
+def test_prewarm_dependency_context() -> None:
+    """
+    Dependencies of a prewarmed instance are held by it, not by the prewarm thread.
+    """
+    ctx = tbot.Context()
+    testmachines.register_machines(ctx)
+    ctx.register(DependentMachine, [DependentMachine])
+
+    with ctx:
+        ctx.prewarm(DependentMachine)
+        for thread in ctx._prewarm_threads:
+            thread.join()
+
+        dependent = ctx._instances[DependentMachine]
+        labhost = ctx._instances[testmachines.Localhost]
+        assert list(labhost._current_users) == [dependent]
+
+        start = time.monotonic()
+        with ctx.request(tbot.role.LabHost) as lh:
+            lh.exec0("true")
+        assert time.monotonic() - start < 0.4
+
+
+def test_threaded_wakeup_context() -> None:
+    """
+    A waiting request continues as soon as the other thread is done.
+    """
+    ctx = tbot.Context(keep_alive=True)
+    testmachines.register_machines(ctx)
+    entered = threading.Event()
+
+    def worker() -> None:
+        with tbot.log.isolated_state():
+            with ctx.request(tbot.role.LabHost):
+                entered.set()
+                time.sleep(0.2)
+            released.append(time.monotonic())
+
+    released: List[float] = []
+    with ctx:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert entered.wait(10)
+        with ctx.request(tbot.role.LabHost):
+            acquired = time.monotonic()
+        thread.join(10)
+
+    assert acquired - released[0] < 0.1
+
+
+class SharedLabBoard(testmachines.Localhost):
+    """Initializes and deinitializes through the lab-host, like a board would."""
+
+    spans: List[Tuple[float, float]] = []
+
+    @classmethod
+    @contextlib.contextmanager
+    def from_context(cls, ctx: tbot.Context) -> Iterator["SharedLabBoard"]:
+        with ctx.request(tbot.role.LabHost) as lh:
+            cls._powercycle(lh)
+            with cls() as m:
+                yield m
+            cls._powercycle(lh)
+
+    @classmethod
+    def _powercycle(cls, lh: tbot.role.LabHost) -> None:
+        start = time.monotonic()
+        lh.exec0("sleep", "0.3")
+        cls.spans.append((start, time.monotonic()))
+
+
+class SharedLabBoardA(SharedLabBoard):
+    pass
+
+
+class SharedLabBoardB(SharedLabBoard):
+    pass
+
+
+def test_threaded_shared_dependency_context() -> None:
+    """
+    Boards initialized by different threads take turns on their shared lab-host.
+    """
+    ctx = tbot.Context(keep_alive=True)
+    testmachines.register_machines(ctx)
+    ctx.register(SharedLabBoardA, [SharedLabBoardA])
+    ctx.register(SharedLabBoardB, [SharedLabBoardB])
+    SharedLabBoard.spans = []
+    barrier = threading.Barrier(2)
+
+    def worker(board: type) -> None:
+        with tbot.log.isolated_state():
+            barrier.wait(10)
+            with ctx.request(board, reset=True) as b:
+                b.exec0("true")
+
+    with ctx:
+        with ctx.request(tbot.role.LabHost):
+            pass
+
+        threads = [
+            threading.Thread(target=worker, args=(board,))
+            for board in [SharedLabBoardA, SharedLabBoardB]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(20)
+        assert not any(thread.is_alive() for thread in threads)
+
+        # Tear both boards down at once as well
+        threads = [
+            threading.Thread(target=ctx.teardown_if_alive, args=(board,))
+            for board in [SharedLabBoardA, SharedLabBoardB]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(20)
+        assert not any(thread.is_alive() for thread in threads)
+
+    spans = sorted(SharedLabBoard.spans)
+    assert len(spans) == 4
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end <= start
+
+
+def test_prewarm_error_context() -> None:
+    ctx = tbot.Context()
+    ctx.register(BrokenMachine, [BrokenMachine])
+
+    with ctx:
+        ctx.prewarm(BrokenMachine)
+        with pytest.raises(ContextTestException, match="broken"):
+            with ctx.request(BrokenMachine):
+                pass
@@ -0,0 +1,170 @@
+import json
+import pathlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import testmachines
+
+import tbot
+import tbot.daemon
+
+TESTCASES = """\
+import tbot
+
+@tbot.testcase
+def daemon_tc_ok() -> None:
+    with tbot.ctx.request(tbot.role.LabHost) as lh:
+        lh.exec0("echo", "daemon-says-hello")
+
+@tbot.testcase
+def daemon_tc_fail() -> None:
+    raise Exception("daemon-failure")
+"""
+
+
+def attach(
+    sock: pathlib.Path, cwd: pathlib.Path, testcase: str
+) -> "subprocess.CompletedProcess[str]":
+    script = (
+        "import sys, tbot.daemon; "
+        + f"sys.exit(0 if tbot.daemon.attach({str(sock)!r}, [{testcase!r}]) else 1)"
+    )
+    return subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=30,
+        env={"PYTHONPATH": str(pathlib.Path(tbot.__file__).parent.parent)},
+    )
+
+
+def raw_request(sock: pathlib.Path, line: bytes) -> List[Dict[str, Any]]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(30)
+        conn.connect(str(sock))
+        conn.sendall(line + b"\n")
+        with conn.makefile("r", encoding="utf-8") as f:
+            return [json.loads(msg) for msg in f]
+
+
+def test_daemon(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "daemon_tcs.py").write_text(TESTCASES)
+    sock = tmp_path / "tbot.sock"
+
+    ctx = tbot.Context(keep_alive=True, reset_on_error_by_default=True)
+    testmachines.register_machines(ctx)
+    old_ctx, tbot.ctx = tbot.ctx, ctx
+
+    stop = threading.Event()
+
+    def server() -> None:
+        with ctx:
+            tbot.daemon.serve(str(sock), ctx, stop)
+
+    thread = threading.Thread(target=server, daemon=True)
+    thread.start()
+    try:
+        for _ in range(100):
+            if sock.exists():
+                break
+            time.sleep(0.05)
+
+        res = attach(sock, tmp_path, "daemon_tcs.daemon_tc_ok")
+        assert res.returncode == 0, res.stdout
+        assert "daemon-says-hello" in res.stdout
+        assert "SUCCESS" in res.stdout
+
+        # The lab-host is kept alive for the next client
+        instance = ctx._instances[testmachines.Localhost]
+        assert instance.is_alive()
+        lh = instance._instance
+
+        res = attach(sock, tmp_path, "daemon_tcs.daemon_tc_ok")
+        assert res.returncode == 0, res.stdout
+        assert instance._instance is lh
+
+        # A failed run resets everything
+        res = attach(sock, tmp_path, "daemon_tcs.daemon_tc_fail")
+        assert res.returncode == 1
+        assert "daemon-failure" in res.stdout
+        assert not instance.is_alive()
+    finally:
+        stop.set()
+        thread.join(timeout=30)
+        tbot.ctx = old_ctx
+    assert not thread.is_alive()
+
+
+def test_daemon_bad_requests(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "daemon_tcs.py").write_text(TESTCASES)
+    sock = tmp_path / "tbot.sock"
+
+    ctx = tbot.Context(keep_alive=True, reset_on_error_by_default=True)
+    testmachines.register_machines(ctx)
+    old_ctx, tbot.ctx = tbot.ctx, ctx
+    old_flags = set(tbot.flags)
+    tbot.flags.add("server-flag")
+    cwd = pathlib.Path.cwd()
+
+    stop = threading.Event()
+
+    def server() -> None:
+        with ctx:
+            tbot.daemon.serve(str(sock), ctx, stop)
+
+    thread = threading.Thread(target=server, daemon=True)
+    thread.start()
+    try:
+        for _ in range(100):
+            if sock.exists():
+                break
+            time.sleep(0.05)
+
+        good = {"testcases": ["daemon_tcs.daemon_tc_ok"], "cwd": str(tmp_path)}
+        bad_requests = [
+            b"{not json",
+            json.dumps({"cwd": str(tmp_path)}).encode(),
+            json.dumps({**good, "cwd": str(tmp_path / "missing")}).encode(),
+            json.dumps(
+                {**good, "log": str(tmp_path / "missing" / "log.json")}
+            ).encode(),
+        ]
+        for line in bad_requests:
+            msgs = raw_request(sock, line)
+            assert msgs[-1]["done"] and not msgs[-1]["success"]
+            assert msgs[-1]["error"] != ""
+
+        # The server survived, restored its own state, and still runs testcases
+        assert thread.is_alive()
+        assert pathlib.Path.cwd() == cwd
+        msgs = raw_request(sock, json.dumps({**good, "flags": ["client"]}).encode())
+        assert msgs[-1] == {"done": True, "success": True}
+        assert tbot.flags == {"server-flag"}
+    finally:
+        stop.set()
+        thread.join(timeout=30)
+        tbot.flags.clear()
+        tbot.flags.update(old_flags)
+        tbot.ctx = old_ctx
+    assert not thread.is_alive()
+
+
+def test_daemon_health_check() -> None:
+    ctx = tbot.Context(keep_alive=True)
+    testmachines.register_machines(ctx)
+    with ctx:
+        with ctx.request(testmachines.Localhost) as lh:
+            # Leave the lab-host stuck in a command which never returns
+            lh.ch.sendline("sleep 60")
+        instance = ctx._instances[testmachines.Localhost]
+        assert instance.is_alive()
+
+        start = time.monotonic()
+        tbot.daemon.health_check(ctx, timeout=0.5)
+        assert time.monotonic() - start < 10
+        assert not instance.is_alive()
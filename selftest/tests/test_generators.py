@@ -0,0 +1,117 @@
+import io
+import json
+import os
+import pathlib
+import re
+import sys
+from typing import Any
+
+import testmachines
+
+import tbot
+
+from .test_log import capture_log
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "generators"))
+
+import chrometrace  # type: ignore # noqa: E402
+import htmllog  # type: ignore # noqa: E402
+import logparser  # type: ignore # noqa: E402
+
+
+def test_board_events(tbot_context: tbot.Context) -> None:
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardLinux)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoardUBoot)
+    tbot_context.teardown_if_alive(testmachines.MockhwBoard)
+
+    with capture_log() as events:
+        with tbot_context.request(testmachines.MockhwBoard, exclusive=True) as b:
+            with testmachines.MockhwBoardUBoot(b) as ub:
+                with testmachines.MockhwBoardLinux(ub) as lnx:
+                    lnx.exec0("true")
+
+    # Board events added by later tbot versions must not break old generators
+    events.append({"type": ["board", "frobnicate", "b"], "time": 0.0, "data": {"x": 1}})
+
+    kinds = [ev["type"][1] for ev in events if ev["type"][0] == "board"]
+    for kind in ["on", "uboot", "uboot-latency", "linux", "boot-profile", "off"]:
+        assert kind in kinds
+
+    log = [logparser.LogEvent(ev) for ev in events]
+
+    html = io.StringIO()
+    htmllog.render(log, html, "test")
+    assert "BOARD UBOOT LATENCY (mockhw-uboot)" in html.getvalue()
+    assert "BOARD BOOT PROFILE (mockhw-board)" in html.getvalue()
+    assert "uboot-prompt" in html.getvalue()
+    assert "BOARD FROBNICATE (b)" in html.getvalue()
+
+    trace = [chrometrace.trace_event(ev) for ev in log]
+    names = [t["name"] for t in trace if t is not None and t.get("cat") == "board"]
+    assert "board uboot-latency mockhw-uboot" in names
+    assert "board boot-profile mockhw-board" in names
+
+
+def test_htmllog_split(
+    tbot_context: tbot.Context, tmp_path: pathlib.Path, monkeypatch: Any
+) -> None:
+    with capture_log() as events:
+        with tbot_context.request(tbot.role.LabHost) as lh:
+            for _ in range(4):
+                lh.exec0("seq", "1", "500")
+
+    logfile = tmp_path / "log.json"
+    logfile.write_text("\n".join(json.dumps(ev) for ev in events))
+    outdir = tmp_path / "html"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["htmllog.py", str(logfile), "--split", str(outdir), "--chunk-size", "2000"],
+    )
+    htmllog.main()
+
+    index = (outdir / "index.html").read_text()
+    lazy = re.findall(r'id="out-(\d+)" data-chunk="(\d{4})"', index)
+    assert len(lazy) == 4
+
+    chunks = sorted((outdir / "chunks").iterdir())
+    assert len(chunks) > 1
+    for i, chunk in enumerate(chunks):
+        assert chunk.name == f"chunk-{i:04}.js"
+        text = chunk.read_text()
+        assert text.startswith(f'tbotChunk("{i:04}", {{\n')
+        assert text.endswith("});\n")
+
+    # Each output is stored in the chunk the index refers to
+    for output_id, chunk_num in lazy:
+        chunk_text = (outdir / "chunks" / f"chunk-{chunk_num}.js").read_text()
+        assert f'"{output_id}": ' in chunk_text
+
+
+def test_logparser_rotated(tmp_path: pathlib.Path) -> None:
+    rotating = tbot.log.RotatingLogFile(
+        tmp_path / "log.json", max_testcases=1, spill_size=100
+    )
+    old_logfile = tbot.log.LOGFILE
+    tbot.log.LOGFILE = rotating
+    try:
+        with tbot.log.with_verbosity(tbot.log.Verbosity.QUIET):
+            for i in range(3):
+                tbot.log_event.testcase_begin(f"tc{i}")
+                ev = tbot.log_event.command("mach", "dmesg")
+                ev.data["stdout"] = f"{i}" * 1000
+                ev.close()
+                tbot.log_event.testcase_end(f"tc{i}", 0.0)
+    finally:
+        tbot.log.LOGFILE = old_logfile
+        rotating.close()
+
+    assert len(json.loads((tmp_path / "log.json").read_text())["segments"]) >= 3
+    assert len(list((tmp_path / "log.json.spill").iterdir())) == 3
+
+    # All segments are read in order through the manifest, with spills loaded
+    log = list(logparser.logfile(str(tmp_path / "log.json")))
+    names = [ev.data["name"] for ev in log if ev.type == ["tc", "begin"]]
+    assert names == ["tc0", "tc1", "tc2"]
+    outputs = [ev.data["stdout"] for ev in log if ev.type[0] == "cmd"]
+    assert outputs == [f"{i}" * 1000 for i in range(3)]
@@ -0,0 +1,171 @@
+import contextlib
+import io
+import json
+import pathlib
+import sys
+from typing import Any, Dict, Iterator, List
+
+import tbot
+
+import testmachines
+
+
+@contextlib.contextmanager
+def capture_log() -> Iterator[List[Dict[str, Any]]]:
+    """
+    Temporarily redirect the logfile into memory and collect all events.
+    """
+    events: List[Dict[str, Any]] = []
+    old_logfile = tbot.log.LOGFILE
+    buf = io.StringIO()
+    tbot.log.LOGFILE = buf
+    try:
+        yield events
+    finally:
+        tbot.log.LOGFILE = old_logfile
+
+        decoder = json.JSONDecoder()
+        raw = buf.getvalue().lstrip()
+        while raw != "":
+            ev, idx = decoder.raw_decode(raw)
+            events.append(ev)
+            raw = raw[idx:].lstrip()
+
+
+def test_span_events() -> None:
+    with capture_log() as events:
+        with tbot.log_event.span("test", "outer", foo="bar"):
+            with tbot.log_event.span("test", "inner"):
+                pass
+
+    assert [ev["data"]["name"] for ev in events] == ["inner", "outer"]
+    outer = events[1]
+    assert outer["type"] == ["span", "test"]
+    assert outer["data"]["foo"] == "bar"
+    assert outer["data"]["start"] <= events[0]["data"]["start"]
+    assert outer["data"]["duration"] >= events[0]["data"]["duration"]
+
+
+def test_machine_init_spans() -> None:
+    with capture_log() as events:
+        with testmachines.Localhost() as lo:
+            lo.exec0("true")
+
+    phases = [ev["data"]["phase"] for ev in events if ev["type"] == ["span", "machine"]]
+    assert phases == ["connect", "init-shell", "init"]
+
+    cmd = next(ev for ev in events if ev["type"][0] == "cmd")
+    assert cmd["data"]["start"] <= cmd["time"]
+
+
+def test_silent_command_events(capsys: Any) -> None:
+    with tbot.log.with_verbosity(tbot.log.Verbosity.QUIET):
+        assert tbot.log.is_silent(tbot.log.Verbosity.COMMAND)
+        ev = tbot.log_event.command("mach", "echo\nfoo")
+        ev.write("Hello\x1b[2J\r\nWorld\n")
+        assert ev.getvalue() == "Hello\nWorld\n"
+        ev.close()
+
+    assert ev.data["cmd"] == "echo\nfoo"
+    assert capsys.readouterr().out == ""
+
+    with capture_log():
+        assert not tbot.log.is_silent(tbot.log.Verbosity.COMMAND)
+
+
+@contextlib.contextmanager
+def console_settings(interval: Any, collapse: bool) -> Iterator[None]:
+    old = (tbot.log.CONSOLE_FLUSH_INTERVAL, tbot.log.CONSOLE_COLLAPSE_PROGRESS)
+    tbot.log.CONSOLE_FLUSH_INTERVAL = interval
+    tbot.log.CONSOLE_COLLAPSE_PROGRESS = collapse
+    try:
+        yield None
+    finally:
+        tbot.log.flush_console()
+        tbot.log.CONSOLE_FLUSH_INTERVAL, tbot.log.CONSOLE_COLLAPSE_PROGRESS = old
+
+
+def test_console_batching(capsys: Any) -> None:
+    with tbot.log.with_verbosity(tbot.log.Verbosity.STDOUT, nesting=-1):
+        with console_settings(60.0, True):
+            tbot.log.flush_console()
+            with capture_log() as events:
+                ev = tbot.log.EventIO(
+                    ["test"], "header", verbosity=tbot.log.Verbosity.STDOUT
+                )
+                ev.write("progress: 1%\rprogress: 50%\rprogress: 100%\r\n")
+                ev.write("done\n")
+                ev.data["out"] = ev.getvalue()
+                ev.close()
+
+                assert capsys.readouterr().out == ""
+                tbot.log.flush_console()
+
+    out = capsys.readouterr().out
+    assert out == "header\nprogress: 100%\ndone\n"
+    full = "progress: 1%\rprogress: 50%\rprogress: 100%\ndone\n"
+    assert events[0]["data"]["out"] == full
+
+
+def test_console_tty_line_flush(monkeypatch: Any) -> None:
+    class FakeTTY(io.StringIO):
+        def isatty(self) -> bool:
+            return True
+
+    out = FakeTTY()
+    monkeypatch.setattr(sys, "stdout", out)
+    with tbot.log.with_verbosity(tbot.log.Verbosity.STDOUT, nesting=-1):
+        with console_settings(60.0, False):
+            tbot.log.flush_console()
+            ev = tbot.log.EventIO(
+                ["test"], "header", verbosity=tbot.log.Verbosity.STDOUT
+            )
+            assert out.getvalue() == "header\n"
+            # Partial lines are held back ...
+            ev.write("progress: 1%\r")
+            assert out.getvalue() == "header\n"
+            # ... but complete ones are shown right away
+            ev.write("progress: 100%\r\n")
+            assert out.getvalue() == "header\nprogress: 1%\rprogress: 100%\n"
+            ev.close()
+
+
+def test_rotating_logfile(tmp_path: pathlib.Path) -> None:
+    logfile = tbot.log.RotatingLogFile(
+        tmp_path / "log.json", max_testcases=2, spill_size=100
+    )
+    old_logfile = tbot.log.LOGFILE
+    tbot.log.LOGFILE = logfile
+    try:
+        with tbot.log.with_verbosity(tbot.log.Verbosity.QUIET):
+            for i in range(5):
+                tbot.log_event.testcase_begin(f"outer{i}")
+                tbot.log_event.testcase_begin("inner")
+                tbot.log_event.testcase_end("inner", 0.0)
+                tbot.log_event.testcase_end(f"outer{i}", 0.0)
+
+            ev = tbot.log_event.command("mach", "dmesg")
+            ev.data["stdout"] = "x" * 1000
+            ev.close()
+    finally:
+        tbot.log.LOGFILE = old_logfile
+        logfile.close()
+
+    manifest = json.loads((tmp_path / "log.json").read_text())
+    assert manifest["segments"] == ["log.0000.json", "log.0001.json", "log.0002.json"]
+
+    decoder = json.JSONDecoder()
+    events = []
+    for segment in manifest["segments"]:
+        raw = (tmp_path / segment).read_text().lstrip()
+        names = []
+        while raw != "":
+            ev, idx = decoder.raw_decode(raw)
+            events.append(ev)
+            names.append(ev["data"].get("name"))
+            raw = raw[idx:].lstrip()
+        assert names[0].startswith("outer")
+
+    spill = events[-1]["data"]["stdout"]
+    assert spill == {"spill": "log.json.spill/000000.txt", "length": 1000}
+    assert (tmp_path / spill["spill"]).read_text() == "x" * 1000
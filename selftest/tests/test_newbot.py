@@ -1,4 +1,24 @@
+from typing import Any
+
+import pytest
+
 import tbot
 import tbot.newbot  # noqa: F401
 
-# TODO: Write tests...
+
+@pytest.mark.parametrize(  # type: ignore
+    "option", ["--log-max-size=1M", "--log-max-testcases=2", "--log-spill-size=1K"]
+)
+def test_log_options_need_log(option: str, capsys: Any) -> None:
+    with pytest.raises(SystemExit):
+        tbot.newbot.main([option, "selftest"])
+    assert "requires --json-log-stream" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        tbot.newbot.main(
+            ["--json-log-stream=log.json", "--attach=tbot.sock", option, "selftest"]
+        )
+    assert "not supported with --attach" in capsys.readouterr().err
+
+
+# TODO: Write more tests...
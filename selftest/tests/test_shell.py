@@ -1,8 +1,12 @@
+import asyncio
+import threading
+import time
+
 import pytest
 from conftest import AnyLinuxShell
 import testmachines
 
-from tbot.machine import linux
+from tbot.machine import connector, linux
 from tbot.tc import shell
 import tbot
 
@@ -301,3 +305,99 @@ def test_unclean_shell(tbot_context: tbot.Context) -> None:
             with pytest.raises(tbot.error.UncleanShellError):
                 with lnx.subshell():
                     lnx.exec0("uname")
+
+
+class PoolHost(connector.SubprocessConnector, linux.Bash):
+    # No init() as clones would all try to re-create the workdir at once
+    name = "pool-host"
+
+
+def test_shell_pool(tbot_context: tbot.Context) -> None:
+    with tbot_context.request(testmachines.Localhost) as lo, PoolHost() as lh:
+        with linux.ShellPool(lh, size=3) as pool:
+            outputs = pool.exec_many(["echo", str(i)] for i in range(8))
+            assert outputs == [f"{i}\n" for i in range(8)]
+
+            # Commands run concurrently in separate shells
+            pids = pool.map(lambda m, _: m.env("$"), range(6))
+            assert 1 < len(set(pids)) <= 3
+            assert lh.env("$") not in pids
+
+            assert pool.exec("false").result()[0] == 1
+            with pytest.raises(tbot.error.CommandFailure):
+                pool.exec0("false").result()
+
+            files = [lo.workdir / f"pool-{i}" for i in range(4)]
+            for f in files:
+                f.write_text(f.name)
+            files = [linux.Path(lh, f.at_host(lo)) for f in files]
+            assert pool.map_paths(lambda p: p.read_text(), files) == [
+                f.name for f in files
+            ]
+            for f in files:
+                f.unlink()
+
+
+def test_shell_pool_unhealthy() -> None:
+    with PoolHost() as lh:
+        with linux.ShellPool(lh, size=1) as pool:
+
+            def kill_shell(m: linux.LinuxShell) -> None:
+                m.ch.close()
+                raise Exception("shell died")
+
+            with pytest.raises(Exception, match="shell died"):
+                pool.submit(kill_shell).result()
+
+            # The broken clone was replaced with a fresh one
+            assert pool.exec0("echo", "alive").result() == "alive\n"
+
+            def hang_shell(m: linux.LinuxShell) -> None:
+                m.ch.sendline("sleep 60")
+                raise Exception("shell hung")
+
+            pool.health_check_timeout = 0.5
+            start = time.monotonic()
+            with pytest.raises(Exception, match="shell hung"):
+                pool.submit(hang_shell).result()
+            assert time.monotonic() - start < 10
+            assert pool.exec0("echo", "alive").result() == "alive\n"
+
+
+def test_shell_pool_closes_all_clones() -> None:
+    with PoolHost() as lh:
+        with linux.ShellPool(lh, size=3) as pool:
+            barrier = threading.Barrier(3)
+
+            def hold(m: linux.LinuxShell, _: int) -> linux.LinuxShell:
+                # Keep all three clones checked out at the same time
+                barrier.wait(timeout=30)
+                return m
+
+            clones = pool.map(hold, range(3))
+            assert len({id(m) for m in clones}) == 3
+            assert len(pool._clones) == 3
+
+        assert pool._clones == {}
+        for m in clones:
+            assert m.ch.closed
+        assert not lh.ch.closed
+
+
+def test_exec_async(any_linux_shell: AnyLinuxShell) -> None:
+    with any_linux_shell() as linux_shell:
+
+        async def run() -> None:
+            out = await linux_shell.exec0_async("echo", "Hello World")
+            assert out == "Hello World\n"
+
+            retcode, _ = await linux_shell.exec_async("false")
+            assert retcode == 1
+
+            with pytest.raises(tbot.error.CommandFailure):
+                await linux_shell.exec0_async("false")
+
+        asyncio.run(run())
+
+        # The shell is still usable synchronously afterwards
+        assert linux_shell.exec0("echo", "sync") == "sync\n"
@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Callable, List
+
+import pytest
+
+import testmachines
+
+import tbot
+from tbot import tc
+
+from .test_log import capture_log
+
+
+class RoleA(tbot.role.Role):
+    pass
+
+
+class RoleB(tbot.role.Role):
+    pass
+
+
+def make_test(name: str, active: List[str], overlaps: List[str]) -> Callable[[], None]:
+    lock = threading.Lock()
+
+    @tbot.named_testcase(name)
+    def test() -> None:
+        with lock:
+            if active:
+                overlaps.append(name)
+            active.append(name)
+        time.sleep(0.2)
+        with lock:
+            active.remove(name)
+        tbot.log.message(f"done {name}")
+
+    return test
+
+
+def test_parallel_testsuite_disjoint() -> None:
+    # Both testcases must be running at the same time to pass the barrier
+    barrier = threading.Barrier(2)
+
+    def make_meeting_test(name: str) -> Callable[[], None]:
+        @tbot.named_testcase(name)
+        def test() -> None:
+            barrier.wait(timeout=10)
+            tbot.log.message(f"done {name}")
+
+        return test
+
+    test_a = tc.requires(RoleA)(make_meeting_test("test_a"))
+    test_b = tc.requires(RoleB)(make_meeting_test("test_b"))
+
+    with capture_log() as events:
+        tc.parallel_testsuite(test_a, test_b)
+
+    # Each testcase's events must stay together in the log
+    names = [ev["data"].get("name") for ev in events if ev["type"][0] == "tc"]
+    assert names[0] == "parallel_testsuite"
+    assert names[-1] == "parallel_testsuite"
+    pairs = names[1:-1]
+    assert sorted(pairs) == ["test_a", "test_a", "test_b", "test_b"]
+    assert pairs[0] == pairs[1] and pairs[2] == pairs[3]
+
+
+def test_parallel_testsuite_conflicting() -> None:
+    active: List[str] = []
+    overlaps: List[str] = []
+    tests = [
+        tc.requires(RoleA)(make_test(f"test_{i}", active, overlaps)) for i in range(3)
+    ]
+
+    tc.parallel_testsuite(*tests)
+    assert overlaps == []
+
+
+def test_parallel_testsuite_failure() -> None:
+    @tbot.testcase
+    def failing() -> None:
+        raise ValueError("oops")
+
+    @tbot.testcase
+    def passing() -> None:
+        pass
+
+    with pytest.raises(Exception, match="1/2 tests failed"):
+        tc.parallel_testsuite(failing, passing, workers=1)
+
+
+def test_uboot_testpy_socket_relay(tbot_context: tbot.Context) -> None:
+    from tbot.machine import channel
+    from tbot.tc.uboot.testpy import setup_socket_testhooks
+
+    resets = []
+    with tbot_context.request(testmachines.Localhost) as lh:
+        with lh.clone() as bh, bh.subshell():
+            with setup_socket_testhooks(bh) as relay:
+                with channel.SubprocessChannel() as chan_uboot:
+                    script = """\
+u-boot-test-reset
+{ printf 'echo relay-$((40+2))\\n'; sleep 1; } \\
+    | timeout 3 u-boot-test-console | grep -m1 relay-42
+"""
+                    with bh.run("bash", "-c", script) as chan_testpy:
+                        relay.run(chan_uboot, chan_testpy, lambda: resets.append(1))
+
+    assert resets == [1]
+
+
+def test_uboot_testpy_socket_relay_console() -> None:
+    import socket
+
+    from tbot.machine import channel
+    from tbot.tc.uboot.testpy import SocketRelay
+
+    with SocketRelay() as relay, channel.SubprocessChannel() as chan_uboot:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as hook:
+            hook.connect(relay.path)
+            # The first line and console data may arrive in a single read
+            hook.sendall(b"CONSOLE\necho relay-$((40+2))\n")
+            relay._accept(chan_uboot, lambda: None)
+            assert relay._console is not None
+            # Whatever was not part of the first read is relayed as usual
+            chan_uboot.send(relay._console.recv(1024))
+            chan_uboot.expect("relay-42", timeout=10)
+
+        # test/py's console went away while U-Boot still sends output
+        relay._send_console(b"late output")
+        assert relay._console is None
+        assert relay._pending == b"late output"
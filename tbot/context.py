@@ -1,5 +1,7 @@
 import collections
 import contextlib
+import contextvars
+import threading
 import typing
 from typing import (
     Any,
@@ -8,6 +10,7 @@ from typing import (
     DefaultDict,
     Dict,
     Generic,
+    Hashable,
     Iterator,
     List,
     Optional,
@@ -25,13 +28,39 @@ from tbot import machine
 
 M = TypeVar("M", bound=machine.Machine)
 
+# Instance which is currently being initialized by this thread.  Requests made
+# during its initialization are its dependencies and are owned by it instead
+# of by the thread.
+_INIT_OWNER: "contextvars.ContextVar[Optional[InstanceManager]]" = (
+    contextvars.ContextVar("tbot_context_init_owner", default=None)
+)
+
+
+def _current_owner() -> Hashable:
+    owner = _INIT_OWNER.get()
+    return owner if owner is not None else threading.get_ident()
+
 
 class InstanceManager(Generic[M]):
     def __init__(self) -> None:
         self._cx = contextlib.ExitStack()
-        self._current_users = 0
+        # Users are counted per owner: the thread which made the request or,
+        # for dependencies, the instance which made it during initialization
+        self._current_users: typing.Counter[Hashable] = collections.Counter()
         self._instance: Optional[M] = None
         self._available = False
+        self._exclusive_thread: Optional[int] = None
+        # Thread which is currently initializing or tearing down this instance
+        self._busy_thread: Optional[int] = None
+        # Instances this one requested during its initialization
+        self._dependencies: List["InstanceManager"] = []
+        self.prewarmed = False
+        self.prewarm_error: Optional[BaseException] = None
+
+        # Guards all state of this instance.  Other threads wait on `cond`
+        # until an instance becomes available to them.
+        self.lock = threading.RLock()
+        self.cond = threading.Condition(self.lock)
 
     def init(
         self,
@@ -39,67 +68,174 @@ class InstanceManager(Generic[M]):
         context: Optional[ContextManager[M]] = None,
         instance: Optional[M] = None,
     ) -> None:
+        """
+        Initialize the instance.
+
+        Must be called with ``lock`` held (once).  The lock is released while
+        the machine initializes, which can take a long time for a board, and
+        other threads wait for the initialization to finish instead.
+        """
         if self._instance is not None:
             raise tbot.error.ContextError("trying to re-initialize a live instance")
 
-        self._cx = contextlib.ExitStack()
-        self._available = True
-
         if instance is not None and context is not None:
             raise ValueError("cannot have both `context` and `instance` arguments")
-        elif instance is not None:
-            self._instance = self._cx.enter_context(instance)  # type: ignore
-        elif context is not None:
-            self._instance = self._cx.enter_context(context)
-        else:
+        if instance is not None:
+            context = typing.cast(ContextManager[M], instance)
+        elif context is None:
             raise ValueError("needs either `context` or `instance` argument")
 
+        cx = contextlib.ExitStack()
+        self._busy_thread = threading.get_ident()
+        self.lock.release()
+        try:
+            token = _INIT_OWNER.set(self)
+            try:
+                m = cx.enter_context(context)
+            finally:
+                _INIT_OWNER.reset(token)
+        finally:
+            self.lock.acquire()
+            self._busy_thread = None
+            self._notify_dependencies()
+
+        self._cx = cx
+        self._instance = m
+        self._available = True
+
     def teardown(self) -> None:
-        if self._instance is None:
-            raise tbot.error.ContextError("trying to de-init a closed instance")
+        with self.cond:
+            if self._instance is None:
+                raise tbot.error.ContextError("trying to de-init a closed instance")
+
+            # Necessary to ensure any open contexts for this machine do not
+            # prevent it from running its deinitialization code:
+            self._instance._rc = 1
+
+            # Deinitialization uses the dependencies again (e.g. a board
+            # powering off through the lab-host), so wait until no other
+            # thread is using them and block others while tearing down.
+            self._busy_thread = threading.get_ident()
+            try:
+                for dependency in list(self._dependencies):
+                    with dependency.cond:
+                        dependency.wait_for_other_threads()
+
+                self._cx.close()
+            finally:
+                self._instance = None
+                self._exclusive_thread = None
+                self._busy_thread = None
+                self.prewarmed = False
+                self._notify_dependencies()
+
+    def _notify_dependencies(self) -> None:
+        # Threads waiting for this instance or for one of its dependencies
+        # might be able to continue now.  Must be called with `lock` held.
+        self.cond.notify_all()
+        for dependency in self._dependencies:
+            with dependency.cond:
+                dependency.cond.notify_all()
+
+    def _thread_of(self, owner: Hashable) -> Optional[int]:
+        if isinstance(owner, InstanceManager):
+            # Dependencies are in use while their owner is initialized or
+            # torn down; otherwise they are only held.
+            return owner._busy_thread
+        return typing.cast(int, owner)
+
+    def wait_for_other_threads(self) -> None:
+        """
+        Wait until no other thread blocks the current thread from using this instance.
+
+        Machines are not safe to be used by multiple threads at the same time,
+        so other threads block the current one while they are using the
+        instance.  Conflicts with requests of the current thread are not
+        waited for; they are reported by :py:meth:`request` as before.
 
-        # Necessary to ensure any open contexts for this machine do not
-        # prevent it from running its deinitialization code:
-        self._instance._rc = 1
+        Dependencies requested while initializing another instance (e.g. the
+        lab-host of a board) count as used by the thread which initializes or
+        tears down that instance.  In between, they are only held by it and do
+        not block other threads.
 
-        self._cx.close()
-        self._instance = None
+        Must be called with ``lock`` held.
+        """
+        me = threading.get_ident()
+
+        def blocked() -> bool:
+            if self._busy_thread not in (None, me):
+                return True
+            if self._exclusive_thread not in (None, me):
+                return True
+            return any(
+                n > 0 and self._thread_of(o) not in (None, me)
+                for o, n in self._current_users.items()
+            )
+
+        while blocked():
+            # Every release of a request, every finished initialization, and
+            # every teardown notifies us
+            self.cond.wait()
 
     @contextlib.contextmanager
     def request(self, exclusive: bool = False, keep_alive: bool = False) -> Iterator[M]:
-        if self._instance is None:
-            raise tbot.error.ContextError("trying to access a closed instance")
+        me = threading.get_ident()
+        owner = _current_owner()
 
-        if not self._available:
-            raise tbot.error.ContextError(
-                "trying to access instance which is not available"
-            )
+        with self.cond:
+            if self._instance is None:
+                raise tbot.error.ContextError("trying to access a closed instance")
 
-        try:
-            self._current_users += 1
+            if not self._available:
+                raise tbot.error.ContextError(
+                    "trying to access instance which is not available"
+                )
+
+            self._current_users[owner] += 1
+            if isinstance(owner, InstanceManager):
+                owner._dependencies.append(self)
 
             if exclusive:
                 # Mark the instance as exclusively used so no future request()
                 # will succeed.
                 self._available = False
+                self._exclusive_thread = me
 
-            with self._instance as m:
-                yield m
+            # Enter the machine with the lock held as other threads might be
+            # entering and exiting it concurrently.
+            instance = self._instance
+            m = instance.__enter__()
+
+        exc_info: Tuple[Any, Any, Any] = (None, None, None)
+        try:
+            yield m
+        except BaseException as e:
+            exc_info = (type(e), e, e.__traceback__)
+            raise
         finally:
-            self._current_users -= 1
+            with self.cond:
+                instance.__exit__(*exc_info)
+
+                self._current_users[owner] -= 1
+                if self._current_users[owner] == 0:
+                    del self._current_users[owner]
+                if isinstance(owner, InstanceManager):
+                    owner._dependencies.remove(self)
 
-            if exclusive or (not keep_alive and self._current_users == 0):
-                # If we were the last user or the request() was an exclusive
-                # one, tear down this instance now.  Future requests will then
-                # need to re-initilize it.
-                if self.is_alive():
-                    self.teardown()
+                if exclusive or (not keep_alive and not self.has_users()):
+                    # If we were the last user or the request() was an exclusive
+                    # one, tear down this instance now.  Future requests will then
+                    # need to re-initilize it.
+                    if self.is_alive():
+                        self.teardown()
+
+                self.cond.notify_all()
 
     def is_alive(self) -> bool:
         return self._instance is not None
 
     def has_users(self) -> bool:
-        return self._current_users != 0
+        return sum(self._current_users.values()) != 0
 
 
 class Context(typing.ContextManager):
@@ -110,6 +246,29 @@ class Context(typing.ContextManager):
     instance of this class instead of instantiating :py:class:`tbot.Context`
     yourself.  See the :ref:`context` guide for a detailed introduction.
 
+    A context can be shared by multiple threads, for example to drive
+    several boards in parallel from one tbot process.  Machines must not be
+    used by two threads at the same time, so a request for an instance which
+    another thread is currently using waits until that thread is done with
+    it.  Nested requests from the same thread share the instance as usual.
+    Each instance is only ever initialized by one thread at a time.
+
+    Machines requested while another machine initializes (for example the
+    lab-host of a board) count as used by the thread initializing or tearing
+    down that machine.  So two boards sharing a lab-host can be driven from
+    two threads; their power-on and power-off through the lab-host take
+    turns.  While a board is merely in use, it does not block its lab-host.
+    If a testcase runs commands on ``board.host`` directly while other
+    threads use the lab-host, it should request the lab-host itself.
+    Requests of multiple machines from different threads should happen in
+    the same order to avoid deadlocks.  Worker threads should enter
+    :py:func:`tbot.log.isolated_state` so their log output is nested
+    properly.
+
+    .. versionchanged:: UNRELEASED
+
+        ``Context`` is now thread-safe.
+
     In case you do need to construct a context yourself, there are a few
     customization possibilities:
 
@@ -129,6 +288,7 @@ class Context(typing.ContextManager):
             in a clean state.  If a testcase can't guarantee this, it should
             request the instance with ``reset_on_error=True`` or even
             ``exclusive=True``.
+
     :param bool add_defaults: Add default machines for some roles from
         :py:mod:`tbot.role`, for example for :py:class:`tbot.role.LocalHost`.
         Defaults to ``False``.
@@ -154,6 +314,9 @@ class Context(typing.ContextManager):
         self._instances: DefaultDict[Type[machine.Machine], InstanceManager] = (
             collections.defaultdict(InstanceManager)
         )
+        # Guards the registry of instances; each instance has its own lock
+        self._lock = threading.RLock()
+        self._prewarm_threads: List[threading.Thread] = []
 
         if add_defaults:
             tbot.role._register_default_machines(self)
@@ -229,7 +392,8 @@ class Context(typing.ContextManager):
         else:
             raise tbot.error.MachineNotFoundError(f"no machine found for {type!r}")
 
-        instance = self._instances[machine_class]
+        with self._lock:
+            instance = self._instances[machine_class]
 
         return (machine_class, instance)
 
@@ -352,18 +516,33 @@ class Context(typing.ContextManager):
 
         machine_class, instance = self._get_class_and_instance(type)
 
-        if instance.is_alive() and reset:
-            # Requester wants the machine to be re-initialized if it is already alive.
-            instance.teardown()
+        with contextlib.ExitStack() as cx:
+            with instance.lock:
+                if instance.prewarm_error is not None:
+                    # Initialization in the background failed; report it here
+                    # instead of waiting for another failed attempt.
+                    error, instance.prewarm_error = instance.prewarm_error, None
+                    raise error
+
+                # When other threads are using this instance in a conflicting
+                # way, wait for them to finish.
+                instance.wait_for_other_threads()
 
-        if not instance.is_alive():
-            instance.init(context=machine_class.from_context(self))
+                if instance.is_alive() and reset:
+                    # Requester wants the machine to be re-initialized if it is
+                    # already alive.
+                    instance.teardown()
+
+                if not instance.is_alive():
+                    instance.init(context=machine_class.from_context(self))
+
+                m = cx.enter_context(instance.request(exclusive, self._keep_alive))
 
-        with instance.request(exclusive, self._keep_alive) as m:
             assert isinstance(m, machine_class), f"machine type mismatch"
 
-            if machine_class not in self._teardown_order:
-                self._teardown_order.append(machine_class)
+            with self._lock:
+                if machine_class not in self._teardown_order:
+                    self._teardown_order.append(machine_class)
 
             try:
                 yield m
@@ -381,6 +560,74 @@ class Context(typing.ContextManager):
                             instance.teardown()
                 raise e from None
 
+    def prewarm(self, *roles: Callable[..., M]) -> None:
+        """
+        Start initializing machines for the given roles in the background.
+
+        Booting a board can take a long time.  ``prewarm()`` allows starting
+        this early, for example while a build is still running.  A later
+        :py:meth:`request` for the role will then only block until the
+        instance is ready (or return it immediately if it already is).  If
+        initialization fails, the exception is raised from the next
+        ``request()`` for the role.
+
+        **Example**:
+
+        .. code-block:: python
+
+            @tbot.testcase
+            def build_and_test() -> None:
+                tbot.ctx.prewarm(tbot.role.BoardLinux)
+
+                with tbot.ctx.request(tbot.role.BuildHost) as bh:
+                    build_software(bh)
+
+                with tbot.ctx.request(tbot.role.BoardLinux) as lnx:
+                    run_tests(lnx)
+
+        The context must be active (see :py:meth:`is_active`) so prewarmed
+        machines which are never requested can be torn down when it is exited.
+        Log output of the background initialization is emitted in one piece
+        once it is done.
+
+        .. versionadded:: UNRELEASED
+        """
+        if not self.is_active():
+            raise tbot.error.ContextError(
+                "machines can only be prewarmed in an active context"
+            )
+
+        for role in roles:
+            machine_class, instance = self._get_class_and_instance(role)
+            thread = threading.Thread(
+                target=self._prewarm,
+                args=(machine_class, instance),
+                name=f"tbot-prewarm-{machine_class.__name__}",
+                daemon=True,
+            )
+            with self._lock:
+                self._prewarm_threads.append(thread)
+            thread.start()
+
+    def _prewarm(self, machine_class: Type[M], instance: InstanceManager) -> None:
+        with tbot.log.isolated_state(), tbot.log.buffered():
+            try:
+                with instance.lock:
+                    instance.wait_for_other_threads()
+                    if instance.is_alive():
+                        return
+
+                    instance.init(context=machine_class.from_context(self))
+                    instance.prewarmed = True
+
+                with self._lock:
+                    if machine_class not in self._teardown_order:
+                        self._teardown_order.append(machine_class)
+            except Exception as e:
+                tbot.log.warning(f"Prewarming {machine_class!r} failed: {e}")
+                with instance.lock:
+                    instance.prewarm_error = e
+
     def get_machine_class(self, type: Callable[..., M]) -> Type[M]:
         """
         Return the registered machine class for a :py:class:`~tbot.role.Role`.
@@ -402,11 +649,12 @@ class Context(typing.ContextManager):
         """
         _, instance = self._get_class_and_instance(type)
 
-        if instance.is_alive():
-            instance.teardown()
-            return True
-        else:
-            return False
+        with instance.lock:
+            if instance.is_alive():
+                instance.teardown()
+                return True
+            else:
+                return False
 
     @contextlib.contextmanager
     def reconfigure(
@@ -456,8 +704,9 @@ class Context(typing.ContextManager):
             if keep_alive_orig is False and keep_alive is True:
                 for cls in reversed(self._teardown_order):
                     inst = self._instances[cls]
-                    if inst.is_alive() and not inst.has_users():
-                        inst.teardown()
+                    with inst.lock:
+                        if inst.is_alive() and not inst.has_users():
+                            inst.teardown()
 
     def is_active(self) -> bool:
         """
@@ -495,13 +744,18 @@ class Context(typing.ContextManager):
     def __exit__(self, *args: Any) -> None:
         try:
             if self._open_contexts == 1:
+                with self._lock:
+                    prewarm_threads, self._prewarm_threads = self._prewarm_threads, []
+                for thread in prewarm_threads:
+                    thread.join()
+
                 for cls in reversed(self._teardown_order):
                     inst = self._instances[cls]
                     if inst.is_alive():
-                        if self._keep_alive:
-                            # If we kept instances alive, now is a good time to
-                            # finally tear them down; there won't be any users
-                            # after this point...
+                        if self._keep_alive or inst.prewarmed:
+                            # If we kept instances alive (or prewarmed them),
+                            # now is a good time to finally tear them down;
+                            # there won't be any users after this point...
                             inst.teardown()
                         else:
                             tbot.log.warning(
@@ -0,0 +1,339 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Long-running tbot server which keeps machines alive between runs.
+
+``newbot --serve SOCKET`` loads the configuration and then waits for clients
+on a Unix socket.  ``newbot --attach SOCKET`` clients send the testcases they
+want to run, the server runs them against its (kept alive) machines and
+streams the console output back.  This saves the time for powering on,
+booting, and logging into boards on every run.
+
+The protocol is newline-delimited JSON.  A client sends a single request:
+
+.. code-block:: text
+
+    {"testcases": [...], "flags": [...], "verbosity": 3, "color": true,
+     "cwd": "/path/to/tests", "log": null}
+
+and the server answers with any number of ``{"out": "..."}`` messages followed
+by a final ``{"done": true, "success": true}``.  If the request could not
+be run at all, the final message also contains an ``"error"``.
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import traceback
+import typing
+
+import tbot
+import tbot.error
+import tbot.log
+import tbot.log_event
+from tbot.machine import board, linux
+
+__all__ = ("serve", "attach")
+
+
+class _ClientStream(io.TextIOBase):
+    """Stdout replacement which forwards everything to a client."""
+
+    def __init__(self, conn: socket.socket) -> None:
+        self.conn = conn
+        self.connected = True
+
+    def send(self, msg: typing.Dict[str, typing.Any]) -> None:
+        if not self.connected:
+            return
+
+        try:
+            self.conn.sendall(json.dumps(msg).encode("utf-8") + b"\n")
+        except OSError:
+            # The client went away.  The run continues regardless but will be
+            # treated as having left the machines dirty.
+            self.connected = False
+
+    def write(self, s: str) -> int:
+        self.send({"out": s})
+        return len(s)
+
+    def isatty(self) -> bool:
+        return False
+
+
+def health_check(ctx: tbot.Context, timeout: float = 5.0) -> None:
+    """
+    Check that all idle machines in ``ctx`` still respond and tear down those which don't.
+
+    A machine which does not show its prompt again within ``timeout`` seconds
+    is considered dead.
+    """
+    for cls in reversed(ctx._teardown_order):
+        inst = ctx._instances[cls]
+        with inst.lock:
+            m = inst._instance
+            if m is None or inst.has_users():
+                continue
+
+            try:
+                if isinstance(m, (linux.LinuxShell, board.UBootShell)):
+                    # Not m.test() as that would wait forever for a hung machine
+                    m.ch.sendline("true")
+                    m.ch.read_until_prompt(timeout=timeout)
+                healthy = True
+            except Exception:
+                healthy = False
+
+            if not healthy:
+                tbot.log.warning(f"{m.name!r} is not responding, resetting it.")
+                inst.teardown()
+
+
+def reset_all(ctx: tbot.Context) -> None:
+    """Tear down all machines in ``ctx`` which are alive."""
+    for cls in reversed(ctx._teardown_order):
+        inst = ctx._instances[cls]
+        with inst.lock:
+            if inst.is_alive():
+                inst.teardown()
+
+
+def _reload_testcase_modules(testcases: typing.List[str]) -> None:
+    # Testcases are usually edited between runs so make sure to pick up
+    # the changes.  Configuration modules are deliberately not reloaded as
+    # the machine classes of live instances must stay the same.
+    for testcase in testcases:
+        module_name = testcase.rsplit(".", 1)[0]
+        module = sys.modules.get(module_name)
+        if module is not None:
+            importlib.reload(module)
+
+
+def _run(ctx: tbot.Context, request: typing.Dict[str, typing.Any]) -> bool:
+    from tbot import newbot
+
+    _reload_testcase_modules(request["testcases"])
+
+    tbot.log_event.tbot_start()
+    try:
+        health_check(ctx)
+        for testcase in request["testcases"]:
+            newbot.run_testcase(testcase)
+    except Exception as e:
+        trace = traceback.format_exc(limit=-6)
+        tbot.log_event.exception(e.__class__.__name__, trace)
+        tbot.log_event.tbot_end(False)
+        return False
+    except KeyboardInterrupt:
+        tbot.log_event.exception("KeyboardInterrupt", "Test run manually aborted.")
+        tbot.log_event.tbot_end(False)
+        raise
+    else:
+        tbot.log_event.tbot_end(True)
+        return True
+
+
+class RequestError(tbot.error.TbotException):
+    """A client sent an invalid request."""
+
+
+def _parse_request(line: str) -> typing.Dict[str, typing.Any]:
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        raise RequestError(f"malformed request: {e}") from None
+    if not isinstance(request, dict):
+        raise RequestError("request must be a JSON object")
+
+    def is_str_list(value: typing.Any) -> bool:
+        return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+    if not is_str_list(request.get("testcases")):
+        raise RequestError("request needs a list of `testcases`")
+    if not is_str_list(request.setdefault("flags", [])):
+        raise RequestError("`flags` must be a list of strings")
+
+    cwd = request.setdefault("cwd", os.getcwd())
+    if not isinstance(cwd, str) or not os.path.isdir(cwd):
+        raise RequestError(f"working directory {cwd!r} does not exist")
+
+    logfile = request.setdefault("log", None)
+    if logfile is not None and not isinstance(logfile, str):
+        raise RequestError("`log` must be a path or null")
+
+    try:
+        request["verbosity"] = tbot.log.Verbosity(
+            request.get("verbosity", tbot.log.Verbosity.STDOUT)
+        )
+    except ValueError as e:
+        raise RequestError(str(e)) from None
+
+    return request
+
+
+def _serve_request(
+    ctx: tbot.Context, request: typing.Dict[str, typing.Any], stream: _ClientStream
+) -> bool:
+    logfile = request["log"]
+    client_cwd = request["cwd"]
+    old_state = (
+        sys.stdout,
+        tbot.log.IS_COLOR,
+        tbot.log.VERBOSITY,
+        tbot.log.NESTING,
+        tbot.log.LOGFILE,
+    )
+    old_flags = set(tbot.flags)
+    old_cwd = os.getcwd()
+    opened_log: typing.Optional[typing.TextIO] = None
+    success = False
+    ran = False
+
+    sys.path.insert(1, client_cwd)
+    try:
+        os.chdir(client_cwd)
+        if logfile is not None:
+            opened_log = open(logfile, "w")
+
+        tbot.flags.clear()
+        tbot.flags.update(request["flags"])
+        sys.stdout = stream  # type: ignore
+        tbot.log.IS_COLOR = bool(request.get("color", False))
+        tbot.log.VERBOSITY = request["verbosity"]
+        tbot.log.NESTING = -1
+        if opened_log is not None:
+            tbot.log.LOGFILE = opened_log
+
+        ran = True
+        success = _run(ctx, request)
+    finally:
+        tbot.log.flush_console()
+        (
+            sys.stdout,
+            tbot.log.IS_COLOR,
+            tbot.log.VERBOSITY,
+            tbot.log.NESTING,
+            tbot.log.LOGFILE,
+        ) = old_state
+        if opened_log is not None:
+            opened_log.close()
+        tbot.flags.clear()
+        tbot.flags.update(old_flags)
+        sys.path.remove(client_cwd)
+        os.chdir(old_cwd)
+
+        if ran and (not success or not stream.connected):
+            # Whatever the machines were left in, the next client should
+            # not have to deal with it.
+            tbot.log.message("Run failed or client disconnected, resetting machines.")
+            reset_all(ctx)
+
+    return success
+
+
+def _handle(ctx: tbot.Context, conn: socket.socket) -> None:
+    with conn, conn.makefile("r", encoding="utf-8") as f:
+        line = f.readline()
+        if line == "":
+            return
+
+        stream = _ClientStream(conn)
+        try:
+            request = _parse_request(line)
+            success = _serve_request(ctx, request, stream)
+        except Exception as e:
+            # Report problems with this request to the client instead of
+            # taking down the server (and all its machines).
+            tbot.log.warning(f"Client request failed: {e}")
+            stream.send({"done": True, "success": False, "error": str(e)})
+        else:
+            stream.send({"done": True, "success": success})
+
+
+def serve(
+    path: str, ctx: tbot.Context, stop: typing.Optional[threading.Event] = None
+) -> None:
+    """
+    Serve clients on the Unix socket at ``path`` until interrupted.
+
+    ``ctx`` should have ``keep_alive=True`` and must already be active.
+    Clients are handled one after the other.  If ``stop`` is given, the server
+    also returns once it is set and the current client (if any) was handled.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        # Only the current user may run testcases in this process
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(old_umask)
+        sock.listen()
+
+        if stop is not None:
+            # Wake up regularly to notice when the server should stop
+            sock.settimeout(0.2)
+
+        tbot.log.message(f"Waiting for clients on {path!r} ...")
+        try:
+            while stop is None or not stop.is_set():
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    continue
+                try:
+                    _handle(ctx, conn)
+                except Exception as e:
+                    # Never let a single client kill the server
+                    tbot.log.warning(f"Failed to handle client: {e}")
+        finally:
+            os.unlink(path)
+
+
+def attach(
+    path: str,
+    testcases: typing.List[str],
+    *,
+    flags: typing.Iterable[str] = (),
+    verbosity: int = tbot.log.Verbosity.STDOUT,
+    logfile: typing.Optional[str] = None,
+) -> bool:
+    """
+    Run testcases in a tbot server listening on ``path``.
+
+    Output of the run is printed to stdout.
+
+    :returns: Whether the run was successful.
+    """
+    request = {
+        "testcases": testcases,
+        "flags": list(flags),
+        "verbosity": int(verbosity),
+        "color": tbot.log.IS_COLOR,
+        "cwd": os.getcwd(),
+        "log": os.path.abspath(logfile) if logfile is not None else None,
+    }
+
+    with contextlib.ExitStack() as cx:
+        sock = cx.enter_context(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+
+        for line in cx.enter_context(sock.makefile("r", encoding="utf-8")):
+            msg = json.loads(line)
+            if "out" in msg:
+                sys.stdout.write(msg["out"])
+                sys.stdout.flush()
+            elif msg.get("done", False):
+                if "error" in msg:
+                    sys.stderr.write(f"tbot server: {msg['error']}\n")
+                return bool(msg["success"])
+
+    raise tbot.error.TbotException("tbot server closed the connection unexpectedly")
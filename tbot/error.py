@@ -313,3 +313,79 @@ class UnboundedPatternError(ApiViolationError, ValueError):
         self.pattern = pattern
 
         super().__init__(f"Regex expression {pattern!r} is not bounded")
+
+
+class PowercycleKeyConflictError(ApiViolationError):
+    """
+    Two machines with the same ``powercycle_key`` were powered on at once.
+
+    :py:attr:`~tbot.machine.board.PowerControl.powercycle_key` identifies a
+    physical board.  It defaults to the machine name, which is usually set on
+    the board class, so a farm of identical boards driven by one board class
+    runs into this error.  Override ``powercycle_key`` to return something
+    unique to each physical board, like its serial port or power-switch
+    outlet.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, key: typing.Hashable) -> None:
+        self.key = key
+        super().__init__(
+            f"another machine with powercycle_key {key!r} is already powered on"
+            + " (override powercycle_key to tell the physical boards apart)"
+        )
+
+
+class ReplayMismatchError(MachineError):
+    """
+    Data written to a replayed channel differs from the recording.
+
+    See :py:class:`~tbot.machine.channel.record.ReplayChannelIO`.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, offset: int, expected: bytes, actual: bytes) -> None:
+        self.offset = offset
+        self.expected = expected
+        self.actual = actual
+        super().__init__(
+            f"replay diverged at byte {offset} of written data: "
+            f"expected {expected!r}, got {actual!r}"
+        )
+
+
+class TransferError(MachineError):
+    """
+    A transfer of data over a machine's console failed.
+
+    See :py:meth:`UBootShell.load_serial() <tbot.machine.board.UBootShell.load_serial>`
+    and :py:meth:`UBootShell.read_mem() <tbot.machine.board.UBootShell.read_mem>`.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, msg: str, acked: int = 0) -> None:
+        self.acked = acked
+        """
+        Number of bytes the receiver acknowledged before the failure.  A new
+        transfer of the remaining data can pick up from there.
+        """
+
+        super().__init__(msg)
+
+
+class LoginFailedError(MachineError):
+    """
+    Logging into a machine failed because the credentials were rejected.
+
+    See :py:class:`~tbot.machine.board.LinuxBootLogin`.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, username: str, attempts: int) -> None:
+        self.username = username
+        self.attempts = attempts
+        super().__init__(f"login as {username!r} failed {attempts} time(s)")
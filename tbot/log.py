@@ -14,14 +14,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import atexit
 import contextlib
+import contextvars
 import enum
 import io
 import itertools
 import json
 import os
+import pathlib
 import re
 import sys
+import threading
 import time
 import typing
 
@@ -80,10 +84,243 @@ class Verbosity(enum.IntEnum):
 NESTING = -1
 INTERACTIVE = False
 VERBOSITY = Verbosity.COMMAND
-LOGFILE: typing.Optional[typing.TextIO] = None
+LOGFILE: "typing.Optional[typing.Union[typing.TextIO, RotatingLogFile]]" = None
 START_TIME = time.monotonic()
+TRACE_CHANNEL = False
+
+# Minimum time between two flushes of console output (None: flush immediately)
+CONSOLE_FLUSH_INTERVAL: typing.Optional[float] = None
+# Collapse lines which are overwritten using \r on the console
+CONSOLE_COLLAPSE_PROGRESS = False
+
+# Per-thread/per-task overrides of NESTING and VERBOSITY (see isolated_state())
+_NESTING_VAR: "contextvars.ContextVar[typing.Optional[int]]" = contextvars.ContextVar(
+    "tbot_log_nesting", default=None
+)
+_VERBOSITY_VAR: "contextvars.ContextVar[typing.Optional[Verbosity]]" = (
+    contextvars.ContextVar("tbot_log_verbosity", default=None)
+)
+# Serializes writes of whole events to the LOGFILE.  Reentrant because an
+# unclosed EventIO can be garbage-collected (and closed) while writing.
+_LOGFILE_LOCK = threading.RLock()
+
+
+class _OutputBuffer:
+    def __init__(self) -> None:
+        self.console: typing.List[str] = []
+        self.events: typing.List[typing.Dict[str, typing.Any]] = []
+
+
+# Output held back by buffered() for the current thread/task
+_BUFFER_VAR: "contextvars.ContextVar[typing.Optional[_OutputBuffer]]" = (
+    contextvars.ContextVar("tbot_log_buffer", default=None)
+)
 
 _SPLIT_PATTERN = re.compile("(\r|\n)")
+# A line segment which is overwritten by more text following a carriage return
+_PROGRESS_PATTERN = re.compile("(?<=[\r\n])[^\r\n]*\r(?=[^\r\n])")
+# Flush early if this much output is pending, regardless of the interval
+_CONSOLE_BUFFER_LIMIT = 64 * 1024
+
+
+def _stdout_isatty() -> bool:
+    try:
+        return sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+class _Console:
+    """Rate-limited writer for all console output of log events."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._buf: typing.List[str] = []
+        self._pending = 0
+        self._timer: typing.Optional[threading.Timer] = None
+        self._last_flush = 0.0
+        self._at_line_start = True
+
+    def write(self, s: str) -> None:
+        with self._lock:
+            self._buf.append(s)
+            self._pending += len(s)
+
+            interval = CONSOLE_FLUSH_INTERVAL
+            if interval is None:
+                self._flush()
+                return
+
+            # On a terminal, complete lines are shown right away.  Only
+            # output within a line (like progress updates) is rate-limited.
+            if "\n" in s and _stdout_isatty():
+                self._flush()
+                return
+
+            elapsed = time.monotonic() - self._last_flush
+            if elapsed >= interval or self._pending >= _CONSOLE_BUFFER_LIMIT:
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(interval - elapsed, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        self._last_flush = time.monotonic()
+        if not self._buf:
+            return
+
+        buf = "".join(self._buf)
+        self._buf.clear()
+        self._pending = 0
+
+        if CONSOLE_COLLAPSE_PROGRESS and CONSOLE_FLUSH_INTERVAL is not None:
+            # Only collapse segments starting at a line boundary as the
+            # terminal might already show a part of the line otherwise.
+            start = "\n" if self._at_line_start else ""
+            buf = _PROGRESS_PATTERN.sub("", start + buf)[len(start) :]
+        self._at_line_start = buf.endswith(("\r", "\n"))
+
+        sys.stdout.write(buf)
+        sys.stdout.flush()
+
+
+_CONSOLE = _Console()
+# Don't lose buffered output when tbot exits
+atexit.register(_CONSOLE.flush)
+
+
+def _console_write(s: str) -> None:
+    buf = _BUFFER_VAR.get()
+    if buf is None:
+        _CONSOLE.write(s)
+    else:
+        buf.console.append(s)
+
+
+def _write_events(events: typing.List[typing.Dict[str, typing.Any]]) -> None:
+    buf = _BUFFER_VAR.get()
+    if buf is not None:
+        buf.events.extend(events)
+        return
+
+    with _LOGFILE_LOCK:
+        if LOGFILE is None:
+            return
+
+        if isinstance(LOGFILE, RotatingLogFile):
+            for ev in events:
+                LOGFILE.write_event(ev)
+        else:
+            LOGFILE.write("".join(json.dumps(ev, indent=2) + "\n" for ev in events))
+            LOGFILE.flush()
+
+
+@contextlib.contextmanager
+def buffered() -> typing.Iterator[None]:
+    """
+    Hold back all log output of the current thread (or asyncio task).
+
+    Console output and logfile events are collected while this
+    context-manager is active and emitted in one piece when it exits.  This
+    keeps the output of testcases which run in parallel from being
+    interleaved.  :py:func:`tbot.tc.parallel_testsuite` uses this for each
+    testcase.
+
+    .. versionadded:: UNRELEASED
+    """
+    buf = _OutputBuffer()
+    token = _BUFFER_VAR.set(buf)
+    try:
+        yield None
+    finally:
+        _BUFFER_VAR.reset(token)
+
+        # If buffers are nested, this adds everything to the outer one
+        if buf.console:
+            _console_write("".join(buf.console))
+        if buf.events:
+            _write_events(buf.events)
+
+
+def flush_console() -> None:
+    """
+    Write out all console output which is still pending.
+
+    Only relevant when :py:data:`CONSOLE_FLUSH_INTERVAL` is set.  Call this
+    before writing to the terminal directly or reading user input.
+
+    .. versionadded:: UNRELEASED
+    """
+    _CONSOLE.flush()
+
+
+def _nesting() -> int:
+    nesting = _NESTING_VAR.get()
+    return NESTING if nesting is None else nesting
+
+
+def _set_nesting(nesting: int) -> None:
+    global NESTING
+
+    if _NESTING_VAR.get() is None:
+        NESTING = nesting
+    else:
+        _NESTING_VAR.set(nesting)
+
+
+def _verbosity() -> Verbosity:
+    verbosity = _VERBOSITY_VAR.get()
+    return VERBOSITY if verbosity is None else verbosity
+
+
+def _set_verbosity(verbosity: Verbosity) -> None:
+    global VERBOSITY
+
+    if _VERBOSITY_VAR.get() is None:
+        VERBOSITY = verbosity
+    else:
+        _VERBOSITY_VAR.set(verbosity)
+
+
+@contextlib.contextmanager
+def isolated_state() -> typing.Iterator[None]:
+    """
+    Give the current thread (or asyncio task) its own log nesting and verbosity.
+
+    Inside this context-manager, changes to the nesting (e.g. by entering
+    testcases) and to the verbosity (e.g. via :py:func:`with_verbosity`) only
+    affect the current thread or task.  They start out with the values which
+    were active when entering.  Use this when running testcases in parallel:
+
+    .. code-block:: python
+
+        def worker():
+            with tbot.log.isolated_state():
+                my_testcase()
+
+        threading.Thread(target=worker).start()
+
+    Note that new threads do not inherit the state of the thread which started
+    them, so ``isolated_state()`` must be entered in the new thread.
+
+    .. versionadded:: UNRELEASED
+    """
+    nesting_token = _NESTING_VAR.set(_nesting())
+    verbosity_token = _VERBOSITY_VAR.set(_verbosity())
+    try:
+        yield None
+    finally:
+        _VERBOSITY_VAR.reset(verbosity_token)
+        _NESTING_VAR.reset(nesting_token)
 
 
 @contextlib.contextmanager
@@ -118,24 +355,21 @@ def with_verbosity(
         Added the ``only_decrease`` parameter.
     """
 
-    global VERBOSITY
-    global NESTING
-
-    old_verbosity = VERBOSITY
-    old_nesting = NESTING
+    old_verbosity = _verbosity()
+    old_nesting = _nesting()
 
     try:
-        if not only_decrease or verbosity < VERBOSITY:
-            VERBOSITY = verbosity
+        if not only_decrease or verbosity < old_verbosity:
+            _set_verbosity(verbosity)
 
         if nesting is not None:
-            NESTING = nesting
+            _set_nesting(nesting)
 
         yield None
     finally:
-        VERBOSITY = old_verbosity
+        _set_verbosity(old_verbosity)
         if nesting is not None:
-            NESTING = old_nesting
+            _set_nesting(old_nesting)
 
 
 class EventIO(io.StringIO):
@@ -169,45 +403,57 @@ class EventIO(io.StringIO):
         self.data = kwargs
         self._nextline = True
 
+        if (
+            self.verbosity > _verbosity()
+            and isinstance(message, str)
+            and "\n" not in message
+        ):
+            # Fast path: Nothing will be printed and there is no message body
+            # which needs to be added to the event.
+            return
+
         msg = str(message).split("\n", 1)
-        if self.verbosity <= VERBOSITY:
-            print(self._prefix(nest_first or u("├─", "+-")) + msg[0])
+        if self.verbosity <= _verbosity():
+            _console_write(self._prefix(nest_first or u("├─", "+-")) + msg[0] + "\n")
         if len(msg) > 1:
             self.writeln(msg[1])
 
     def _prefix(self, nest_first: typing.Optional[str] = None) -> str:
-        if NESTING == -1:
+        nesting = _nesting()
+        if nesting == -1:
             return ""
 
         after = nest_first if nest_first is not None else u("│ ", "| ")
         prefix: str = self.prefix or ""
         return (
-            str(c("".join(itertools.repeat(u("│   ", "|   "), NESTING)) + after).dark)
+            str(c("".join(itertools.repeat(u("│   ", "|   "), nesting)) + after).dark)
             + prefix
         )
 
     def _print_stdout(self, last: bool = False) -> None:
-        buf = self.getvalue()[self.cursor :]
-
-        if self.verbosity > VERBOSITY:
+        if self.verbosity > _verbosity():
             return
 
+        buf = self.getvalue()[self.cursor :]
+        out = []
+
         for fragment in (f for f in _SPLIT_PATTERN.split(buf) if f != ""):
             if self._nextline:
-                sys.stdout.write(self._prefix() + c(""))
+                out.append(self._prefix() + c(""))
                 self._nextline = False
 
             if fragment in ["\r", "\n"]:
                 self._nextline = True
 
-            sys.stdout.write(fragment)
+            out.append(fragment)
 
         if last and not self._nextline:
-            sys.stdout.write("\n")
+            out.append("\n")
             self._nextline = True
 
         self.cursor += len(buf)
-        sys.stdout.flush()
+        if out:
+            _console_write("".join(out))
 
     def writeln(self, s: typing.Union[str, _TC]) -> int:
         """Add a line to this log event."""
@@ -221,17 +467,18 @@ class EventIO(io.StringIO):
         written.
         """
 
-        s = (
-            s.replace("\x1B[H", "")
-            .replace("\x1B[999;999H", "")
-            .replace("\x1B[6n", "")
-            .replace("\x1B[2J", "")
-            .replace("\x1B[r", "")
-            .replace("\x1B[u", "")
-            .replace("\x1B7", "")
-            .replace("\r\n", "\n")
-            .replace("\n\r", "\n")
-        )
+        if "\x1B" in s:
+            s = (
+                s.replace("\x1B[H", "")
+                .replace("\x1B[999;999H", "")
+                .replace("\x1B[6n", "")
+                .replace("\x1B[2J", "")
+                .replace("\x1B[r", "")
+                .replace("\x1B[u", "")
+                .replace("\x1B7", "")
+            )
+        if "\r" in s:
+            s = s.replace("\r\n", "\n").replace("\n\r", "\n")
 
         res = super().write(s)
 
@@ -258,9 +505,7 @@ class EventIO(io.StringIO):
                 "data": self.data,
             }
 
-            json.dump(ev, LOGFILE, indent=2)
-            LOGFILE.write("\n")
-            LOGFILE.flush()
+            _write_events([ev])
 
         super().close()
 
@@ -269,6 +514,146 @@ class EventIO(io.StringIO):
             self.close()
 
 
+class RotatingLogFile:
+    """
+    Logfile which is split into multiple segments.
+
+    A new segment is started once the current one exceeds ``max_size`` bytes
+    or after ``max_testcases`` top-level testcases were completed.  The file
+    at ``path`` itself is a manifest listing all segments in order.  It is
+    updated whenever a new segment is started so it is always consistent, even
+    if tbot is killed in the middle of a run.
+
+    Additionally, string values in event data which are longer than
+    ``spill_size`` characters (e.g. huge ``stdout`` of a command) are moved into
+    separate files and replaced by a ``{"spill": <path>, "length": <n>}``
+    reference.  The ``logparser`` used by the generators resolves both
+    manifests and spilled data transparently.
+
+    **Example**:
+
+    .. code-block:: python
+
+        tbot.log.LOGFILE = tbot.log.RotatingLogFile(
+            "soak.json", max_size=64 * 1024 * 1024, spill_size=1024 * 1024
+        )
+
+    :param path: Path of the manifest.  Segments are created next to it as
+        ``<stem>.0000<suffix>``, ``<stem>.0001<suffix>``, etc., spilled data in
+        a ``<name>.spill/`` directory.
+    :param int max_size: Maximum size of a segment (in characters).  The
+        segment is rotated after the event which crosses this size.
+    :param int max_testcases: Maximum number of top-level testcases per
+        segment.
+    :param int spill_size: Maximum length of a single string value in event
+        data before it is spilled into a separate file.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(
+        self,
+        path: typing.Union[str, "os.PathLike[str]"],
+        *,
+        max_size: typing.Optional[int] = None,
+        max_testcases: typing.Optional[int] = None,
+        spill_size: typing.Optional[int] = None,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.name = str(self.path)
+        self.max_size = max_size
+        self.max_testcases = max_testcases
+        self.spill_size = spill_size
+        self.segments: typing.List[str] = []
+
+        self._spill_dir = self.path.with_name(self.path.name + ".spill")
+        self._spill_count = 0
+        self._file: typing.Optional[typing.TextIO] = None
+        self._size = 0
+        self._tc_depth = 0
+        self._tc_count = 0
+        self._open_segment()
+
+    def _open_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+        name = f"{self.path.stem}.{len(self.segments):04}{self.path.suffix}"
+        self._file = open(self.path.with_name(name), "w")
+        self._size = 0
+        self._tc_count = 0
+        self.segments.append(name)
+
+        # Replace atomically so the manifest is never seen half-written
+        manifest = self.path.with_name(self.path.name + ".tmp")
+        manifest.write_text(json.dumps({"segments": self.segments}, indent=2) + "\n")
+        os.replace(manifest, self.path)
+
+    def _spill(
+        self, data: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        assert self.spill_size is not None
+        spilled = {}
+        for key, value in data.items():
+            if isinstance(value, str) and len(value) > self.spill_size:
+                if self._spill_count == 0:
+                    self._spill_dir.mkdir(exist_ok=True)
+                spill_file = self._spill_dir / f"{self._spill_count:06}.txt"
+                self._spill_count += 1
+                spill_file.write_text(value)
+                value = {
+                    "spill": f"{self._spill_dir.name}/{spill_file.name}",
+                    "length": len(value),
+                }
+            spilled[key] = value
+        return spilled
+
+    def write_event(self, ev: typing.Dict[str, typing.Any]) -> None:
+        """Write a single (serializable) log event."""
+        assert self._file is not None
+        if self.spill_size is not None:
+            ev = dict(ev, data=self._spill(ev["data"]))
+
+        raw = json.dumps(ev, indent=2) + "\n"
+        self._file.write(raw)
+        self._file.flush()
+        self._size += len(raw)
+
+        if ev["type"][0] == "tc":
+            if ev["type"][1] == "begin":
+                self._tc_depth += 1
+            elif ev["type"][1] == "end":
+                self._tc_depth -= 1
+                if self._tc_depth == 0:
+                    self._tc_count += 1
+
+        if (self.max_size is not None and self._size >= self.max_size) or (
+            self.max_testcases is not None
+            and self._tc_depth == 0
+            and self._tc_count >= self.max_testcases
+        ):
+            self._open_segment()
+
+    def close(self) -> None:
+        """Close the current segment."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def is_silent(verbosity: Verbosity) -> bool:
+    """
+    Check whether an event of the given verbosity would be discarded entirely.
+
+    This is the case when it would neither be printed (``verbosity`` is above
+    the current :py:data:`VERBOSITY`) nor persisted (no logfile is written).
+    Code emitting lots of events can use this to skip expensive formatting.
+
+    .. versionadded:: UNRELEASED
+    """
+    return verbosity > _verbosity() and LOGFILE is None
+
+
 def message(
     msg: typing.Union[str, _TC], verbosity: Verbosity = Verbosity.INFO
 ) -> EventIO:
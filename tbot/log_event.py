@@ -14,13 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import contextlib
 import time
 import typing
 
 from tbot import log
 from tbot.log import u, c
 
-__all__ = ("testcase_begin", "testcase_end", "command")
+__all__ = ("testcase_begin", "testcase_end", "command", "span")
 
 
 def testcase_begin(name: str) -> None:
@@ -35,7 +36,7 @@ def testcase_begin(name: str) -> None:
         verbosity=log.Verbosity.QUIET,
         name=name,
     )
-    log.NESTING += 1
+    log._set_nesting(log._nesting() + 1)
 
 
 def testcase_end(
@@ -75,7 +76,7 @@ def testcase_end(
         skipped=skipped is not None,
         **skip_info,
     )
-    log.NESTING -= 1
+    log._set_nesting(log._nesting() - 1)
 
 
 # Table which maps each control character to its unicode symbol from the
@@ -94,6 +95,12 @@ def command(mach: str, cmd: str) -> log.EventIO:
         be written to.
     """
 
+    if log.is_silent(log.Verbosity.COMMAND) and not log.INTERACTIVE:
+        # Fast path: This event will never be seen anywhere so skip all the
+        # formatting work.  The output (written with STDOUT verbosity) won't
+        # be visible either because STDOUT > COMMAND.
+        return log.EventIO(["cmd", mach], "", verbosity=log.Verbosity.STDOUT, cmd=cmd)
+
     # Replace all newlines and other special characters in the command string
     if log.IS_UNICODE:
         cmd = cmd.translate(_CONTROL_MAPPING)
@@ -103,9 +110,11 @@ def command(mach: str, cmd: str) -> log.EventIO:
         "[" + c(mach).yellow + "] " + c(cmd).dark,
         verbosity=log.Verbosity.COMMAND,
         cmd=cmd,
+        start=time.monotonic() - log.START_TIME,
     )
 
     if log.INTERACTIVE:
+        log.flush_console()
         if input(ev._prefix() + c("  OK [Y/n]? ").magenta).upper() not in ("", "Y"):
             raise RuntimeError("Aborted by user")
 
@@ -114,9 +123,52 @@ def command(mach: str, cmd: str) -> log.EventIO:
     return ev
 
 
+@contextlib.contextmanager
+def span(category: str, name: str, **kwargs: typing.Any) -> typing.Iterator[None]:
+    """
+    Record the duration of a block of code as a span.
+
+    Spans are only written to the logfile (they are shown on the console with
+    :py:attr:`~tbot.log.Verbosity.CHANNEL` verbosity).  They can be turned
+    into a timeline of the run using the ``generators/chrometrace.py``
+    generator.  When no logfile is being written, ``span()`` does nothing.
+
+    **Example**:
+
+    .. code-block:: python
+
+        with tbot.log_event.span("build", "u-boot"):
+            bh.exec0("make", "-j8")
+
+    :param str category: Category of this span (e.g. ``"machine"``).
+    :param str name: Name of this span.
+    :param kwargs: Additional data to store with the span.
+
+    .. versionadded:: UNRELEASED
+    """
+    if log.LOGFILE is None:
+        yield None
+        return
+
+    start = time.monotonic()
+    try:
+        yield None
+    finally:
+        duration = time.monotonic() - start
+        log.EventIO(
+            ["span", category],
+            c(f"{category}: {name}").dark + f" ({duration:.3f}s)",
+            verbosity=log.Verbosity.CHANNEL,
+            name=name,
+            start=start - log.START_TIME,
+            duration=duration,
+            **kwargs,
+        )
+
+
 def tbot_start() -> None:
     print(log.c("tbot").yellow.bold + " starting ...")
-    log.NESTING += 1
+    log._set_nesting(log._nesting() + 1)
 
 
 def tbot_end(success: bool) -> None:
@@ -141,7 +193,8 @@ def tbot_end(success: bool) -> None:
         verbosity=log.Verbosity.QUIET,
         success=success,
         duration=duration,
-    )
+    ).close()
+    log.flush_console()
 
 
 def exception(name: str, trace: str) -> log.EventIO:
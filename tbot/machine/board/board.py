@@ -16,6 +16,7 @@
 
 import abc
 import contextlib
+import threading
 import time
 import typing
 
@@ -23,6 +24,14 @@ import tbot
 import tbot.error
 
 from .. import channel, connector, machine, shell
+from . import profile
+
+
+# Time of the last poweroff of each physical board, by powercycle_key.
+_poweroff_timestamps: typing.Dict[typing.Hashable, float] = {}
+# Machines which are currently powered on, by powercycle_key.
+_powered_on: typing.Dict[typing.Hashable, "PowerControl"] = {}
+_poweroff_lock = threading.Lock()
 
 
 class PowerControl(machine.Initializer):
@@ -81,46 +90,216 @@ class PowerControl(machine.Initializer):
     ``poweroff()`` implementation has the advantage that the delay is not
     performed at the end of a tbot run, only for powercycles "in the middle".
 
+    The delay is tracked per physical board (see :py:attr:`powercycle_key`,
+    which is the machine name unless overridden) and only blocks the thread
+    which powers on that board.  To let other work
+    progress while the board discharges, tear it down and
+    :py:meth:`prewarm() <tbot.Context.prewarm>` it again right away:
+
+    .. code-block:: python
+
+        tbot.ctx.teardown_if_alive(tbot.role.BoardLinux)
+        tbot.ctx.prewarm(tbot.role.BoardLinux)
+
+        # ... other work while the board powercycles and boots ...
+
+        with tbot.ctx.request(tbot.role.BoardLinux) as lnx:
+            ...
+
     .. versionadded:: 0.9.3
+
+    .. versionchanged:: UNRELEASED
+
+       The delay is tracked per :py:attr:`powercycle_key` instead of per
+       board class.
     """
 
-    @contextlib.contextmanager
-    def _init_machine(self) -> typing.Iterator:
-        if not self.power_check():
-            raise Exception("Board is already on, someone else might be using it!")
-
-        # If the board was previously powered off, ensure that at least
-        # `self.powercycle_delay` passes before powering on again.
-        if (
-            hasattr(self.__class__, "_last_poweroff_timestamp")
-            and self.powercycle_delay > 0
-        ):
-            passed_time = time.monotonic() - getattr(
-                self.__class__, "_last_poweroff_timestamp"
+    @property
+    def powercycle_key(self) -> typing.Hashable:
+        """
+        Key identifying the physical board for :py:attr:`powercycle_delay`.
+
+        .. warning::
+
+           Defaults to the machine's :py:attr:`~tbot.machine.Machine.name`
+           which is usually set on the class.  If you drive a farm of
+           identical boards with one board class, all of them share the same
+           key.  Powering on a second one while the first is still on then
+           raises :py:exc:`~tbot.error.PowercycleKeyConflictError`.  Override
+           this property to return something unique to each physical board,
+           like its serial port or power-switch outlet:
+
+           .. code-block:: python
+
+               class FarmBoard(board.PowerControl, board.Board):
+                   def __init__(self, lh, outlet):
+                       super().__init__(lh)
+                       self.outlet = outlet
+
+                   @property
+                   def powercycle_key(self):
+                       return ("pdu", self.outlet)
+
+        Likewise, if one physical board is driven by machines of different
+        names, return the same key from all of them.
+
+        .. versionadded:: UNRELEASED
+        """
+        return self.name
+
+    def powercycle_remaining(self) -> float:
+        """
+        Time (in seconds) until this board may be powered on again.
+
+        .. versionadded:: UNRELEASED
+        """
+        if self.powercycle_delay <= 0:
+            return 0.0
+        with _poweroff_lock:
+            timestamp = _poweroff_timestamps.get(self.powercycle_key)
+        if timestamp is None:
+            return 0.0
+        return max(self.powercycle_delay - (time.monotonic() - timestamp), 0.0)
+
+    def powercycle(self) -> None:
+        """
+        Power the board off and on again.
+
+        Waits for :py:attr:`powercycle_delay` between poweroff and poweron,
+        like a teardown and re-request of the board would.  A new
+        :py:attr:`boot_profiler` is started for the new power cycle.  This is
+        meant for testcases which need to reset the hardware while keeping
+        the machine (and its console channel) alive.
+
+        .. versionadded:: UNRELEASED
+        """
+        tbot.log.EventIO(
+            ["board", "off", self.name],
+            tbot.log.c("POWEROFF").bold + f" ({self.name})",
+            verbosity=tbot.log.Verbosity.QUIET,
+        )
+        self._close_boot_profiler()
+        self.poweroff()
+        self._record_poweroff()
+        self._wait_powercycle()
+
+        tbot.log.EventIO(
+            ["board", "on", self.name],
+            tbot.log.c("POWERON").bold + f" ({self.name})",
+            verbosity=tbot.log.Verbosity.QUIET,
+        )
+        self.poweron()
+        self._start_boot_profiler()
+
+    def _record_poweroff(self) -> None:
+        with _poweroff_lock:
+            _poweroff_timestamps[self.powercycle_key] = time.monotonic()
+
+    def _wait_powercycle(self) -> None:
+        delay_time = self.powercycle_remaining()
+        if delay_time > 0:
+            tbot.log.message(
+                f"Waiting {delay_time:.1f}s before powering on {self.name} again..."
             )
-            delay_time = self.powercycle_delay - passed_time
-            if delay_time > 0:
-                time.sleep(delay_time)
+            time.sleep(delay_time)
 
-        try:
-            tbot.log.EventIO(
-                ["board", "on", self.name],
-                tbot.log.c("POWERON").bold + f" ({self.name})",
-                verbosity=tbot.log.Verbosity.QUIET,
+    boot_milestones: typing.Optional[typing.Sequence[profile.Milestone]] = (
+        profile.DEFAULT_MILESTONES
+    )
+    """
+    Milestones to record in the boot profile of this board.
+
+    On each power-on, a :py:class:`~tbot.machine.board.profile.BootProfiler`
+    is created which timestamps these milestones in the console output of the
+    U-Boot and Linux machines booted on this board.  On power-off, a
+    ``boot-profile`` log event with the time of each milestone and the
+    duration of the phases in between is emitted.  Set to ``None`` to disable
+    boot profiling.
+
+    **Example**:
+
+    .. code-block:: python
+
+        import re
+        from tbot.machine.board import profile
+
+        class MyBoard(board.PowerControl, board.Board):
+            boot_milestones = profile.DEFAULT_MILESTONES + (
+                profile.Milestone("network", re.compile(r"eth0: link up")),
+            )
+
+    .. versionadded:: UNRELEASED
+    """
+
+    _last_poweron_timestamp: typing.Optional[float] = None
+    _boot_profiler: typing.Optional[profile.BootProfiler] = None
+
+    @property
+    def boot_profiler(self) -> typing.Optional[profile.BootProfiler]:
+        """
+        Boot profiler for the current power cycle (if enabled).
+
+        .. versionadded:: UNRELEASED
+        """
+        return self._boot_profiler
+
+    def _start_boot_profiler(self) -> None:
+        self._last_poweron_timestamp = time.monotonic()
+        if self.boot_milestones is not None:
+            self._boot_profiler = profile.BootProfiler(
+                self.name, self.boot_milestones, self._last_poweron_timestamp
             )
-            self.poweron()
+
+    def _close_boot_profiler(self) -> None:
+        if self._boot_profiler is not None:
+            self._boot_profiler.close()
+            self._boot_profiler = None
+
+    @contextlib.contextmanager
+    def _claim_powercycle_key(self) -> typing.Iterator[None]:
+        key = self.powercycle_key
+        with _poweroff_lock:
+            if _powered_on.get(key, self) is not self:
+                raise tbot.error.PowercycleKeyConflictError(key)
+            _powered_on[key] = self
+        try:
             yield None
         finally:
-            tbot.log.EventIO(
-                ["board", "off", self.name],
-                tbot.log.c("POWEROFF").bold + f" ({self.name})",
-                verbosity=tbot.log.Verbosity.QUIET,
-            )
-            self.poweroff()
+            with _poweroff_lock:
+                del _powered_on[key]
 
-            # Set the timestamp of last poweroff so we can reference it during
-            # next poweron to optionally delay for a short while.
-            setattr(self.__class__, "_last_poweroff_timestamp", time.monotonic())
+    @contextlib.contextmanager
+    def _init_machine(self) -> typing.Iterator:
+        with self._claim_powercycle_key():
+            if not self.power_check():
+                raise Exception("Board is already on, someone else might be using it!")
+
+            # If the board was previously powered off, ensure that at least
+            # `self.powercycle_delay` passes before powering on again.
+            self._wait_powercycle()
+
+            try:
+                tbot.log.EventIO(
+                    ["board", "on", self.name],
+                    tbot.log.c("POWERON").bold + f" ({self.name})",
+                    verbosity=tbot.log.Verbosity.QUIET,
+                )
+                self.poweron()
+                self._start_boot_profiler()
+                yield None
+            finally:
+                self._close_boot_profiler()
+
+                tbot.log.EventIO(
+                    ["board", "off", self.name],
+                    tbot.log.c("POWEROFF").bold + f" ({self.name})",
+                    verbosity=tbot.log.Verbosity.QUIET,
+                )
+                self.poweroff()
+
+                # Set the timestamp of last poweroff so we can reference it
+                # during next poweron to optionally delay for a short while.
+                self._record_poweroff()
 
 
 class Board(shell.RawShell):
@@ -185,3 +364,23 @@ class Connector(connector.Connector, BoardMachineBase):
         if not isinstance(self._board, Board):
             raise Exception("this machine was not instantiated from a `Board`!")
         return self._board
+
+
+def _find_power_control(m: machine.Machine) -> typing.Optional[PowerControl]:
+    """Find the machine controlling the power of the board ``m`` runs on."""
+    if isinstance(m, PowerControl):
+        return m
+    if isinstance(m, BoardMachineBase):
+        try:
+            b = m.board
+        except Exception:
+            # Not instantiated from a board
+            return None
+        if isinstance(b, PowerControl):
+            return b
+    return None
+
+
+def _boot_profiler(m: machine.Machine) -> typing.Optional[profile.BootProfiler]:
+    pc = _find_power_control(m)
+    return pc.boot_profiler if pc is not None else None
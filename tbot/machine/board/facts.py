@@ -0,0 +1,171 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Cache for facts about boards which only change with the flashed U-Boot build.
+
+Facts like the RAM base address from ``bdinfo`` are the same on every boot of
+the same U-Boot build.  :py:meth:`UBootShell.board_fact()
+<tbot.machine.board.UBootShell.board_fact>` stores them here, keyed by the
+board name and the U-Boot version string (which includes the build date), so
+they are only queried once per build instead of once per U-Boot instance.
+
+The cache is kept in memory and, unless :py:data:`CACHE_FILE` is ``None``,
+also in a JSON file so it survives across tbot runs.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import typing
+
+import tbot
+
+
+def _default_cache_file() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "tbot", "board-facts.json")
+
+
+CACHE_FILE: typing.Optional[str] = _default_cache_file()
+"""
+File in which board facts are persisted across runs.  Defaults to
+``$XDG_CACHE_HOME/tbot/board-facts.json``.  ``None`` only keeps facts in
+memory.  Set to ``None`` by the ``--no-fact-cache`` option of ``newbot`` and
+``tbot``.
+
+.. versionadded:: UNRELEASED
+"""
+
+# The main U-Boot banner, e.g.
+#   U-Boot 2024.01-00123-gdeadbeef (Jan 08 2024 - 10:27:12 +0100)
+# but not the one of U-Boot SPL.
+_BANNER = re.compile(r"^U-Boot (?!SPL )(\S+ \([^)\n]*\))", re.MULTILINE)
+
+
+def banner_version(text: str) -> typing.Optional[str]:
+    """
+    Find the version string in the boot banner (or ``version`` output) of
+    U-Boot.
+
+    :returns: The version including the build date, or ``None`` if ``text``
+        does not contain a U-Boot banner.
+
+    .. versionadded:: UNRELEASED
+    """
+    matches = _BANNER.findall(text)
+    return matches[-1] if matches else None
+
+
+Facts = typing.Dict[str, typing.Any]
+# board name -> [U-Boot version, facts]
+_Boards = typing.Dict[str, typing.List[typing.Any]]
+
+
+class FactCache:
+    """
+    Board facts for each board and U-Boot version.
+
+    Only the facts of the most recent U-Boot version are kept for each board.
+    As soon as a board shows up with a different version (because a new build
+    was flashed), its old facts are dropped.
+
+    :param str path: JSON file to persist the facts in, or ``None`` to keep
+        them in memory only.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, path: typing.Optional[str]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._boards: typing.Optional[_Boards] = None
+
+    def _read_file(self) -> _Boards:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            tbot.log.warning(f"Ignoring unreadable board fact cache {self.path}: {e}")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def _load(self) -> _Boards:
+        if self._boards is None:
+            self._boards = self._read_file()
+        return self._boards
+
+    def _save(self, board: str) -> None:
+        if self.path is None:
+            return
+        assert self._boards is not None
+
+        # Other tbot runs might have updated other boards in the meantime
+        data = self._read_file()
+        data[board] = self._boards[board]
+
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".board-facts-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            tbot.log.warning(f"Failed to write board fact cache {self.path}: {e}")
+
+    def get(self, board: str, version: str) -> Facts:
+        """
+        Get a copy of all known facts of ``board`` running U-Boot ``version``.
+        """
+        with self._lock:
+            entry = self._load().get(board)
+            if entry is None or entry[0] != version:
+                return {}
+            return dict(entry[1])
+
+    def set(self, board: str, version: str, name: str, value: typing.Any) -> None:
+        """
+        Store a fact.  ``value`` must be JSON-serializable.
+
+        Facts of any other version of ``board`` are dropped.
+        """
+        with self._lock:
+            boards = self._load()
+            entry = boards.get(board)
+            if entry is None or entry[0] != version:
+                entry = boards[board] = [version, {}]
+            entry[1][name] = value
+            self._save(board)
+
+    def invalidate(self, board: str) -> None:
+        """Drop all facts of ``board``."""
+        with self._lock:
+            self._load()[board] = [None, {}]
+            self._save(board)
+
+
+_caches: typing.Dict[typing.Optional[str], FactCache] = {}
+_caches_lock = threading.Lock()
+
+
+def cache() -> FactCache:
+    """
+    Get the :py:class:`FactCache` for the current :py:data:`CACHE_FILE`.
+
+    .. versionadded:: UNRELEASED
+    """
+    with _caches_lock:
+        try:
+            return _caches[CACHE_FILE]
+        except KeyError:
+            c = _caches[CACHE_FILE] = FactCache(CACHE_FILE)
+            return c
@@ -16,6 +16,7 @@
 
 import abc
 import contextlib
+import re
 import time
 import typing
 
@@ -28,6 +29,7 @@ from .. import board, channel, connector, machine
 class LinuxStartupEvent(tbot.log.EventIO):
     def __init__(self, lnx: machine.Machine) -> None:
         self.lnx = lnx
+        self.profiler = board.board._boot_profiler(lnx)
         super().__init__(
             ["board", "linux", lnx.name],
             tbot.log.c("LINUX").bold + f" ({lnx.name})",
@@ -37,6 +39,11 @@ class LinuxStartupEvent(tbot.log.EventIO):
         self.prefix = "   <> "
         self.verbosity = tbot.log.Verbosity.STDOUT
 
+    def write(self, s: str) -> int:
+        if self.profiler is not None:
+            self.profiler.feed(s)
+        return super().write(s)
+
     def close(self) -> None:
         setattr(self.lnx, "bootlog", self.getvalue())
         self.data["output"] = self.getvalue()
@@ -77,7 +84,13 @@ class LinuxBootLogin(machine.Initializer, LinuxBoot):
     """
 
     login_prompt = "login: "
-    """Prompt that indicates tbot should send the username."""
+    """
+    Prompt that indicates tbot should send the username.
+
+    After the username was sent, this prompt only counts as a rejected login
+    when it is the last line on the console, so a ``Last login: ...`` banner
+    is not mistaken for it.  This does not apply to regex patterns.
+    """
 
     login_delay = 0
     """
@@ -124,7 +137,60 @@ class LinuxBootLogin(machine.Initializer, LinuxBoot):
     Timeout after which login without a password should be attempted.  Set to
     ``None`` to disable this mechanism.
 
+    This only comes into play if neither the password prompt nor the shell
+    prompt (:py:attr:`login_shell_prompt`) show up after sending the username.
+
     .. versionadded:: 0.10.1
+
+    .. versionchanged:: UNRELEASED
+
+       The login no longer waits for this timeout when the shell prompt is
+       detected (see :py:attr:`login_shell_prompt`).
+    """
+
+    login_incorrect_prompt: typing.Optional[channel.channel.ConvenientSearchString] = (
+        "Login incorrect"
+    )
+    """
+    Message which indicates that the login failed.
+
+    tbot then waits for the next login prompt and tries again, up to
+    :py:attr:`login_attempts` times.  Set to ``None`` to disable.  A rejected
+    password is only noticed if :py:attr:`login_shell_prompt` is set, as tbot
+    otherwise does not wait for the result of the login.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    login_attempts: int = 3
+    """
+    Number of failed logins after which a
+    :py:exc:`~tbot.error.LoginFailedError` is raised.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    login_shell_prompt: typing.Optional[channel.channel.ConvenientSearchString] = None
+    """
+    Pattern which matches the shell prompt after a successful login.
+
+    As soon as it shows up, the login is complete.  This means tbot does not
+    have to wait for :py:attr:`no_password_timeout` on systems which do not
+    ask for a password.  When set, tbot also waits for this prompt (or a
+    rejected login) after sending the password.  Only set it if the pattern
+    really matches your prompt, otherwise each login is delayed by
+    :py:attr:`no_password_timeout`.  The default ``None`` continues right
+    after sending the password without checking the result.
+
+    **Example**:
+
+    .. code-block:: python
+
+        class MyBoardLinux(board.LinuxUbootConnector, board.LinuxBootLogin, linux.Bash):
+            # Prompts end in `# ` or `$ `
+            login_shell_prompt = re.compile(rb"[#$] \\Z")
+
+    .. versionadded:: UNRELEASED
     """
 
     def _timeout_remaining(self) -> typing.Optional[float]:
@@ -138,23 +204,75 @@ class LinuxBootLogin(machine.Initializer, LinuxBoot):
         else:
             return remaining
 
-    @contextlib.contextmanager
-    def _init_machine(self) -> typing.Iterator:
-        with contextlib.ExitStack() as cx:
-            ev = cx.enter_context(self._linux_boot_event())
-            cx.enter_context(self.ch.with_stream(ev))
-
-            if self._boot_start is None:
-                self._boot_start = time.monotonic()
-
-            self.ch.read_until_prompt(
-                prompt=self.login_prompt, timeout=self.boot_timeout
+    def _login_timeout(self) -> typing.Optional[float]:
+        timeout = self._timeout_remaining()
+        if self.no_password_timeout is not None:
+            if timeout is None:
+                timeout = self.no_password_timeout
+            else:
+                timeout = min(timeout, self.no_password_timeout)
+        return timeout
+
+    def _login(self) -> None:
+        # The login is driven by whatever shows up on the console next, so
+        # each step happens as soon as the system is ready for it.
+        relogin_prompt: channel.channel.ConvenientSearchString = self.login_prompt
+        if isinstance(relogin_prompt, (str, bytes)):
+            # After the username was sent, a login prompt only means the login
+            # was rejected if it is the last line on the console.  Otherwise,
+            # it is most likely part of a "Last login: ..." banner.
+            if isinstance(relogin_prompt, str):
+                relogin_prompt = relogin_prompt.encode()
+            relogin_prompt = re.compile(
+                rb"(^|\n)[^\n]{0,256}" + re.escape(relogin_prompt) + rb"\Z"
             )
 
-            # On purpose do not login immediately as we may get some
-            # console flooding from upper SW layers (and tbot's console
-            # setup may get broken)
-            if self.login_delay != 0:
+        patterns = {
+            name: pat
+            for name, pat in [
+                ("login", self.login_prompt),
+                ("relogin", relogin_prompt),
+                ("password", self.password_prompt),
+                ("incorrect", self.login_incorrect_prompt),
+                ("shell", self.login_shell_prompt),
+            ]
+            if pat is not None
+        }
+
+        def waiting_for(*names: str) -> typing.List[str]:
+            return [name for name in names if name in patterns]
+
+        buf = bytearray()
+        expected = waiting_for("login")
+        timeout = self._timeout_remaining()
+        delayed = self.login_delay == 0
+        sent_password = False
+        failures = 0
+        while True:
+            try:
+                result = self.ch._expect_buffered(
+                    buf, [patterns[name] for name in expected], timeout
+                )
+                state = expected[result.i]
+            except TimeoutError:
+                # Call _timeout_remaining() to abort if the boot-timeout was reached
+                self._timeout_remaining()
+                if "login" in expected and len(expected) == 1:
+                    raise
+
+                if not sent_password:
+                    # The no_password_timeout expired and we should attempt
+                    # continuing without a password.
+                    tbot.log.warning(
+                        "Didn't get asked for a password."
+                        + "  Optimistically continuing without one..."
+                    )
+                return
+
+            if state == "login" and not delayed:
+                # On purpose do not login immediately as we may get some
+                # console flooding from upper SW layers (and tbot's console
+                # setup may get broken)
                 remaining = self._timeout_remaining()
                 if remaining is not None and self.login_delay > remaining:
                     # we know that we will hit the timeout by waiting for
@@ -165,38 +283,58 @@ class LinuxBootLogin(machine.Initializer, LinuxBoot):
 
                 # Read everything while waiting for timeout to expire
                 self.ch.read_until_timeout(self.login_delay)
+                delayed = True
 
                 self.ch.sendline("")
-                self.ch.read_until_prompt(
-                    prompt=self.login_prompt, timeout=self._timeout_remaining()
-                )
-
-            self.ch.sendline(self.username)
-            if self.password is not None:
+                buf.clear()
                 timeout = self._timeout_remaining()
-                if self.no_password_timeout is not None:
-                    if timeout is None:
-                        timeout = self.no_password_timeout
-                    else:
-                        timeout = min(timeout, self.no_password_timeout)
-
-                try:
-                    self.ch.read_until_prompt(
-                        prompt=self.password_prompt, timeout=timeout
-                    )
-                except TimeoutError:
-                    # Call _timeout_remaining() to abort if the boot-timeout was reached
-                    self._timeout_remaining()
+                continue
+
+            if state in ("incorrect", "relogin"):
+                # A login prompt right after sending the username or password
+                # means the login was rejected, too.
+                failures += 1
+                if failures >= self.login_attempts:
+                    raise tbot.error.LoginFailedError(self.username, failures)
+                sent_password = False
+
+                if state == "incorrect":
+                    expected = waiting_for("login")
+                    timeout = self._timeout_remaining()
+                    continue
+
+            if state in ("login", "relogin"):
+                self.ch.sendline(self.username)
+                if self.password is None:
+                    return
+                expected = waiting_for("incorrect", "password", "shell", "relogin")
+                timeout = self._login_timeout()
+            elif state == "password":
+                password = self.password
+                assert password is not None
+                self.ch.sendline(password)
+                sent_password = True
+                if self.login_shell_prompt is None:
+                    return
+                expected = waiting_for("incorrect", "shell", "relogin")
+                timeout = self._login_timeout()
+            elif state == "shell":
+                return
 
-                    # If we get here, the no_password_timeout expired and we
-                    # should attempt continuing without a password.
-                    tbot.log.warning(
-                        "Didn't get asked for a password."
-                        + "  Optimistically continuing without one..."
-                    )
-                else:
-                    # No timeout exception means we're at the password prompt.
-                    self.ch.sendline(self.password)
+    @contextlib.contextmanager
+    def _init_machine(self) -> typing.Iterator:
+        with contextlib.ExitStack() as cx:
+            ev = cx.enter_context(self._linux_boot_event())
+            cx.enter_context(self.ch.with_stream(ev))
+
+            if self._boot_start is None:
+                self._boot_start = time.monotonic()
+
+            self._login()
+
+        profiler = board.board._boot_profiler(self)
+        if profiler is not None:
+            profiler.mark("linux-login")
 
         yield None
 
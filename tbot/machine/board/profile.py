@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Boot-time profiling for board machines.
+
+:py:class:`~tbot.machine.board.PowerControl` creates a :py:class:`BootProfiler`
+on each power-on.  The U-Boot and Linux startup events of the machines booted
+on the board feed their console output into it, and it logs a single
+``["board", "boot-profile", <name>]`` event with the time of each milestone
+when the board is powered off.  ``generators/bootprofile.py`` compares these
+events across runs.
+"""
+
+import re
+import time
+import typing
+
+import tbot
+
+
+class Milestone(typing.NamedTuple):
+    """
+    A milestone of the boot process.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    name: str
+    """Name of this milestone in the profile."""
+
+    pattern: typing.Pattern[str]
+    """
+    Pattern marking this milestone in the console output.  Note that this must
+    be a ``str`` pattern and not a ``bytes`` one (like ``tbot.Re`` creates).
+    """
+
+
+DEFAULT_MILESTONES: typing.Tuple[Milestone, ...] = (
+    Milestone("spl", re.compile(r"U-Boot SPL \d{4}\.\d{2}")),
+    Milestone("uboot", re.compile(r"U-Boot \d{4}\.\d{2}")),
+    Milestone("autoboot", re.compile(r"[Aa]utoboot")),
+    Milestone("kernel", re.compile(r"Starting kernel")),
+    Milestone("kernel-timestamp", re.compile(r"\[\s*\d+\.\d{6}\]")),
+    Milestone("init", re.compile(r"Run \S*init as init process|systemd\[1\]: ")),
+    Milestone("login", re.compile(r"login: ")),
+)
+"""
+Default milestones for :py:attr:`PowerControl.boot_milestones
+<tbot.machine.board.PowerControl.boot_milestones>`.
+
+.. versionadded:: UNRELEASED
+"""
+
+# Amount of previous console output to keep around for matching patterns
+# which are split across multiple reads.
+_TAIL_LENGTH = 256
+
+
+class BootProfiler:
+    """
+    Timestamp boot milestones in the console output of a board.
+
+    Milestones are expected in the order they are listed.  Once one was
+    found, earlier ones which did not show up are skipped (e.g. the SPL
+    banner on boards without SPL).  Additionally, machines can
+    :py:meth:`mark` milestones which are not visible in the console output,
+    like the moment tbot intercepted autoboot.
+
+    Times are taken when tbot reads the console output.  Output which arrives
+    while no machine is reading the console is timestamped late.
+
+    :param str name: Name of the board.
+    :param milestones: Milestones to look for.
+    :param float start: Reference time (from :py:func:`time.monotonic`) for
+        all milestones, usually the power-on.  Defaults to now.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(
+        self,
+        name: str,
+        milestones: typing.Iterable[Milestone] = DEFAULT_MILESTONES,
+        start: typing.Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.milestones = list(milestones)
+        self.start = time.monotonic() if start is None else start
+        self.timestamps: typing.Dict[str, float] = {"poweron": 0.0}
+        """Time of each milestone which was reached, relative to the start."""
+
+        self._next = 0
+        self._tail = ""
+        self._closed = False
+
+    def feed(self, text: str) -> None:
+        """Search new console output for the next milestones."""
+        if self._next >= len(self.milestones):
+            return
+
+        now = time.monotonic() - self.start
+        tail = self._tail + text
+        i = self._next
+        while i < len(self.milestones):
+            milestone = self.milestones[i]
+            i += 1
+            match = milestone.pattern.search(tail)
+            if match is None:
+                continue
+            self.timestamps.setdefault(milestone.name, now)
+            self._next = i
+            tail = tail[match.end() :]
+        self._tail = tail[-_TAIL_LENGTH:]
+
+    def mark(self, name: str, timestamp: typing.Optional[float] = None) -> None:
+        """
+        Record a milestone which is not matched in the console output.
+
+        Only the first time of each milestone is kept.
+
+        :param str name: Name of the milestone.
+        :param float timestamp: When the milestone was reached (from
+            :py:func:`time.monotonic`).  Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.timestamps.setdefault(name, timestamp - self.start)
+
+    def phases(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Durations between consecutive milestones.
+
+        Each phase is named after the milestone which ends it.
+        """
+        ordered = sorted(self.timestamps.items(), key=lambda item: item[1])
+        return [
+            {"name": name, "start": prev_name, "duration": t - prev_t}
+            for (prev_name, prev_t), (name, t) in zip(ordered, ordered[1:])
+        ]
+
+    def close(self) -> None:
+        """
+        Log the ``boot-profile`` event.
+
+        Nothing is logged if no milestone was reached after the power-on.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if len(self.timestamps) < 2:
+            return
+
+        last, total = max(self.timestamps.items(), key=lambda item: item[1])
+        ev = tbot.log.EventIO(
+            ["board", "boot-profile", self.name],
+            tbot.log.c("BOOT-PROFILE").bold
+            + f" ({self.name}) {last} after {total:.3f}s",
+            verbosity=tbot.log.Verbosity.INFO,
+            milestones=dict(self.timestamps),
+            phases=self.phases(),
+            total=total,
+        )
+        ev.prefix = "    "
+        ev.verbosity = tbot.log.Verbosity.COMMAND
+        for phase in ev.data["phases"]:
+            ev.writeln(
+                f"{phase['start']:>20} -> {phase['name']:<20} {phase['duration']:8.3f}s"
+            )
+        ev.close()
@@ -14,19 +14,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import array
 import contextlib
 import re
 import time
 import typing
+import zlib
 
 import tbot
-from .. import shell, machine, channel
+from .. import shell, machine, channel, linux
 from ..linux import special
+from . import board, facts, xmodem
 
 
 class UBootStartupEvent(tbot.log.EventIO):
     def __init__(self, ub: machine.Machine) -> None:
         self.ub = ub
+        self.profiler = board._boot_profiler(ub)
         super().__init__(
             ["board", "uboot", ub.name],
             tbot.log.c("UBOOT").bold + f" ({ub.name})",
@@ -36,15 +40,27 @@ class UBootStartupEvent(tbot.log.EventIO):
         self.verbosity = tbot.log.Verbosity.STDOUT
         self.prefix = "   <> "
 
+    def write(self, s: str) -> int:
+        if self.profiler is not None:
+            self.profiler.feed(s)
+        return super().write(s)
+
     def close(self) -> None:
         setattr(self.ub, "bootlog", self.getvalue())
         self.data["output"] = self.getvalue()
         super().close()
 
 
+# Time the console needs to be quiet after a prompt if more prompts might
+# still be on the way.
+_PROMPT_SETTLE_TIME = 0.1
+
+
 class UbootStartup(machine.Machine):
     _uboot_init_event: typing.Optional[tbot.log.EventIO] = None
     _timeout_start: typing.Optional[float] = None
+    _autoboot_time: typing.Optional[float] = None
+    _autoboot_spammed = False
 
     boot_timeout: typing.Optional[float] = None
     """
@@ -61,6 +77,37 @@ class UbootStartup(machine.Machine):
 
         return self._uboot_init_event
 
+    def _log_prompt_latency(self) -> None:
+        now = time.monotonic()
+        pc = board._find_power_control(self)
+        start = pc._last_poweron_timestamp if pc is not None else None
+        reference = "poweron"
+
+        profiler = board._boot_profiler(self)
+        if profiler is not None:
+            if self._autoboot_time is not None:
+                profiler.mark("autoboot-intercept", self._autoboot_time)
+            profiler.mark("uboot-prompt", now)
+
+        if start is None:
+            assert self._timeout_start is not None
+            start, reference = self._timeout_start, "connect"
+
+        data: typing.Dict[str, typing.Any] = {
+            "reference": reference,
+            "prompt": now - start,
+        }
+        if self._autoboot_time is not None:
+            data["autoboot"] = self._autoboot_time - start
+
+        tbot.log.EventIO(
+            ["board", "uboot-latency", self.name],
+            tbot.log.c("UBOOT").bold
+            + f" ({self.name}) prompt {now - start:.3f}s after {reference}",
+            verbosity=tbot.log.Verbosity.COMMAND,
+            **data,
+        )
+
 
 class UBootAutobootIntercept(machine.Initializer, UbootStartup):
     """
@@ -97,26 +144,84 @@ class UBootAutobootIntercept(machine.Initializer, UbootStartup):
     Keys to press as soon as autoboot prompt is detected.
     """
 
+    autoboot_spam_interval: typing.Optional[float] = None
+    """
+    Send :py:attr:`autoboot_keys` repeatedly in this interval (in seconds)
+    instead of only once when the autoboot prompt shows up.
+
+    This is meant for boards with a very short (or zero) ``bootdelay`` where
+    the prompt might be missed or might not be printed at all.  Spamming
+    starts right away and ends once the autoboot prompt was seen or
+    :py:attr:`autoboot_spam_window` expired.  Only use this with keys that
+    U-Boot ignores at its shell, like the default ``"\r"``.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    autoboot_spam_window: float = 10.0
+    """
+    Maximum time (in seconds) to keep spamming :py:attr:`autoboot_keys` when
+    :py:attr:`autoboot_spam_interval` is set.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def _spam_autoboot_keys(self) -> None:
+        assert self.autoboot_prompt is not None
+        assert self.autoboot_spam_interval is not None
+        pattern = [channel.channel._convert_search_string(self.autoboot_prompt)]
+        self._autoboot_spammed = True
+
+        buf = bytearray()
+        end_time = time.monotonic() + self.autoboot_spam_window
+        next_send = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= end_time:
+                return
+            if now >= next_send:
+                self.ch.send(self.autoboot_keys, _ignore_blacklist=True)
+                if self._autoboot_time is None:
+                    self._autoboot_time = now
+                next_send = now + self.autoboot_spam_interval
+
+            try:
+                buf += self.ch.read(timeout=min(next_send, end_time) - now)
+            except TimeoutError:
+                continue
+
+            if channel.channel._match_expect(buf, pattern) is not None:
+                # Make sure the keys arrive after the prompt was printed
+                self.ch.send(self.autoboot_keys, _ignore_blacklist=True)
+                self._autoboot_time = time.monotonic()
+                return
+            if len(buf) > 4096:
+                del buf[:-1024]
+
+    def _intercept_autoboot(self) -> None:
+        assert self.autoboot_prompt is not None
+        timeout = None
+        if self.boot_timeout is not None:
+            assert self._timeout_start is not None
+            timeout = self.boot_timeout - (time.monotonic() - self._timeout_start)
+
+        try:
+            self.ch.read_until_prompt(prompt=self.autoboot_prompt, timeout=timeout)
+        except TimeoutError:
+            raise TimeoutError(
+                "U-Boot autoboot prompt did not show up in time"
+            ) from None
+        self.ch.send(self.autoboot_keys, _ignore_blacklist=True)
+        self._autoboot_time = time.monotonic()
+
     @contextlib.contextmanager
     def _init_machine(self) -> typing.Iterator:
         if self.autoboot_prompt is not None:
             with self.ch.with_stream(self._uboot_startup_event()):
-                timeout = None
-                if self.boot_timeout is not None:
-                    assert self._timeout_start is not None
-                    timeout = self.boot_timeout - (
-                        time.monotonic() - self._timeout_start
-                    )
-
-                try:
-                    self.ch.read_until_prompt(
-                        prompt=self.autoboot_prompt, timeout=timeout
-                    )
-                except TimeoutError:
-                    raise TimeoutError(
-                        "U-Boot autoboot prompt did not show up in time"
-                    ) from None
-                self.ch.send(self.autoboot_keys, _ignore_blacklist=True)
+                if self.autoboot_spam_interval is not None:
+                    self._spam_autoboot_keys()
+                else:
+                    self._intercept_autoboot()
 
         yield None
 
@@ -139,6 +244,71 @@ def _hush_quote(s: str) -> str:
 
 
 ArgTypes = typing.Union[str, special.Special]
+F = typing.TypeVar("F")
+
+# Marker echoed in front of the return code when running a command and
+# fetching its return code in one go.
+_RETCODE_SENTINEL = "__tbot_rc_"
+
+
+_MEM_WIDTHS = (1, 2, 4, 8)
+_MEM_SUFFIXES = {1: "b", 2: "w", 4: "l", 8: "q"}
+_ARRAY_TYPECODES = {array.array(t).itemsize: t for t in "QLIH"}
+
+
+def _parse_md(out: str, width: int, size: int, byteorder: str) -> bytes:
+    """Convert ``md`` output for ``size`` bytes back into the memory contents."""
+    # Each line is `<addr>: <value> <value> ...    <ascii>`.  As the ASCII
+    # column might contain anything, only the known number of hex digits is
+    # taken from each line and decoded in one go.
+    line_chars = 16 // width * (2 * width + 1)
+    lines = [line for line in out.splitlines() if ":" in line]
+    last_chars = (size % 16 or 16) // width * (2 * width + 1)
+    hexdata = [line.partition(":")[2][:line_chars] for line in lines[:-1]]
+    if lines != []:
+        hexdata.append(lines[-1].partition(":")[2][:last_chars])
+
+    try:
+        raw = bytes.fromhex("".join(hexdata))
+    except ValueError:
+        raw = b""
+    if len(raw) != size:
+        raise tbot.error.TransferError(f"could not parse memory dump: {out[:200]!r}")
+
+    if width == 1 or byteorder == "big":
+        return raw
+    # fromhex() yields each value in big-endian order, swap them to get the
+    # memory contents of a little-endian target.
+    values = array.array(_ARRAY_TYPECODES[width], raw)
+    values.byteswap()
+    return values.tobytes()
+
+
+# Commands which are known to leave the environment alone.  All other commands
+# invalidate the environment snapshot.
+_ENV_READONLY_COMMANDS = ("printenv", "echo", "version")
+_COMMAND_SEPARATORS = (special.Then, special.AndThen, special.OrElse, special.Pipe)
+
+
+def _leaves_env_alone(args: typing.Tuple[typing.Any, ...]) -> bool:
+    # Every command of a compound line (`a; b && c`) must be read-only
+    command_start = True
+    for arg in args:
+        if any(arg is sep for sep in _COMMAND_SEPARATORS):
+            command_start = True
+        elif command_start:
+            if arg not in _ENV_READONLY_COMMANDS:
+                return False
+            command_start = False
+    return True
+
+
+def _sentinel_prefix_len(buf: bytearray, sentinel: bytes) -> int:
+    # Length of the longest suffix of buf which is a prefix of the sentinel
+    for i in reversed(range(1, min(len(sentinel), len(buf)) + 1)):
+        if buf.endswith(sentinel[:i]):
+            return i
+    return 0
 
 
 class UBootShell(shell.Shell, UbootStartup):
@@ -181,6 +351,59 @@ class UBootShell(shell.Shell, UbootStartup):
     bootlog: str
     """Transcript of console output during boot."""
 
+    exec_single_roundtrip: bool = True
+    """
+    Fetch the return code of commands in the same round-trip.
+
+    If enabled, :py:meth:`exec` runs ``<cmd>; echo <sentinel>$?`` as a single
+    command-line instead of sending a separate ``echo $?`` after the command
+    finished.  This halves the number of round-trips for each command, which
+    is noticeable on slow serial consoles.
+
+    Before first use, tbot checks whether the U-Boot shell expands ``$?``
+    (which requires ``CONFIG_HUSH_PARSER``).  If it does not, tbot falls back
+    to the old behavior for this machine.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    max_cmdline_length: int = 256
+    """
+    Maximum length of a command-line which U-Boot accepts
+    (``CONFIG_SYS_CBSIZE``).
+
+    :py:meth:`env_update` and :py:meth:`write_mem` split their commands to
+    stay below this length.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    interrupt_interval: float = 0.25
+    """
+    Interval (in seconds) in which tbot sends Ctrl-C while waiting for the
+    U-Boot prompt.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    fact_cache: bool = True
+    """
+    Cache facts about the board (like :py:attr:`ram_base`) across U-Boot
+    instances and tbot runs.
+
+    Facts are stored per board name and U-Boot version (see
+    :py:attr:`uboot_version`) in :py:mod:`tbot.machine.board.facts` and are
+    queried again as soon as a different U-Boot build is running.  Disable
+    this for boards where these facts can change without a new U-Boot build.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    _single_roundtrip_ok: typing.Optional[bool] = None
+    _env_cache: typing.Optional[typing.Dict[str, str]] = None
+    _uboot_version: typing.Optional[str] = None
+    _facts: typing.Optional[typing.Dict[str, typing.Any]] = None
+
     @contextlib.contextmanager
     def _init_shell(self) -> typing.Iterator:
         with self._uboot_startup_event() as ev, self.ch.with_stream(ev):
@@ -222,20 +445,44 @@ class UBootShell(shell.Shell, UbootStartup):
                 0x7F,  # DEL  | Delete
             ]
 
-            while True:
-                if self.boot_timeout is not None:
-                    assert self._timeout_start is not None
-                    if (time.monotonic() - self._timeout_start) > self.boot_timeout:
-                        raise TimeoutError("U-Boot did not reach shell in time")
-                try:
-                    self.ch.read_until_prompt(timeout=0.5)
-                    break
-                except TimeoutError:
-                    self.ch.sendintr()
-                    time.sleep(0.5)
+            self._wait_for_shell()
+            self._log_prompt_latency()
 
         yield None
 
+    def _wait_for_shell(self) -> None:
+        # If keys were sent which U-Boot may answer with more prompts, wait
+        # until the console is quiet as well.  Otherwise, stale prompts would
+        # confuse the first commands.
+        settle = self._autoboot_spammed
+        buf = bytearray()
+        last_intr = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if self.boot_timeout is not None:
+                assert self._timeout_start is not None
+                if (now - self._timeout_start) > self.boot_timeout:
+                    raise TimeoutError("U-Boot did not reach shell in time")
+
+            at_prompt = channel.channel._match_prompt(buf, self.ch.prompt) is not None
+            if at_prompt and not settle:
+                return
+
+            if at_prompt:
+                timeout = _PROMPT_SETTLE_TIME
+            else:
+                timeout = max(self.interrupt_interval - (now - last_intr), 0.0)
+            try:
+                buf += self.ch.read(timeout=timeout)
+                if len(buf) > 4096:
+                    del buf[:-1024]
+            except TimeoutError:
+                if at_prompt:
+                    return
+                self.ch.sendintr()
+                settle = True
+                last_intr = time.monotonic()
+
     def escape(self, *args: ArgTypes) -> str:
         """Escape a string so it can be used safely on the U-Boot command-line."""
         string_args = []
@@ -267,8 +514,20 @@ class UBootShell(shell.Shell, UbootStartup):
             output.  The output will also contain a trailing newline in most
             cases.
         """
+        if args == ():
+            # An empty line would make U-Boot repeat the previous command
+            raise ValueError("no command given")
         cmd = self.escape(*args)
 
+        if not _leaves_env_alone(args):
+            self._env_cache = None
+
+        if self._use_single_roundtrip():
+            with tbot.log_event.command(self.name, cmd) as ev:
+                retcode, out = self._exec_single_roundtrip(cmd, ev)
+                ev.data["stdout"] = out
+            return (retcode, out)
+
         # There is an ugly ugly problem with no great solution: The `crc32`
         # command in U-Boot prints the string `=> ` as part of its output.
         # This is a commonly used prompt string which means that tbot gets
@@ -303,6 +562,62 @@ class UBootShell(shell.Shell, UbootStartup):
 
         return (retcode, out)
 
+    def _use_single_roundtrip(self) -> bool:
+        if not self.exec_single_roundtrip:
+            return False
+
+        if self._single_roundtrip_ok is None:
+            # Check whether $? is expanded.  Without the hush parser, it is
+            # printed verbatim.
+            self.ch.sendline(f"echo {_RETCODE_SENTINEL}$?", read_back=True)
+            out = self.ch.read_until_prompt()
+            self._single_roundtrip_ok = (
+                re.fullmatch(re.escape(_RETCODE_SENTINEL) + r"\d+\n", out) is not None
+            )
+
+        return self._single_roundtrip_ok
+
+    def _exec_single_roundtrip(
+        self, cmd: str, ev: tbot.log.EventIO
+    ) -> typing.Tuple[int, str]:
+        sentinel = _RETCODE_SENTINEL.encode("utf-8")
+        self.ch.sendline(f"{cmd}; echo {_RETCODE_SENTINEL}$?", read_back=True)
+
+        # Output is read up to the sentinel instead of the prompt.  This also
+        # means commands printing something which looks like the prompt (e.g.
+        # `crc32`) don't need special treatment here.  The sentinel itself is
+        # kept out of the log.
+        buf = bytearray()
+        logged = 0
+        end = -1
+        retcode_str = None
+        for new in self.ch.read_iter():
+            buf += new
+
+            if end == -1:
+                end = buf.find(sentinel, logged)
+                upto = (
+                    end if end != -1 else len(buf) - _sentinel_prefix_len(buf, sentinel)
+                )
+                if upto > logged:
+                    ev.write(buf[logged:upto].decode("utf-8", errors="replace"))
+                    logged = upto
+
+            if end != -1:
+                retcode_str = channel.channel._match_prompt(
+                    buf[end + len(sentinel) :], self.ch.prompt
+                )
+                if retcode_str is not None:
+                    break
+
+        assert retcode_str is not None
+        try:
+            retcode = int(retcode_str)
+        except ValueError:
+            raise tbot.error.InvalidRetcodeError(self, retcode_str) from None
+
+        return (retcode, channel.channel._decode(buf[:end]))
+
     def exec0(self, *args: ArgTypes) -> str:
         """
         Run a command and assert its return code to be 0.
@@ -357,6 +672,9 @@ class UBootShell(shell.Shell, UbootStartup):
             # Set the value of a var
             lnx.env("bootargs", "loglevel=7")
 
+        If an environment snapshot was taken with :py:meth:`env_snapshot`
+        and is still valid, variables are read from it instead of the board.
+
         :param str var: Environment variable name.
         :param str value: Optional value to set the variable to.
         :rtype: str
@@ -364,6 +682,8 @@ class UBootShell(shell.Shell, UbootStartup):
         """
         if value is not None:
             self.exec0("setenv", var, value)
+        elif self._env_cache is not None and var in self._env_cache:
+            return self._env_cache[var]
 
         # Use `printenv var` instead of `echo "$var"` because some values would
         # otherwise result in broken expansion.
@@ -373,6 +693,380 @@ class UBootShell(shell.Shell, UbootStartup):
         # name and trailing newline.
         return output[len(var) + 1 : -1]
 
+    def env_snapshot(self, refresh: bool = False) -> typing.Dict[str, str]:
+        """
+        Get the whole environment at once.
+
+        The environment is fetched with a single ``printenv`` and then kept
+        until tbot runs a command which might change it (anything other than
+        ``printenv``, ``echo``, or ``version``, in every part of a compound
+        command-line).  While the snapshot is valid,
+        :py:meth:`env` reads variables from it as well.
+
+        Commands like ``tftp`` or ``dhcp`` set variables on their own, so the
+        snapshot is dropped on those as well.  Changes done outside of tbot
+        (e.g. during :py:meth:`interactive`) can't be detected; pass
+        ``refresh=True`` to fetch the environment again.
+
+        **Example**:
+
+        .. code-block:: python
+
+            env = ub.env_snapshot()
+            if env.get("bootdelay") != "0":
+                ...
+
+        :param bool refresh: Fetch the environment even if a snapshot exists.
+        :rtype: dict(str, str)
+        :returns: A copy of the snapshot, mapping variable names to values.
+
+        .. versionadded:: UNRELEASED
+        """
+        if refresh or self._env_cache is None:
+            output = self.exec0("printenv")
+
+            env = {}
+            for line in output.splitlines():
+                # Skip the "Environment size: ..." summary and empty lines
+                name, sep, value = line.partition("=")
+                if sep == "" or name == "" or any(c.isspace() for c in name):
+                    continue
+                env[name] = value
+            self._env_cache = env
+
+        return dict(self._env_cache)
+
+    def env_update(
+        self, variables: typing.Mapping[str, typing.Optional[ArgTypes]]
+    ) -> None:
+        """
+        Set many environment variables at once.
+
+        All ``setenv`` commands are chained into a single command-line (or a
+        few, if they would exceed :py:attr:`max_cmdline_length`) so the
+        update only needs one round-trip.  This needs the hush parser; if it
+        is not available (or :py:attr:`exec_single_roundtrip` is disabled),
+        each ``setenv`` is run on its own.  A value of ``None`` deletes the
+        variable.
+
+        **Example**:
+
+        .. code-block:: python
+
+            ub.env_update({
+                "serverip": "192.168.1.1",
+                "bootargs": "console=ttyS0,115200 loglevel=7",
+                "bootcmd": None,
+            })
+
+        :param dict variables: Variables to set.
+        :raises tbot.error.CommandFailure: If any of the ``setenv`` commands
+            failed.  Variables after the failing one are not set.
+
+        .. versionadded:: UNRELEASED
+        """
+        commands: typing.List[typing.List[ArgTypes]] = []
+        for var, value in variables.items():
+            setenv: typing.List[ArgTypes] = ["setenv", var]
+            if value is not None:
+                setenv.append(value)
+            commands.append(setenv)
+
+        self._exec0_chained(commands)
+
+    def _exec0_chained(self, commands: typing.Iterable[typing.List[ArgTypes]]) -> None:
+        # Run the commands in as few command-lines as possible by chaining them
+        # with `&&`.  Without the hush parser, U-Boot does not know `&&` so
+        # each command needs its own round-trip.
+        if not self._use_single_roundtrip():
+            for cmd in commands:
+                self.exec0(*cmd)
+            return
+
+        # Leave some room for what exec() appends to the command-line
+        max_length = self.max_cmdline_length - 2 * len(_RETCODE_SENTINEL)
+
+        line: typing.List[ArgTypes] = []
+        length = 0
+        for cmd in commands:
+            cmd_length = len(self.escape(*cmd))
+
+            if line != [] and length + len(" && ") + cmd_length > max_length:
+                self.exec0(*line)
+                line, length = [], 0
+
+            if line != []:
+                line.append(special.AndThen)
+                length += len(" && ")
+            line += cmd
+            length += cmd_length
+
+        if line != []:
+            self.exec0(*line)
+
+    def load_serial(
+        self,
+        path: linux.Path,
+        addr: int,
+        protocol: str = "ymodem",
+        block_size: int = 1024,
+        verify: bool = True,
+        max_resumes: int = 3,
+    ) -> int:
+        """
+        Load a file into memory over the console.
+
+        This runs ``loady`` or ``loadx`` and sends the file using YMODEM or
+        XMODEM through the machine's channel, at whatever baudrate the
+        console is configured for.  Progress and throughput are written to
+        the log.
+
+        Blocks which the board rejects are retried.  If the transfer fails
+        nonetheless, tbot starts a new transfer which picks up at the last
+        acknowledged block (up to ``max_resumes`` times).  Afterwards, the
+        result is verified by comparing a ``crc32`` on the board with a
+        locally computed one.
+
+        **Example**:
+
+        .. code-block:: python
+
+            kernel = lh.workdir / "fitImage"
+            ub.load_serial(kernel, 0x82000000)
+            ub.boot("bootm", "0x82000000")
+
+        :param linux.Path path: File to load.  Usually, this is a file on the
+            lab-host.
+        :param int addr: Load address.
+        :param str protocol: ``"ymodem"`` (``loady``) or ``"xmodem"``
+            (``loadx``).  Kermit (``loadb``) is not supported.
+        :param int block_size: Size of data blocks, ``1024`` or ``128``.
+        :param bool verify: Whether to verify the result using ``crc32``.
+        :param int max_resumes: How often a failed transfer is resumed.
+        :rtype: int
+        :returns: Size of the loaded file.
+        :raises tbot.error.TransferError: If the transfer could not be
+            completed or the verification failed.
+
+        .. versionadded:: UNRELEASED
+        """
+        if protocol not in xmodem.PROTOCOLS:
+            raise ValueError(f"unsupported protocol {protocol!r}")
+
+        data = path.read_bytes()
+        total = len(data)
+        start_time = time.monotonic()
+
+        offset = 0
+        resumes = 0
+        last_report = -1
+        while True:
+            cmd = self.escape(f"load{protocol[0]}", hex(addr + offset))
+            with tbot.log_event.command(self.name, cmd) as ev:
+
+                def progress(acked: int, _: int) -> None:
+                    nonlocal last_report
+                    done = offset + acked
+                    percent = done * 100 // total
+                    if percent // 10 > last_report:
+                        last_report = percent // 10
+                        rate = done / max(time.monotonic() - start_time, 1e-3)
+                        ev.write(
+                            f"{percent:3}% {done / 1024:10.1f} KiB {rate / 1024:8.1f} KiB/s\n"
+                        )
+
+                sender = xmodem.Sender(
+                    self.ch, protocol, block_size=block_size, progress=progress
+                )
+
+                # The load commands set `filesize`
+                self._env_cache = None
+                self.ch.sendline(cmd, read_back=True)
+                failure = None
+                try:
+                    sender.send(data[offset:], path.name)
+                except tbot.error.TransferError as e:
+                    failure = e
+                    sender.cancel()
+
+                with self.ch.with_stream(ev, show_prompt=False):
+                    out = self.ch.read_until_prompt(timeout=30.0)
+                ev.data["stdout"] = out
+
+            if failure is None:
+                break
+
+            offset += failure.acked
+            resumes += 1
+            if resumes > max_resumes:
+                raise failure
+            tbot.log.warning(
+                f"Transfer failed: {failure}\n    Resuming at offset {offset:#x} ..."
+            )
+
+        duration = time.monotonic() - start_time
+        tbot.log.message(
+            f"Loaded {total} bytes in {duration:.1f} s "
+            + f"({total / 1024 / max(duration, 1e-3):.1f} KiB/s)"
+        )
+
+        if verify:
+            self._verify_crc32(addr, data)
+
+        return total
+
+    def _verify_crc32(self, addr: int, data: bytes) -> None:
+        out = self.exec0("crc32", hex(addr), hex(len(data)))
+        match = re.search(r"==>\s*([0-9a-fA-F]{8})", out)
+        expected = zlib.crc32(data)
+        if match is None or int(match.group(1), 16) != expected:
+            raise tbot.error.TransferError(
+                f"verification failed: expected crc32 {expected:08x}, "
+                + f"got {match.group(1) if match is not None else out!r}"
+            )
+
+    def _mem_width(self, width: int, byteorder: str, *values: int) -> int:
+        if width not in _MEM_WIDTHS:
+            raise ValueError(f"invalid access width {width}")
+        if byteorder not in ("little", "big"):
+            raise ValueError(f"invalid byteorder {byteorder!r}")
+        # Fall back to narrower accesses for unaligned regions
+        while any(v % width != 0 for v in values):
+            width //= 2
+        return width
+
+    def read_mem(
+        self,
+        addr: int,
+        length: int,
+        width: int = 4,
+        byteorder: str = "little",
+        chunk_size: int = 64 * 1024,
+        verify: bool = True,
+    ) -> bytes:
+        """
+        Read a memory region.
+
+        The region is dumped with ``md`` in chunks of ``chunk_size`` bytes
+        (progress is logged after each one), using accesses of ``width``
+        bytes (``md.q``, ``md.l``, ``md.w``, or ``md.b``).  Narrower accesses
+        are used automatically if ``addr`` or ``length`` is not aligned.
+
+        **Example**:
+
+        .. code-block:: python
+
+            header = ub.read_mem(0x82000000, 64)
+            assert header[:4] == b"\\xd0\\x0d\\xfe\\xed"
+
+        :param int addr: Start address.
+        :param int length: Number of bytes to read.
+        :param int width: Access width in bytes.  ``8`` requires
+            ``CONFIG_MEM_SUPPORT_64BIT_DATA``.
+        :param str byteorder: Byte order of the target (``"little"`` or
+            ``"big"``).  ``md`` prints values, not bytes, so this is needed to
+            reconstruct the memory contents.
+        :param int chunk_size: Maximum number of bytes dumped per command.
+        :param bool verify: Whether to compare the result with a ``crc32`` of
+            the region.
+        :rtype: bytes
+        :raises tbot.error.TransferError: If the output could not be parsed or
+            the verification failed.
+
+        .. versionadded:: UNRELEASED
+        """
+        width = self._mem_width(width, byteorder, addr, length)
+        if chunk_size < width:
+            raise ValueError(
+                f"chunk_size must be at least the access width ({width}), "
+                + f"got {chunk_size}"
+            )
+        chunk_size -= chunk_size % width
+        start_time = time.monotonic()
+
+        data = bytearray()
+        for offset in range(0, length, chunk_size):
+            size = min(chunk_size, length - offset)
+            out = self.exec0(
+                f"md.{_MEM_SUFFIXES[width]}", hex(addr + offset), hex(size // width)
+            )
+            data += _parse_md(out, width, size, byteorder)
+
+            if length > chunk_size:
+                rate = len(data) / max(time.monotonic() - start_time, 1e-3)
+                tbot.log.message(
+                    f"{len(data) * 100 // length:3}% {len(data) / 1024:10.1f} KiB "
+                    + f"{rate / 1024:8.1f} KiB/s",
+                    verbosity=tbot.log.Verbosity.COMMAND,
+                )
+
+        duration = time.monotonic() - start_time
+        tbot.log.message(
+            f"Read {length} bytes in {duration:.1f} s "
+            + f"({length / 1024 / max(duration, 1e-3):.1f} KiB/s)"
+        )
+
+        if verify:
+            self._verify_crc32(addr, bytes(data))
+
+        return bytes(data)
+
+    def write_mem(
+        self,
+        addr: int,
+        data: bytes,
+        width: int = 4,
+        byteorder: str = "little",
+        verify: bool = True,
+    ) -> None:
+        """
+        Write ``data`` to memory.
+
+        The data is written with ``mw`` using accesses of ``width`` bytes.
+        As many ``mw`` commands as fit into :py:attr:`max_cmdline_length` are
+        chained into one command-line (like in :py:meth:`env_update`), and
+        runs of identical values are written with a single ``mw``.  Still, this needs a lot of
+        round-trips for anything but small amounts of data; use
+        :py:meth:`load_serial` for larger payloads.
+
+        :param int addr: Start address.
+        :param bytes data: Data to write.
+        :param int width: Access width in bytes.  See :py:meth:`read_mem`.
+        :param str byteorder: Byte order of the target.
+        :param bool verify: Whether to verify the written data with ``crc32``.
+        :raises tbot.error.TransferError: If the verification failed.
+
+        .. versionadded:: UNRELEASED
+        """
+        width = self._mem_width(width, byteorder, addr, len(data))
+        mw = f"mw.{_MEM_SUFFIXES[width]}"
+
+        def commands() -> typing.Iterator[typing.List[ArgTypes]]:
+            offset = 0
+            while offset < len(data):
+                word = data[offset : offset + width]
+                end = offset + width
+                while data[end : end + width] == word:
+                    end += width
+                count = (end - offset) // width
+
+                cmd: typing.List[ArgTypes] = [
+                    mw,
+                    hex(addr + offset),
+                    hex(
+                        int.from_bytes(word, "big" if byteorder == "big" else "little")
+                    ),
+                ]
+                if count > 1:
+                    cmd.append(hex(count))
+                yield cmd
+                offset = end
+
+        self._exec0_chained(commands())
+
+        if verify:
+            self._verify_crc32(addr, data)
+
     def boot(self, *args: ArgTypes) -> channel.Channel:
         """
         Boot a payload from U-Boot.
@@ -406,6 +1100,7 @@ class UBootShell(shell.Shell, UbootStartup):
         ``interactive_uboot`` testcase.
         """
         tbot.log.message(f"Entering interactive shell...")
+        self._env_cache = None
 
         # It is important to send a space before the newline.  Otherwise U-Boot
         # will reexecute the last command which we definitely do not want here.
@@ -424,6 +1119,94 @@ class UBootShell(shell.Shell, UbootStartup):
         tbot.log.message("Exiting interactive shell ...")
 
     # Utilities ----- {{{
+    @property
+    def uboot_version(self) -> str:
+        """
+        Version string of the running U-Boot, including its build date.
+
+        Taken from the boot banner if tbot saw it, otherwise from the output
+        of ``version``.
+
+        .. versionadded:: UNRELEASED
+        """
+        if self._uboot_version is None:
+            version = facts.banner_version(getattr(self, "bootlog", ""))
+            if version is None:
+                out = self.exec0("version")
+                version = facts.banner_version(out)
+                if version is None:
+                    # Not a regular U-Boot banner, use whatever it prints first
+                    lines = [line for line in out.splitlines() if line.strip()]
+                    version = lines[0].strip() if lines else ""
+            self._uboot_version = version
+        return self._uboot_version
+
+    def _fact_board_name(self) -> str:
+        if isinstance(self, board.BoardMachineBase):
+            try:
+                return self.board.name
+            except Exception:
+                # Not instantiated from a board
+                pass
+        return self.name
+
+    def board_fact(self, name: str, query: typing.Callable[[], F]) -> F:
+        """
+        Get a fact about the board, querying it only if it is not cached.
+
+        Facts are values which only change when a different U-Boot build is
+        flashed, like the RAM layout or the address of the control
+        devicetree.  Unless :py:attr:`fact_cache` is disabled, they are kept
+        across U-Boot instances and tbot runs for each board and
+        :py:attr:`uboot_version`.  With the version taken from the boot
+        banner, a cached fact needs no commands at all.
+
+        :param str name: Name of the fact.
+        :param query: Function to get the fact if it is not cached.  The
+            returned value must be JSON-serializable.
+
+        **Example**:
+
+        .. code-block:: python
+
+            fdt_addr = ub.board_fact(
+                "fdtcontroladdr", lambda: int(ub.env("fdtcontroladdr"), 16)
+            )
+
+        .. versionadded:: UNRELEASED
+        """
+        if self._facts is None:
+            if self.fact_cache:
+                self._facts = facts.cache().get(
+                    self._fact_board_name(), self.uboot_version
+                )
+            else:
+                self._facts = {}
+
+        try:
+            return typing.cast(F, self._facts[name])
+        except KeyError:
+            value = query()
+            self._facts[name] = value
+            if self.fact_cache:
+                facts.cache().set(
+                    self._fact_board_name(), self.uboot_version, name, value
+                )
+            return value
+
+    def invalidate_board_facts(self) -> None:
+        """
+        Forget all cached facts about this board.
+
+        The persistent cache is only touched if :py:attr:`fact_cache` is
+        enabled.
+
+        .. versionadded:: UNRELEASED
+        """
+        self._facts = None
+        if self.fact_cache:
+            facts.cache().invalidate(self._fact_board_name())
+
     _ram_base: int
 
     @property
@@ -442,15 +1225,23 @@ class UBootShell(shell.Shell, UbootStartup):
             filepath =  # ...
             ub.exec0("tftp", hex(ub.ram_base), f"{serverip}:{filepath}")
             ub.exec0("iminfo", hex(ub.ram_base))
+
+        .. versionchanged:: UNRELEASED
+
+           The address is cached with :py:meth:`board_fact` instead of
+           running ``bdinfo`` once per U-Boot instance.
         """
         try:
             return self._ram_base
         except AttributeError:
-            out = self.exec0("bdinfo")
-            match = re.search(r"^-> start\s+= (0x[\dA-Fa-f]+)$", out, re.MULTILINE)
-            if match is None:
-                raise tbot.error.MachineError("RAM base not found in bdinfo output!")
-            self._ram_base = int(match.group(1), 16)
+            self._ram_base = self.board_fact("ram_base", self._query_ram_base)
             return self._ram_base
 
+    def _query_ram_base(self) -> int:
+        out = self.exec0("bdinfo")
+        match = re.search(r"^-> start\s+= (0x[\dA-Fa-f]+)$", out, re.MULTILINE)
+        if match is None:
+            raise tbot.error.MachineError("RAM base not found in bdinfo output!")
+        return int(match.group(1), 16)
+
     # }}}
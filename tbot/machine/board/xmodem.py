@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+XMODEM and YMODEM senders for loading files over a console.
+
+These are used by :py:meth:`UBootShell.load_serial()
+<tbot.machine.board.UBootShell.load_serial>` but work with any receiver
+speaking the protocols.
+"""
+
+import binascii
+import time
+import typing
+
+import tbot.error
+from .. import channel
+
+SOH = 0x01
+STX = 0x02
+EOT = 0x04
+ACK = 0x06
+NAK = 0x15
+CAN = 0x18
+CRC = ord("C")
+CPMEOF = 0x1A
+
+PROTOCOLS = ("xmodem", "ymodem")
+
+ProgressCallback = typing.Callable[[int, int], None]
+
+
+class Sender:
+    """
+    Send a file using XMODEM (with CRC or checksum) or YMODEM.
+
+    :param channel.Channel ch: Channel to the receiver.  The receiver must
+        already be waiting for the transfer.
+    :param str protocol: ``"xmodem"`` or ``"ymodem"``.
+    :param int block_size: ``1024`` (XMODEM-1K, the default for YMODEM) or
+        ``128``.  Only applies to data blocks.
+    :param int retries: How often a block is sent again after a ``NAK`` or
+        timeout before giving up.
+    :param float timeout: Time to wait for the receiver to respond to a
+        block.
+    :param progress: Optional callback which is called with the number of
+        acknowledged bytes and the total after each block.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(
+        self,
+        ch: channel.Channel,
+        protocol: str = "ymodem",
+        block_size: int = 1024,
+        retries: int = 10,
+        timeout: float = 10.0,
+        progress: typing.Optional[ProgressCallback] = None,
+    ) -> None:
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"unsupported protocol {protocol!r}")
+        if block_size not in (128, 1024):
+            raise ValueError(f"invalid block size {block_size}")
+
+        self.ch = ch
+        self.protocol = protocol
+        self.block_size = block_size
+        self.retries = retries
+        self.timeout = timeout
+        self.progress = progress
+        self._use_crc = True
+
+    def _read_byte(self, timeout: float) -> typing.Optional[int]:
+        try:
+            return self.ch.read(1, timeout=timeout)[0]
+        except TimeoutError:
+            return None
+
+    def _wait_for(self, wanted: typing.Container[int], timeout: float) -> int:
+        """Skip over everything else until one of ``wanted`` or a ``CAN``."""
+        end_time = time.monotonic() + timeout
+        while True:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError()
+            c = self._read_byte(remaining)
+            if c is not None and (c in wanted or c == CAN):
+                return c
+
+    def _wait_start(self, acked: int) -> None:
+        try:
+            c = self._wait_for((CRC, NAK), self.timeout * 3)
+        except TimeoutError:
+            raise tbot.error.TransferError(
+                "receiver did not start the transfer", acked
+            ) from None
+        if c == CAN:
+            raise tbot.error.TransferError("receiver cancelled the transfer", acked)
+        self._use_crc = c == CRC
+        if self.protocol == "ymodem" and not self._use_crc:
+            raise tbot.error.TransferError("receiver does not support CRC mode", acked)
+
+    def _packet(self, num: int, payload: bytes) -> bytes:
+        num &= 0xFF
+        header = bytes([SOH if len(payload) == 128 else STX, num, 0xFF - num])
+        if self._use_crc:
+            check = binascii.crc_hqx(payload, 0).to_bytes(2, "big")
+        else:
+            check = bytes([sum(payload) & 0xFF])
+        return header + payload + check
+
+    def _send_packet(self, packet: bytes, acked: int) -> None:
+        for _ in range(self.retries + 1):
+            self.ch.write(packet, _ignore_blacklist=True)
+            try:
+                c = self._wait_for((ACK, NAK), self.timeout)
+            except TimeoutError:
+                continue
+            if c == ACK:
+                return
+            if c == CAN:
+                raise tbot.error.TransferError("receiver cancelled the transfer", acked)
+
+        raise tbot.error.TransferError("block was not acknowledged", acked)
+
+    def _send_eot(self, acked: int) -> None:
+        for _ in range(self.retries + 1):
+            self.ch.write(bytes([EOT]), _ignore_blacklist=True)
+            try:
+                c = self._wait_for((ACK, NAK), self.timeout)
+            except TimeoutError:
+                continue
+            if c == ACK:
+                return
+            if c == CAN:
+                raise tbot.error.TransferError("receiver cancelled the transfer", acked)
+            # Many receivers NAK the first EOT to make sure it wasn't noise
+
+        raise tbot.error.TransferError("end of transfer was not acknowledged", acked)
+
+    def _header_block(self, name: str, size: int) -> bytes:
+        info = name.encode("utf-8") + b"\0" + str(size).encode("ascii") + b"\0"
+        length = 128 if len(info) <= 128 else 1024
+        return info.ljust(length, b"\0")
+
+    def send(self, data: bytes, name: str = "") -> None:
+        """
+        Send ``data``.
+
+        :param bytes data: The data to transfer.
+        :param str name: File name for the YMODEM header.
+        :raises tbot.error.TransferError: If the transfer failed.
+        """
+        total = len(data)
+        acked = 0
+
+        self._wait_start(acked)
+
+        if self.protocol == "ymodem":
+            self._send_packet(self._packet(0, self._header_block(name, total)), acked)
+            # The receiver asks for the data with another 'C'
+            self._wait_start(acked)
+
+        num = 1
+        while acked < total:
+            payload = data[acked : acked + self.block_size]
+            if len(payload) <= 128:
+                # Use a small block for the tail to save some padding
+                payload = data[acked : acked + 128]
+            block_size = 128 if len(payload) <= 128 else self.block_size
+            self._send_packet(
+                self._packet(num, payload.ljust(block_size, bytes([CPMEOF]))), acked
+            )
+            acked += len(payload)
+            num += 1
+            if self.progress is not None:
+                self.progress(acked, total)
+
+        self._send_eot(acked)
+
+        if self.protocol == "ymodem":
+            # An empty header ends the batch
+            self._wait_start(acked)
+            self._send_packet(self._packet(0, bytes(128)), acked)
+
+    def cancel(self) -> None:
+        """Make the receiver abort the transfer."""
+        self.ch.write(bytes([CAN] * 5), _ignore_blacklist=True)
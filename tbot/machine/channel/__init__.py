@@ -10,6 +10,9 @@ from .channel import (
 
 from .subprocess import SubprocessChannel
 from .null import NullChannel
+from .aio import AsyncChannel
+from .reactor import Reactor
+from . import record
 
 try:
     from .paramiko import ParamikoChannel
@@ -18,6 +21,7 @@ except ImportError:  # pragma: no cover
     pass
 
 __all__ = (
+    "AsyncChannel",
     "BoundedPattern",
     "Channel",
     "ChannelBorrowedException",
@@ -26,6 +30,8 @@ __all__ = (
     "ChannelTakenException",
     "DeathStringException",
     "ParamikoChannel",
+    "Reactor",
+    "record",
     "SubprocessChannel",
     "NullChannel",
 )
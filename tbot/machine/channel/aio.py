@@ -0,0 +1,245 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
+import contextlib
+import select
+import sys
+import time
+import typing
+
+import tbot.error
+
+from . import channel
+
+# Interval in which to check whether the channel was closed while waiting
+# for data.  Some channels never signal readability when the other side
+# goes away.
+CLOSED_POLL_INTERVAL = 0.3
+
+# Time to wait for data after the channel signalled readability.  Only
+# matters for spurious wakeups, where it bounds how long the loop is blocked.
+_READ_GRACE = 0.001
+
+
+class AsyncChannel:
+    """
+    asyncio interface to a :py:class:`~tbot.machine.channel.Channel`.
+
+    Instead of blocking the calling thread while waiting for data,
+    ``AsyncChannel`` registers the channel's file descriptor with the running
+    event loop (:py:meth:`asyncio.loop.add_reader`).  This allows a single
+    thread to drive many consoles at once:
+
+    .. code-block:: python
+
+        async def wait_for_login(b: board.Board) -> None:
+            ach = channel.AsyncChannel(b.ch)
+            await ach.expect("login:", timeout=60)
+
+        async def main(boards) -> None:
+            await asyncio.gather(*(wait_for_login(b) for b in boards))
+
+    The ``AsyncChannel`` shares all state with the underlying channel: The
+    prompt (see :py:meth:`Channel.with_prompt`), death-strings, and attached
+    streams all apply.  Synchronous and asynchronous calls must not be mixed
+    concurrently on the same channel.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    __slots__ = ("ch",)
+
+    def __init__(self, ch: channel.Channel) -> None:
+        self.ch = ch
+
+    @property
+    def prompt(self) -> typing.Optional[channel.SearchString]:
+        """Prompt of the underlying channel."""
+        return self.ch.prompt
+
+    def with_prompt(
+        self, prompt: typing.Optional[channel.ConvenientSearchString]
+    ) -> typing.ContextManager[channel.Channel]:
+        """Set the prompt for this channel during a context.  See :py:meth:`Channel.with_prompt`."""
+        return self.ch.with_prompt(prompt)
+
+    async def _wait_readable(self, timeout: typing.Optional[float]) -> None:
+        fd = self.ch.fileno()
+
+        # Fast path: Data is already waiting.
+        r, _, _ = select.select([fd], [], [], 0)
+        if r != []:
+            return
+
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        end_time = None if timeout is None else time.monotonic() + timeout
+
+        loop.add_reader(fd, ready.set)
+        try:
+            while True:
+                wait = CLOSED_POLL_INTERVAL
+                if end_time is not None:
+                    wait = min(wait, end_time - time.monotonic())
+                    if wait <= 0:
+                        raise TimeoutError()
+
+                try:
+                    await asyncio.wait_for(ready.wait(), wait)
+                    return
+                except asyncio.TimeoutError:
+                    if self.ch.closed:
+                        raise tbot.error.ChannelClosedError from None
+        finally:
+            loop.remove_reader(fd)
+
+    async def _read_chunk(self, n: int, timeout: typing.Optional[float]) -> bytes:
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if end_time is None else end_time - time.monotonic()
+            await self._wait_readable(remaining)
+
+            try:
+                new = self.ch._c.read(n, _READ_GRACE)
+            except TimeoutError:
+                # Spurious wakeup, go back to waiting
+                continue
+
+            self.ch._write_stream(new)
+            self.ch._check(new)
+            return new
+
+    async def read_iter(
+        self, max: int = sys.maxsize, timeout: typing.Optional[float] = None
+    ) -> typing.AsyncIterator[bytes]:
+        """
+        Iterate over chunks of bytes read from the channel.
+
+        Works like :py:meth:`Channel.read_iter` but waits asynchronously.
+        """
+        start_time = time.monotonic()
+
+        bytes_read = 0
+        while bytes_read < max:
+            timeout_remaining = None
+            if timeout is not None:
+                timeout_remaining = timeout - (time.monotonic() - start_time)
+                if timeout_remaining <= 0:
+                    raise TimeoutError()
+
+            max_read = min(self.ch.READ_CHUNK_SIZE, max - bytes_read)
+            new = await self._read_chunk(max_read, timeout_remaining)
+            bytes_read += len(new)
+            yield new
+
+    async def read(self, n: int = -1, timeout: typing.Optional[float] = None) -> bytes:
+        """
+        Receive some bytes from this channel.
+
+        Works like :py:meth:`Channel.read`: With ``n = -1``, waits for at least
+        one byte and then returns everything which is available.  Otherwise,
+        returns exactly ``n`` bytes.
+        """
+        buf = bytearray()
+        if n < 0:
+            buf += await self._read_chunk(self.ch.READ_CHUNK_SIZE, timeout)
+            # Collect everything which is immediately available as well
+            with contextlib.suppress(TimeoutError):
+                while True:
+                    buf += await self._read_chunk(self.ch.READ_CHUNK_SIZE, 0.0)
+        else:
+            async for chunk in self.read_iter(max=n, timeout=timeout):
+                buf += chunk
+
+        return bytes(buf)
+
+    async def write(self, buf: bytes, _ignore_blacklist: bool = False) -> None:
+        """Write some bytes to this channel.  See :py:meth:`Channel.write`."""
+        if self.ch.slow_send_delay is None:
+            self.ch.write(buf, _ignore_blacklist=_ignore_blacklist)
+            return
+
+        for i in range(0, len(buf), self.ch.slow_send_chunksize):
+            chunk = buf[i : i + self.ch.slow_send_chunksize]
+            self.ch.write(chunk, _ignore_blacklist=_ignore_blacklist)
+            await asyncio.sleep(self.ch.slow_send_delay)
+
+    async def send(
+        self,
+        s: typing.Union[str, bytes],
+        read_back: bool = False,
+        timeout: typing.Optional[float] = None,
+    ) -> None:
+        """Send data to this channel.  See :py:meth:`Channel.send`."""
+        s = s.encode("utf-8") if isinstance(s, str) else s
+
+        for i in range(0, len(s), 512):
+            chunk = s[i : i + 512]
+            await self.write(chunk)
+
+            if read_back:
+                length = len(chunk) + chunk.count(b"\r") + chunk.count(b"\n")
+                await self.read(n=length, timeout=timeout)
+
+    async def sendline(
+        self,
+        s: typing.Union[str, bytes] = "",
+        read_back: bool = False,
+        timeout: typing.Optional[float] = None,
+    ) -> None:
+        """Send data to this channel and terminate with a newline.  See :py:meth:`Channel.sendline`."""
+        s = s.encode("utf-8") if isinstance(s, str) else s
+        await self.send(s + b"\r", read_back, timeout)
+
+    async def expect(
+        self,
+        patterns: typing.Union[
+            channel.ConvenientSearchString, typing.List[channel.ConvenientSearchString]
+        ],
+        timeout: typing.Optional[float] = None,
+    ) -> channel.ExpectResult:
+        """Wait for a pattern to appear in the incoming data.  See :py:meth:`Channel.expect`."""
+        if not isinstance(patterns, list):
+            pattern_list = [channel._convert_search_string(patterns)]
+        else:
+            pattern_list = [channel._convert_search_string(pat) for pat in patterns]
+
+        with channel._wait_span("expect", patterns):
+            buf = bytearray()
+            async for chunk in self.read_iter(timeout=timeout):
+                buf.extend(chunk)
+
+                result = channel._match_expect(buf, pattern_list)
+                if result is not None:
+                    return result
+
+        raise Exception("reached end of stream without pattern appearing")
+
+    async def read_until_prompt(
+        self,
+        prompt: typing.Optional[channel.ConvenientSearchString] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> str:
+        """Read until prompt is detected.  See :py:meth:`Channel.read_until_prompt`."""
+        buf = bytearray()
+
+        with self.ch.with_prompt(prompt), channel._wait_span(
+            "read_until_prompt", self.ch.prompt
+        ):
+            async for new in self.read_iter(timeout=timeout):
+                buf += new
+
+                out = channel._match_prompt(buf, self.ch.prompt)
+                if out is not None:
+                    return out
+
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    async def read_until_timeout(self, timeout: typing.Optional[float]) -> str:
+        """Read until the given timeout expires.  See :py:meth:`Channel.read_until_timeout`."""
+        buf = bytearray()
+
+        with contextlib.suppress(TimeoutError):
+            async for new in self.read_iter(timeout=timeout):
+                buf += new
+
+        return channel._decode(buf)
@@ -30,6 +30,9 @@ import typing
 import tbot
 import tbot.error
 
+if typing.TYPE_CHECKING:
+    from . import record
+
 ChanIO = typing.TypeVar("ChanIO", bound="ChannelIO")
 
 
@@ -42,6 +45,10 @@ ChannelTakenException = tbot.error.ChannelTakenError
 class ChannelIO(typing.ContextManager):
     __slots__ = ()
 
+    # Whether this ChannelIO checks death-strings on its own (see
+    # DrainingChannelIO).
+    _checks_death_strings = False
+
     # generic channel interface {{{
     @abc.abstractmethod
     def write(self, buf: bytes) -> int:
@@ -128,7 +135,7 @@ _CHANID_COLORS = ["red", "green", "yellow", "blue", "magenta", "cyan"]
 
 
 def _debug_log(chan: ChannelIO, data: bytes, is_out: bool = False) -> bytes:
-    if tbot.log.VERBOSITY >= tbot.log.Verbosity.CHANNEL:
+    if tbot.log._verbosity() >= tbot.log.Verbosity.CHANNEL:
         json_data = data.decode("utf-8", errors="replace")
 
         # Find a color for this channel to make distinguishing them easier
@@ -152,6 +159,12 @@ def _debug_log(chan: ChannelIO, data: bytes, is_out: bool = False) -> bytes:
     return data
 
 
+def _wait_span(kind: str, pattern: typing.Any) -> typing.ContextManager[None]:
+    if not tbot.log.TRACE_CHANNEL:
+        return contextlib.nullcontext()
+    return tbot.log_event.span("channel", f"{kind} {pattern!r}")
+
+
 class ChannelBorrowed(ChannelIO):  # pragma: no cover
     exception: typing.Type[Exception] = tbot.error.ChannelBorrowedError
 
@@ -262,6 +275,81 @@ class ExpectResult(typing.NamedTuple):
     """Any potential bytes which were read following the matched pattern."""
 
 
+def _decode(buf: typing.Union[bytes, bytearray]) -> str:
+    return (
+        buf.decode("utf-8", errors="replace")
+        .replace("\r\n", "\n")
+        .replace("\n\r", "\n")
+    )
+
+
+def _match_expect(
+    buf: bytearray, pattern_list: typing.List[SearchString]
+) -> typing.Optional[ExpectResult]:
+    found = _find_expect(buf, pattern_list)
+    return found[0] if found is not None else None
+
+
+def _find_expect(
+    buf: bytearray, pattern_list: typing.List[SearchString]
+) -> typing.Optional[typing.Tuple[ExpectResult, int]]:
+    # Like _match_expect() but also returns the offset where the match ends
+    for pattern_index, pat in enumerate(pattern_list):
+        if isinstance(pat, bytes):
+            index = buf.find(pat)
+            if index != -1:
+                end = index + len(pat)
+                return (
+                    ExpectResult(
+                        pattern_index,
+                        pat.decode("utf-8", errors="replace"),
+                        _decode(buf[:index]),
+                        _decode(buf[end:]),
+                    ),
+                    end,
+                )
+        elif isinstance(pat, BoundedPattern):
+            match = pat.pattern.search(buf)
+            if match is not None:
+                start, end = match.span(0)
+                return (
+                    ExpectResult(
+                        pattern_index, match, _decode(buf[:start]), _decode(buf[end:])
+                    ),
+                    end,
+                )
+        else:
+            raise AssertionError(f"expect pattern has unknown type: {pat.__class__!r}")
+
+    return None
+
+
+def _convert_prompt(prompt_in: ConvenientSearchString) -> SearchString:
+    prompt = _convert_search_string(prompt_in)
+
+    # If the prompt is a pattern, we need to recompile it with an additional $ in the
+    # end to ensure that it only matches the end of the stream
+    if isinstance(prompt, BoundedPattern):
+        new_pattern = re.compile(prompt.pattern.pattern + b"$", prompt.pattern.flags)
+        prompt = BoundedPattern(new_pattern)
+
+    return prompt
+
+
+def _match_prompt(
+    buf: bytearray, prompt: typing.Optional[SearchString]
+) -> typing.Optional[str]:
+    if isinstance(prompt, bytes):
+        if buf.endswith(prompt):
+            return _decode(buf[: -len(prompt)])
+    elif isinstance(prompt, BoundedPattern):
+        match = prompt.pattern.search(buf)
+        if match is not None:
+            return _decode(buf[: match.span()[0]])
+
+    return None
+
+
 class Channel(typing.ContextManager):
     __slots__ = (
         "_c",
@@ -601,6 +689,10 @@ class Channel(typing.ContextManager):
             self.death_strings.remove((string, exception_type, ringbuf))
 
     def _check(self, incoming: bytes) -> None:
+        if not self._c._checks_death_strings:
+            self._check_death_strings(incoming)
+
+    def _check_death_strings(self, incoming: bytes) -> None:
         if self.death_strings == []:
             return
 
@@ -794,45 +886,45 @@ class Channel(typing.ContextManager):
         else:
             pattern_list = [_convert_search_string(pat) for pat in patterns]
 
+        with _wait_span("expect", patterns):
+            return self._expect(pattern_list, timeout)
+
+    def _expect(
+        self, pattern_list: typing.List[SearchString], timeout: typing.Optional[float]
+    ) -> ExpectResult:
         buf = bytearray()
         for chunk in self.read_iter(timeout=timeout):
             buf.extend(chunk)
 
-            for pattern_index, pat in enumerate(pattern_list):
-                if isinstance(pat, bytes):
-                    index = buf.find(pat)
-                    if index != -1:
-                        return ExpectResult(
-                            pattern_index,
-                            pat.decode("utf-8", errors="replace"),
-                            buf[:index]
-                            .decode("utf-8", errors="replace")
-                            .replace("\r\n", "\n")
-                            .replace("\n\r", "\n"),
-                            buf[index + len(pat) :]
-                            .decode("utf-8", errors="replace")
-                            .replace("\r\n", "\n")
-                            .replace("\n\r", "\n"),
-                        )
-                elif isinstance(pat, BoundedPattern):
-                    match = pat.pattern.search(buf)
-                    if match is not None:
-                        return ExpectResult(
-                            pattern_index,
-                            match,
-                            buf[: match.span(0)[0]]
-                            .decode("utf-8", errors="replace")
-                            .replace("\r\n", "\n")
-                            .replace("\n\r", "\n"),
-                            buf[match.span(0)[1] :]
-                            .decode("utf-8", errors="replace")
-                            .replace("\r\n", "\n")
-                            .replace("\n\r", "\n"),
-                        )
-                else:
-                    raise AssertionError(
-                        f"expect pattern has unknown type: {pat.__class__!r}"
-                    )
+            result = _match_expect(buf, pattern_list)
+            if result is not None:
+                return result
+
+        raise Exception("reached end of stream without pattern appearing")
+
+    def _expect_buffered(
+        self,
+        buf: bytearray,
+        patterns: typing.List[ConvenientSearchString],
+        timeout: typing.Optional[float] = None,
+    ) -> ExpectResult:
+        """
+        Like :py:meth:`expect`, but for waiting on a sequence of patterns.
+
+        Matching starts with the data left over in ``buf`` from a previous
+        call.  Everything up to the end of the match is removed from ``buf``,
+        the data following it stays there for the next call.
+        """
+        pattern_list = [_convert_search_string(pat) for pat in patterns]
+
+        with _wait_span("expect", patterns):
+            for chunk in itertools.chain([b""], self.read_iter(timeout=timeout)):
+                buf.extend(chunk)
+
+                found = _find_expect(buf, pattern_list)
+                if found is not None:
+                    del buf[: found[1]]
+                    return found[0]
 
         raise Exception("reached end of stream without pattern appearing")
 
@@ -864,15 +956,7 @@ class Channel(typing.ContextManager):
             # overrides easier to implement.
             yield self
         else:
-            prompt = _convert_search_string(prompt_in)
-
-            # If the prompt is a pattern, we need to recompile it with an additional $ in the
-            # end to ensure that it only matches the end of the stream
-            if isinstance(prompt, BoundedPattern):
-                new_pattern = re.compile(
-                    prompt.pattern.pattern + b"$", prompt.pattern.flags
-                )
-                prompt = BoundedPattern(new_pattern)
+            prompt = _convert_prompt(prompt_in)
 
             previous = self.prompt
             self.prompt = prompt
@@ -914,27 +998,13 @@ class Channel(typing.ContextManager):
 
         buf = bytearray()
 
-        with ctx:
+        with ctx, _wait_span("read_until_prompt", self.prompt):
             for new in self.read_iter(timeout=timeout):
                 buf += new
 
-                if isinstance(self.prompt, bytes):
-                    if buf.endswith(self.prompt):
-                        return (
-                            buf[: -len(self.prompt)]
-                            .decode("utf-8", errors="replace")
-                            .replace("\r\n", "\n")
-                            .replace("\n\r", "\n")
-                        )
-                elif isinstance(self.prompt, BoundedPattern):
-                    match = self.prompt.pattern.search(buf)
-                    if match is not None:
-                        return (
-                            buf[: match.span()[0]]
-                            .decode("utf-8", errors="replace")
-                            .replace("\r\n", "\n")
-                            .replace("\n\r", "\n")
-                        )
+                out = _match_prompt(buf, self.prompt)
+                if out is not None:
+                    return out
 
         raise RuntimeError("unreachable")  # pragma: no cover
 
@@ -974,6 +1044,94 @@ class Channel(typing.ContextManager):
 
     # }}}
 
+    def start_drain(
+        self, max_memory: int = 1024 * 1024, spill_dir: typing.Optional[str] = None
+    ) -> None:
+        """
+        Continuously read this channel in the background.
+
+        Serial consoles only buffer a limited amount of data.  While a testcase
+        is busy with something else, output of the board (like boot messages or
+        a kernel panic) can get lost.  In drain mode, a background thread
+        reads all incoming data into a buffer of up to ``max_memory`` bytes.
+        Reads and :py:meth:`expect` calls consume from this buffer.
+        Death-strings are checked as soon as data arrives and a hit is raised
+        by the next read.
+
+        When the buffer is full, further data is spilled to a temporary file
+        in ``spill_dir``.  If ``spill_dir`` is ``None``, the oldest data is
+        dropped instead.
+
+        Usually, this is enabled in a connector:
+
+        .. code-block:: python
+
+            class MyBoard(connector.ConsoleConnector, board.Board):
+                def connect(self, mach):
+                    ch = mach.open_channel("picocom", "-q", "-b", "115200", "/dev/ttyUSB0")
+                    ch.start_drain(spill_dir="/tmp")
+                    return ch
+
+        Calling this on a channel which is already draining does nothing.
+
+        .. versionadded:: UNRELEASED
+        """
+        from . import drain
+
+        if isinstance(self._c, drain.DrainingChannelIO):
+            return
+        self._c = drain.DrainingChannelIO(self._c, self, max_memory, spill_dir)
+
+    def start_recording(
+        self, path: str, name: typing.Optional[str] = None
+    ) -> "record.Recorder":
+        """
+        Record all data sent and received on this channel to ``path``.
+
+        Each chunk of data is stored with a timestamp in a compact binary
+        format.  Different to :py:attr:`tbot.log.Verbosity.CHANNEL`, this also
+        captures data which is never shown in the log and the actual file
+        writes happen in a background thread.  Use
+        ``generators/consolerec.py`` to look at a recording.  Recording stops
+        when the channel is closed.
+
+        ``newbot --record-console DIR`` records the channels of all machines.
+
+        Calling this on a channel which is already being recorded returns the
+        existing :py:class:`~tbot.machine.channel.record.Recorder`.
+
+        .. versionadded:: UNRELEASED
+        """
+        from . import drain, record
+
+        existing = self.recorder
+        if existing is not None:
+            return existing
+
+        recorder = record.Recorder(path, name)
+        if isinstance(self._c, drain.DrainingChannelIO):
+            # Record data when it arrives, not when it is consumed
+            self._c.inner = record.RecordingChannelIO(self._c.inner, recorder)
+        else:
+            self._c = record.RecordingChannelIO(self._c, recorder)
+        return recorder
+
+    @property
+    def recorder(self) -> "typing.Optional[record.Recorder]":
+        """
+        The recorder of this channel if it is being recorded.
+
+        .. versionadded:: UNRELEASED
+        """
+        from . import drain, record
+
+        chan_io = self._c
+        if isinstance(chan_io, drain.DrainingChannelIO):
+            chan_io = chan_io.inner
+        if isinstance(chan_io, record.RecordingChannelIO):
+            return chan_io.recorder
+        return None
+
     # borrowing & taking {{{
     @contextlib.contextmanager
     def borrow(self) -> "typing.Iterator[Channel]":
@@ -995,12 +1153,12 @@ class Channel(typing.ContextManager):
         try:
             self._c = ChannelBorrowed()
             new = copy.deepcopy(self)
-            new._c = chan_io
+            new._adopt(chan_io)
             yield new
 
             # TODO: Maybe don't allow exceptions here?
         finally:
-            self._c = chan_io
+            self._adopt(chan_io)
             # Todo mark the `new` channel as no longer accessible
 
     def take(self) -> "Channel":
@@ -1015,9 +1173,17 @@ class Channel(typing.ContextManager):
         chan_io = self._c
         self._c = ChannelTaken()
         new = copy.deepcopy(self)
-        new._c = chan_io
+        new._adopt(chan_io)
         return new
 
+    def _adopt(self, chan_io: ChannelIO) -> None:
+        from . import drain
+
+        self._c = chan_io
+        if isinstance(chan_io, drain.DrainingChannelIO):
+            # Death-strings of the new owner apply from now on
+            chan_io.owner = self
+
     # }}}
 
     # interactive {{{
@@ -1065,6 +1231,7 @@ class Channel(typing.ContextManager):
             tbot.log.message(
                 tbot.log.c("Press CTRL+] three times within 1 second to exit.").bold
             )
+        tbot.log.flush_console()
 
         oldtty = termios.tcgetattr(sys.stdin)
         try:
@@ -0,0 +1,228 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import os
+import tempfile
+import threading
+import typing
+
+import tbot
+import tbot.error
+
+from . import channel
+
+# Timeout for each read of the background thread.  Bounds how long closing a
+# draining channel takes.
+_POLL_INTERVAL = 0.2
+
+
+class DrainingChannelIO(channel.ChannelIO):
+    """
+    ChannelIO wrapper which continuously reads the underlying channel in a
+    background thread.
+
+    Use :py:meth:`Channel.start_drain() <tbot.machine.channel.Channel.start_drain>`
+    to enable this for a channel.
+
+    Data is kept in memory up to ``max_memory`` bytes.  Beyond that, it is
+    spilled to a temporary file in ``spill_dir`` (if set) or the oldest data
+    is dropped.  Death-strings are checked by the background thread as soon
+    as data arrives; a hit is raised by the next foreground read.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    __slots__ = (
+        "inner",
+        "owner",
+        "max_memory",
+        "spill_dir",
+        "_cond",
+        "_mem",
+        "_spill",
+        "_spill_pos",
+        "_dropped",
+        "_error",
+        "_inner_closed",
+        "_stop",
+        "_notify_r",
+        "_notify_w",
+        "_signalled",
+        "_thread",
+    )
+
+    _checks_death_strings = True
+
+    def __init__(
+        self,
+        inner: channel.ChannelIO,
+        owner: "channel.Channel",
+        max_memory: int = 1024 * 1024,
+        spill_dir: typing.Optional[str] = None,
+    ) -> None:
+        self.inner = inner
+        self.owner = owner
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+
+        self._cond = threading.Condition()
+        self._mem = bytearray()
+        self._spill: typing.Optional[typing.BinaryIO] = None
+        self._spill_pos = 0
+        self._dropped = 0
+        self._error: typing.Optional[BaseException] = None
+        self._inner_closed = False
+        self._stop = False
+
+        # Self-pipe which is readable whenever buffered data is available, so
+        # select()-based code (e.g. attach_interactive) keeps working.
+        self._notify_r, self._notify_w = os.pipe()
+        os.set_blocking(self._notify_r, False)
+        self._signalled = False
+
+        self._thread = threading.Thread(
+            target=self._drain, name="tbot-channel-drain", daemon=True
+        )
+        self._thread.start()
+
+    # background thread {{{
+    def _drain(self) -> None:
+        while not self._stop:
+            try:
+                new = self.inner.read(4096, _POLL_INTERVAL)
+            except TimeoutError:
+                continue
+            except Exception:
+                with self._cond:
+                    self._inner_closed = True
+                    self._signal()
+                    self._cond.notify_all()
+                return
+
+            error = None
+            try:
+                self.owner._check_death_strings(new)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._store(new)
+                if error is not None and self._error is None:
+                    self._error = error
+                self._signal()
+                self._cond.notify_all()
+
+    def _store(self, new: bytes) -> None:
+        if self._spill is None and len(self._mem) + len(new) <= self.max_memory:
+            self._mem += new
+            return
+
+        if self.spill_dir is not None:
+            if self._spill is None:
+                self._spill = typing.cast(
+                    typing.BinaryIO,
+                    tempfile.TemporaryFile(prefix="tbot-drain-", dir=self.spill_dir),
+                )
+                self._spill_pos = 0
+            self._spill.seek(0, os.SEEK_END)
+            self._spill.write(new)
+            return
+
+        # No spilling, drop the oldest data instead.
+        self._mem += new
+        overflow = len(self._mem) - self.max_memory
+        if overflow > 0:
+            if self._dropped == 0:
+                tbot.log.warning(
+                    "Console output is not read fast enough, dropping data."
+                )
+            del self._mem[:overflow]
+            self._dropped += overflow
+
+    def _available(self) -> bool:
+        return self._mem != b"" or self._spill is not None
+
+    def _signal(self) -> None:
+        if not self._signalled and (self._available() or self._inner_closed):
+            os.write(self._notify_w, b"\0")
+            self._signalled = True
+
+    def _unsignal(self) -> None:
+        if self._signalled and not (self._available() or self._inner_closed):
+            try:
+                while os.read(self._notify_r, 64) != b"":
+                    pass
+            except BlockingIOError:
+                pass
+            self._signalled = False
+
+    # }}}
+
+    def _take(self, n: int) -> bytes:
+        if self._mem == b"" and self._spill is not None:
+            # Refill from the spill file
+            self._spill.seek(self._spill_pos)
+            chunk = self._spill.read(self.max_memory)
+            self._spill_pos += len(chunk)
+            self._mem += chunk
+            if self._spill.read(1) == b"":
+                self._spill.close()
+                self._spill = None
+
+        data = bytes(self._mem[:n])
+        del self._mem[:n]
+        return data
+
+    @property
+    def dropped(self) -> int:
+        """Number of bytes which were dropped because the buffer was full."""
+        return self._dropped
+
+    def write(self, buf: bytes) -> int:
+        return self.inner.write(buf)
+
+    def read(self, n: int, timeout: typing.Optional[float] = None) -> bytes:
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._available()
+                or self._error is not None
+                or self._inner_closed,
+                timeout,
+            )
+
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            if not ready:
+                raise TimeoutError()
+            if not self._available():
+                raise tbot.error.ChannelClosedError
+
+            data = self._take(n)
+            self._unsignal()
+            return data
+
+    def close(self) -> None:
+        self.stop()
+        self.inner.close()
+
+    def stop(self) -> None:
+        """Stop the background thread.  Buffered data is kept."""
+        self._stop = True
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def fileno(self) -> int:
+        return self._notify_r
+
+    @property
+    def closed(self) -> bool:
+        with self._cond:
+            return self.inner.closed and not self._available()
+
+    def update_pty(self, columns: int, lines: int) -> None:
+        self.inner.update_pty(columns, lines)
+
+    def __del__(self) -> None:
+        os.close(self._notify_r)
+        os.close(self._notify_w)
+        if self._spill is not None:
+            self._spill.close()
@@ -0,0 +1,291 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import concurrent.futures
+import selectors
+import time
+import typing
+
+import tbot.error
+
+from . import channel
+
+# Interval in which to check whether channels were closed.  Some channels never
+# signal readability when the other side goes away.
+CLOSED_POLL_INTERVAL = 0.3
+
+# Time to wait for data after the channel signalled readability.
+_READ_GRACE = 0.001
+
+_Matcher = typing.Callable[[bytearray], typing.Any]
+
+
+class _Wait(typing.NamedTuple):
+    matcher: _Matcher
+    deadline: typing.Optional[float]
+    future: concurrent.futures.Future
+
+
+class _Registration:
+    __slots__ = ("ch", "backlog", "wait", "error")
+
+    def __init__(self, ch: channel.Channel) -> None:
+        self.ch = ch
+        self.backlog = bytearray()
+        self.wait: typing.Optional[_Wait] = None
+        self.error: typing.Optional[BaseException] = None
+
+
+class Reactor:
+    """
+    Wait on many channels at once from a single thread.
+
+    All channels registered with a ``Reactor`` are drained continuously while
+    :py:meth:`run` or :py:meth:`poll` is active: Attached streams (e.g. the
+    boot-log of a board) receive data as it arrives and death-strings are
+    checked, no matter which channel is currently waited on.  Waits like
+    :py:meth:`expect` and :py:meth:`read_until_prompt` return a
+    :py:class:`concurrent.futures.Future` which is resolved once the pattern
+    shows up on that channel.
+
+    This is most useful for the long waits while booting many boards:
+
+    .. code-block:: python
+
+        with channel.Reactor() as reactor:
+            waits = [
+                reactor.expect(b.ch, "Hit any key to stop autoboot", timeout=30)
+                for b in boards
+            ]
+            reactor.run()
+
+            for b in boards:
+                b.ch.send("\\r")
+
+    Data which arrives while no wait is pending on a channel is kept and
+    searched by the next wait on that channel.  Each channel can only have one
+    pending wait at a time.  While registered, channels must not be read from
+    directly; :py:meth:`unregister` a channel (or leave the ``with``-block) to
+    use it normally again.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self) -> None:
+        self._sel = selectors.DefaultSelector()
+        self._regs: typing.Dict[channel.Channel, _Registration] = {}
+
+    def __enter__(self) -> "Reactor":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unregister all channels and cancel pending waits."""
+        for ch in list(self._regs):
+            self.unregister(ch)
+        self._sel.close()
+
+    def register(self, ch: channel.Channel) -> None:
+        """
+        Start draining ``ch``.
+
+        Waiting on a channel registers it automatically.
+        """
+        if ch in self._regs:
+            return
+        reg = _Registration(ch)
+        self._sel.register(ch.fileno(), selectors.EVENT_READ, reg)
+        self._regs[ch] = reg
+
+    def unregister(self, ch: channel.Channel) -> None:
+        """
+        Stop draining ``ch``.
+
+        A pending wait on this channel is cancelled.  Data which was read but
+        not consumed by a wait is lost.
+        """
+        reg = self._regs.pop(ch)
+        self._detach(reg)
+        if reg.wait is not None:
+            reg.wait.future.cancel()
+
+    def _detach(self, reg: _Registration) -> None:
+        # Stop selecting on a channel but keep its registration around so an
+        # error can be reported to the next wait.
+        try:
+            self._sel.unregister(reg.ch.fileno())
+        except (KeyError, ValueError):
+            pass
+
+    def _add_wait(
+        self, ch: channel.Channel, matcher: _Matcher, timeout: typing.Optional[float]
+    ) -> concurrent.futures.Future:
+        self.register(ch)
+        reg = self._regs[ch]
+        if reg.wait is not None and not reg.wait.future.done():
+            raise tbot.error.TbotException(f"{ch!r} already has a pending wait")
+
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        reg.wait = _Wait(matcher, deadline, fut)
+
+        if reg.error is not None:
+            error, reg.error = reg.error, None
+            self._resolve(reg, error=error)
+        else:
+            self._try_match(reg)
+
+        return fut
+
+    def expect(
+        self,
+        ch: channel.Channel,
+        patterns: typing.Union[
+            channel.ConvenientSearchString, typing.List[channel.ConvenientSearchString]
+        ],
+        timeout: typing.Optional[float] = None,
+    ) -> "concurrent.futures.Future[channel.ExpectResult]":
+        """
+        Wait for a pattern to appear on ``ch``.
+
+        Works like :py:meth:`Channel.expect` but returns a future for the
+        :py:class:`~tbot.machine.channel.channel.ExpectResult`.  If ``timeout``
+        expires first, the future fails with a :py:exc:`TimeoutError`.
+        """
+        if not isinstance(patterns, list):
+            pattern_list = [channel._convert_search_string(patterns)]
+        else:
+            pattern_list = [channel._convert_search_string(pat) for pat in patterns]
+
+        return self._add_wait(
+            ch, lambda buf: channel._match_expect(buf, pattern_list), timeout
+        )
+
+    def read_until_prompt(
+        self,
+        ch: channel.Channel,
+        prompt: typing.Optional[channel.ConvenientSearchString] = None,
+        timeout: typing.Optional[float] = None,
+    ) -> "concurrent.futures.Future[str]":
+        """
+        Wait for the prompt to appear on ``ch``.
+
+        Works like :py:meth:`Channel.read_until_prompt` but returns a future
+        for the output up to the prompt.  If ``prompt`` is ``None``, the
+        channel's current prompt is used.
+        """
+        search = channel._convert_prompt(prompt) if prompt is not None else ch.prompt
+        if search is None:
+            raise tbot.error.TbotException(f"no prompt configured for {ch!r}")
+
+        return self._add_wait(
+            ch, lambda buf: channel._match_prompt(buf, search), timeout
+        )
+
+    def _resolve(
+        self,
+        reg: _Registration,
+        result: typing.Any = None,
+        error: typing.Optional[BaseException] = None,
+    ) -> None:
+        assert reg.wait is not None
+        fut = reg.wait.future
+        reg.wait = None
+        reg.backlog = bytearray()
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def _try_match(self, reg: _Registration) -> None:
+        if reg.wait is None or reg.backlog == b"":
+            return
+
+        result = reg.wait.matcher(reg.backlog)
+        if result is not None:
+            self._resolve(reg, result)
+
+    def _fail(self, reg: _Registration, error: BaseException) -> None:
+        if reg.wait is not None:
+            self._resolve(reg, error=error)
+        else:
+            reg.error = error
+
+    def _drain(self, reg: _Registration) -> None:
+        try:
+            new = reg.ch._c.read(reg.ch.READ_CHUNK_SIZE, _READ_GRACE)
+        except TimeoutError:
+            return
+        except tbot.error.ChannelClosedError as e:
+            self._detach(reg)
+            self._fail(reg, e)
+            return
+
+        reg.backlog += new
+        try:
+            reg.ch._write_stream(new)
+            reg.ch._check(new)
+        except Exception as e:
+            self._fail(reg, e)
+            return
+
+        self._try_match(reg)
+
+    def _pending(self) -> typing.List[_Registration]:
+        return [reg for reg in self._regs.values() if reg.wait is not None]
+
+    def poll(self, timeout: typing.Optional[float] = 0.0) -> int:
+        """
+        Drain all channels once, waiting at most ``timeout`` seconds for data.
+
+        :returns: Number of channels which had data.
+        """
+        events = self._sel.select(timeout)
+        for key, _ in events:
+            self._drain(key.data)
+
+        now = time.monotonic()
+        for reg in self._pending():
+            assert reg.wait is not None
+            if reg.wait.deadline is not None and now >= reg.wait.deadline:
+                self._resolve(reg, error=TimeoutError())
+
+        return len(events)
+
+    def run(self, timeout: typing.Optional[float] = None) -> None:
+        """
+        Drain all channels until every pending wait is resolved.
+
+        Failed waits do not stop the other ones; check their futures for the
+        result.
+
+        :param float timeout: Optional overall timeout.  All waits which are
+            still pending when it expires fail with :py:exc:`TimeoutError`.
+        """
+        end_time = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pending = self._pending()
+            if pending == []:
+                return
+
+            now = time.monotonic()
+            if end_time is not None and now >= end_time:
+                for reg in pending:
+                    self._resolve(reg, error=TimeoutError())
+                return
+
+            deadlines = [end_time] + [
+                reg.wait.deadline for reg in pending if reg.wait is not None
+            ]
+            wait = min(
+                [CLOSED_POLL_INTERVAL] + [d - now for d in deadlines if d is not None]
+            )
+            if self.poll(max(wait, 0.0)) != 0:
+                continue
+
+            # Nothing arrived, check whether any of the waited on channels
+            # went away.
+            for reg in self._pending():
+                if reg.ch.closed:
+                    self._detach(reg)
+                    self._resolve(reg, error=tbot.error.ChannelClosedError())
@@ -0,0 +1,403 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""
+Raw recording of everything sent and received on a channel.
+
+Recordings are binary files made up of a header line followed by records.
+The header is ``TBOTREC 1 `` followed by a JSON object and a newline.  Each
+record is a little-endian ``double`` (seconds since the start of the
+recording), a one-byte kind, and a ``uint32`` length, followed by that many
+bytes of data.  Kinds are ``r`` (received), ``t`` (sent), and ``m`` (a marker,
+e.g. the name of a machine which started using the channel).
+
+Use ``generators/consolerec.py`` to render a recording.
+"""
+
+import atexit
+import bisect
+import itertools
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import typing
+import weakref
+
+import tbot.error
+from . import channel
+
+MAGIC = b"TBOTREC 1 "
+RECORD = struct.Struct("<dcI")
+
+RECEIVED = b"r"
+SENT = b"t"
+MARKER = b"m"
+
+RECORD_DIR: typing.Optional[str] = None
+"""
+Directory in which to record the channels of all machines.  ``None`` disables
+recording.  Set by ``newbot --record-console``.
+
+.. versionadded:: UNRELEASED
+"""
+
+_counter = itertools.count()
+_active: "weakref.WeakSet[Recorder]" = weakref.WeakSet()
+
+
+class Record(typing.NamedTuple):
+    """
+    A single record of a recording.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    time: float
+    """Seconds since the start of the recording."""
+
+    kind: bytes
+    """One of :py:data:`RECEIVED`, :py:data:`SENT`, or :py:data:`MARKER`."""
+
+    data: bytes
+
+
+class Recorder:
+    """
+    Writer for a channel recording.
+
+    :py:meth:`record` only timestamps the data and hands it over to a
+    background thread which does the actual (buffered) writing.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, path: str, name: typing.Optional[str] = None) -> None:
+        self.path = path
+        self.start = time.monotonic()
+        self._queue: "queue.SimpleQueue[typing.Optional[bytes]]" = queue.SimpleQueue()
+        self._f = open(path, "wb", buffering=256 * 1024)
+        header = {"name": name, "start": time.time()}
+        self._f.write(MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._writer, name="tbot-channel-record", daemon=True
+        )
+        self._thread.start()
+        _active.add(self)
+
+    def _writer(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._f.write(item)
+        self._f.close()
+
+    def record(self, kind: bytes, data: bytes) -> None:
+        """Record ``data`` of the given ``kind`` with the current timestamp."""
+        if self._closed or data == b"":
+            return
+        self._queue.put(
+            RECORD.pack(time.monotonic() - self.start, kind, len(data)) + data
+        )
+
+    def close(self) -> None:
+        """Write out all pending records and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+
+@atexit.register
+def _close_all() -> None:
+    for rec in list(_active):
+        rec.close()
+
+
+class RecordingChannelIO(channel.ChannelIO):
+    """
+    ChannelIO wrapper which records all data passing through it.
+
+    Use :py:meth:`Channel.start_recording() <tbot.machine.channel.Channel.start_recording>`
+    to enable this for a channel.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    __slots__ = ("inner", "recorder")
+
+    def __init__(self, inner: channel.ChannelIO, recorder: Recorder) -> None:
+        self.inner = inner
+        self.recorder = recorder
+
+    def write(self, buf: bytes) -> int:
+        n = self.inner.write(buf)
+        self.recorder.record(SENT, buf[:n])
+        return n
+
+    def read(self, n: int, timeout: typing.Optional[float] = None) -> bytes:
+        data = self.inner.read(n, timeout)
+        self.recorder.record(RECEIVED, data)
+        return data
+
+    def close(self) -> None:
+        try:
+            self.inner.close()
+        finally:
+            self.recorder.close()
+
+    def fileno(self) -> int:
+        return self.inner.fileno()
+
+    @property
+    def closed(self) -> bool:
+        return self.inner.closed
+
+    def update_pty(self, columns: int, lines: int) -> None:
+        self.inner.update_pty(columns, lines)
+
+
+def auto_record(ch: channel.Channel, name: str) -> None:
+    """
+    Record ``ch`` for the machine ``name`` if :py:data:`RECORD_DIR` is set.
+
+    If the channel is already being recorded (e.g. because the machine took
+    it over from another one), a marker is added instead.
+    """
+    if RECORD_DIR is None:
+        return
+
+    recorder = ch.recorder
+    if recorder is not None:
+        recorder.record(MARKER, name.encode("utf-8"))
+        return
+
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    filename = f"{next(_counter):03}-{name}.tbotrec".replace(os.sep, "_")
+    path = os.path.join(RECORD_DIR, filename)
+    ch.start_recording(path, name)
+
+
+def read_records(
+    path: str,
+) -> typing.Tuple[typing.Dict[str, typing.Any], typing.List[Record]]:
+    """
+    Read a recording.
+
+    :returns: The header and all records of the recording.
+
+    .. versionadded:: UNRELEASED
+    """
+    records = []
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        if not header_line.startswith(MAGIC):
+            raise tbot.error.TbotException(f"{path!r} is not a console recording")
+        header = json.loads(header_line[len(MAGIC) :])
+
+        while True:
+            raw = f.read(RECORD.size)
+            if len(raw) < RECORD.size:
+                # Truncated at the end, e.g. because tbot was killed
+                break
+            t, kind, length = RECORD.unpack(raw)
+            records.append(Record(t, kind, f.read(length)))
+
+    return header, records
+
+
+class ReplayChannelIO(channel.ChannelIO):
+    """
+    ChannelIO which replays a recording instead of talking to a real machine.
+
+    The recording must have been made with
+    :py:meth:`Channel.start_recording() <tbot.machine.channel.Channel.start_recording>`
+    or ``newbot --record-console``.  Machines connected to a replayed channel
+    behave exactly like during the recorded session.  This allows
+    benchmarking and regression-testing channel, shell, and logging code
+    without the actual hardware.
+
+    Received data is only handed out once everything which was sent before it
+    in the recording has been written again.  Writes are verified against the
+    recording and a :py:exc:`~tbot.error.ReplayMismatchError` is raised as
+    soon as they differ.
+
+    :param str path: The recording file.
+    :param speed: Timing of received data relative to the recording.  ``1.0``
+        replays with the original delays, ``2.0`` twice as fast.  ``None``
+        hands out all data immediately.
+
+    Use :py:class:`ReplayChannel` to get a channel for a connector:
+
+    .. code-block:: python
+
+        class ReplayedBoardLinux(connector.Connector, linux.Bash):
+            name = "replayed-board"
+
+            @classmethod
+            @contextlib.contextmanager
+            def from_context(cls, ctx):
+                with cls() as m:
+                    yield m
+
+            @contextlib.contextmanager
+            def _connect(self):
+                with channel.record.ReplayChannel("001-board.tbotrec") as ch:
+                    yield ch
+
+            def clone(self):
+                raise NotImplementedError("can't clone a replayed channel")
+
+    .. versionadded:: UNRELEASED
+    """
+
+    __slots__ = (
+        "path",
+        "speed",
+        "_received",
+        "_read_index",
+        "_read_offset",
+        "_sent",
+        "_sent_ends",
+        "_sent_times",
+        "_write_pos",
+        "_anchor",
+        "_closed",
+        "_notify_r",
+        "_notify_w",
+    )
+
+    def __init__(self, path: str, speed: typing.Optional[float] = 1.0) -> None:
+        self.path = path
+        self.speed = speed
+
+        _, records = read_records(path)
+
+        # Received chunks along with the number of bytes which need to be
+        # written before they become available.
+        self._received: typing.List[typing.Tuple[float, int, bytes]] = []
+        sent = bytearray()
+        # Byte offsets where a recorded write ended, and when that was.
+        self._sent_ends: typing.List[int] = [0]
+        self._sent_times: typing.List[float] = [0.0]
+        for rec in records:
+            if rec.kind == SENT:
+                sent += rec.data
+                self._sent_ends.append(len(sent))
+                self._sent_times.append(rec.time)
+            elif rec.kind == RECEIVED:
+                self._received.append((rec.time, len(sent), rec.data))
+        self._sent = bytes(sent)
+
+        self._read_index = 0
+        self._read_offset = 0
+        self._write_pos = 0
+        # Wall-clock time when the writes last caught up with the recording
+        # and the corresponding time in the recording.  Delays of received
+        # data are relative to this.
+        self._anchor = (time.monotonic(), 0.0)
+        self._closed = False
+
+        # There is no way to know when data becomes available without a
+        # thread, so this is always readable and select()-based code falls
+        # back to polling read().
+        self._notify_r, self._notify_w = os.pipe()
+        os.write(self._notify_w, b"\0")
+
+    def _available_at(self, t: float) -> float:
+        anchor_wall, anchor_t = self._anchor
+        if self.speed is None or t <= anchor_t:
+            return anchor_wall
+        return anchor_wall + (t - anchor_t) / self.speed
+
+    def write(self, buf: bytes) -> int:
+        if self._closed:
+            raise tbot.error.ChannelClosedError
+
+        start = self._write_pos
+        expected = self._sent[start : start + len(buf)]
+        if bytes(buf) != expected:
+            i = next(
+                (i for i, (a, b) in enumerate(zip(buf, expected)) if a != b),
+                min(len(buf), len(expected)),
+            )
+            raise tbot.error.ReplayMismatchError(
+                start + i, expected[i : i + 32], bytes(buf[i : i + 32])
+            )
+
+        self._write_pos += len(buf)
+        # Re-anchor the timing on the last recorded write which is now complete
+        idx = bisect.bisect_right(self._sent_ends, self._write_pos) - 1
+        if self._sent_ends[idx] > start:
+            self._anchor = (time.monotonic(), self._sent_times[idx])
+        return len(buf)
+
+    def read(self, n: int, timeout: typing.Optional[float] = None) -> bytes:
+        if self._closed or self._read_index >= len(self._received):
+            raise tbot.error.ChannelClosedError
+
+        t, gate, _ = self._received[self._read_index]
+        if gate > self._write_pos:
+            # The recorded session wrote something before this data arrived
+            if timeout is None:
+                raise tbot.error.ReplayMismatchError(
+                    self._write_pos, self._sent[self._write_pos : gate][:32], b""
+                )
+            time.sleep(timeout)
+            raise TimeoutError()
+
+        wait = self._available_at(t) - time.monotonic()
+        if wait > 0:
+            if timeout is not None and wait > timeout:
+                time.sleep(timeout)
+                raise TimeoutError()
+            time.sleep(wait)
+
+        # Hand out this chunk and everything following it which is
+        # available as well.
+        buf = bytearray()
+        now = time.monotonic()
+        while len(buf) < n and self._read_index < len(self._received):
+            t, gate, data = self._received[self._read_index]
+            if gate > self._write_pos or self._available_at(t) > now:
+                break
+            chunk = data[self._read_offset : self._read_offset + n - len(buf)]
+            buf += chunk
+            self._read_offset += len(chunk)
+            if self._read_offset == len(data):
+                self._read_index += 1
+                self._read_offset = 0
+
+        return channel._debug_log(self, bytes(buf))
+
+    def close(self) -> None:
+        if self._closed:
+            raise tbot.error.ChannelClosedError
+        self._closed = True
+        os.close(self._notify_r)
+        os.close(self._notify_w)
+
+    def fileno(self) -> int:
+        return self._notify_r
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def update_pty(self, columns: int, lines: int) -> None:
+        pass
+
+
+class ReplayChannel(channel.Channel):
+    """
+    Channel replaying a recording.  See :py:class:`ReplayChannelIO`.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def __init__(self, path: str, speed: typing.Optional[float] = 1.0) -> None:
+        super().__init__(ReplayChannelIO(path, speed))
@@ -43,6 +43,7 @@ from .lab import Lab
 from .util import RunCommandProxy, CommandEndedException
 from . import auth
 from .copy import copy
+from .pool import ShellPool
 
 __all__ = (
     "Ash",
@@ -70,6 +71,7 @@ __all__ = (
     "RunCommandProxy",
     "CommandEndedException",
     "copy",
+    "ShellPool",
 )
 
 
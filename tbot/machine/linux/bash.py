@@ -146,6 +146,19 @@ class Bash(linux_shell.LinuxShell):
             raise tbot.error.CommandFailure(self, args, repr=self.escape(*args))
         return out
 
+    async def exec_async(
+        self: Self, *args: typing.Union[str, special.Special[Self], path.Path[Self]]
+    ) -> typing.Tuple[int, str]:
+        return await util.posix_exec_async(self, *args)
+
+    async def exec0_async(
+        self: Self, *args: typing.Union[str, special.Special[Self], path.Path[Self]]
+    ) -> str:
+        retcode, out = await self.exec_async(*args)
+        if retcode != 0:
+            raise tbot.error.CommandFailure(self, args, repr=self.escape(*args))
+        return out
+
     def test(
         self: Self, *args: typing.Union[str, special.Special[Self], path.Path[Self]]
     ) -> bool:
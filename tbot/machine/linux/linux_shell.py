@@ -111,6 +111,41 @@ class LinuxShell(shell.Shell):
         """
         raise tbot.error.AbstractMethodError()
 
+    async def exec_async(
+        self: Self, *args: typing.Union[str, Special[Self], path.Path[Self]]
+    ) -> typing.Tuple[int, str]:
+        """
+        Run a command on this machine/shell without blocking the event loop.
+
+        Works like :py:meth:`exec` but waits for the command using asyncio
+        (see :py:class:`~tbot.machine.channel.AsyncChannel`).  This allows
+        running commands on many machines concurrently from a single thread:
+
+        .. code-block:: python
+
+            results = await asyncio.gather(
+                lnx1.exec_async("uname", "-a"),
+                lnx2.exec_async("uname", "-a"),
+            )
+
+        Only one command can run on a machine at a time.
+
+        .. versionadded:: UNRELEASED
+        """
+        raise tbot.error.AbstractMethodError()
+
+    async def exec0_async(
+        self: Self, *args: typing.Union[str, Special[Self], path.Path[Self]]
+    ) -> str:
+        """
+        Run a command and assert its return code to be 0, without blocking the event loop.
+
+        Works like :py:meth:`exec0`.  See :py:meth:`exec_async` for details.
+
+        .. versionadded:: UNRELEASED
+        """
+        raise tbot.error.AbstractMethodError()
+
     @abc.abstractmethod
     def test(
         self: Self, *args: typing.Union[str, Special[Self], path.Path[Self]]
@@ -0,0 +1,255 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import concurrent.futures
+import contextlib
+import threading
+import typing
+
+import tbot
+from . import linux_shell, path, special
+
+H = typing.TypeVar("H", bound=linux_shell.LinuxShell)
+T = typing.TypeVar("T")
+ArgTypes = typing.Union[str, special.Special, path.Path]
+
+__all__ = ("ShellPool",)
+
+
+class ShellPool(typing.Generic[H]):
+    """
+    Pool of cloned shells for running commands on one host concurrently.
+
+    A ``ShellPool`` holds up to ``size`` clones (see
+    :py:meth:`tbot.machine.Machine.clone`) of ``host`` and dispatches work
+    across them using a pool of worker threads.  This is useful for lab- and
+    build-hosts where a lot of independent commands need to run, for example
+    checksumming many files.  Clones are only created when they are needed;
+    for SSH connections with :py:class:`~tbot.machine.connector.ParamikoConnector`,
+    all clones share the transport of the original connection.
+
+    Clones which were closed or do not respond anymore after a failed command
+    are discarded and replaced with fresh ones on demand.
+
+    The log output of each job is held back until the job finishes (see
+    :py:func:`tbot.log.buffered`) so output of jobs running in parallel does
+    not get mixed up.
+
+    **Example**:
+
+    .. code-block:: python
+
+        with tbot.ctx.request(tbot.role.BuildHost) as bh:
+            with linux.ShellPool(bh, size=8) as pool:
+                sums = pool.exec_many(
+                    ["sha256sum", f] for f in (bh.workdir / "images").glob("*")
+                )
+
+    :param linux.LinuxShell host: The host to clone.  Must be cloneable, which
+        serial consoles for example are not.
+    :param int size: Maximum number of clones (and jobs running at the same
+        time).
+
+    .. versionadded:: UNRELEASED
+    """
+
+    health_check_timeout: float = 5.0
+    """
+    Time (in seconds) a clone has to answer after a failed job before it is
+    considered unresponsive and discarded.
+    """
+
+    def __init__(self, host: H, size: int = 4) -> None:
+        if size < 1:
+            raise ValueError(f"pool size must be at least 1, got {size}")
+
+        self.host = host
+        self.size = size
+
+        self._cond = threading.Condition()
+        self._idle: typing.List[H] = []
+        # Clones compare equal to each other (and share their hash), so they
+        # are tracked by identity instead.
+        self._clones: typing.Dict[int, contextlib.ExitStack] = {}
+        self._num_clones = 0
+        self._executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def __enter__(self) -> "ShellPool[H]":
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.size, thread_name_prefix=f"tbot-pool-{self.host.name}"
+        )
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Wait for all pending jobs and then close all clones."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        with self._cond:
+            clones = list(self._clones.values())
+            self._clones.clear()
+            self._idle.clear()
+            self._num_clones = 0
+
+        for cx in reversed(clones):
+            cx.close()
+
+    def _acquire(self) -> H:
+        while True:
+            with self._cond:
+                while self._idle == [] and self._num_clones >= self.size:
+                    self._cond.wait()
+
+                if self._idle != []:
+                    m: typing.Optional[H] = self._idle.pop()
+                else:
+                    # Reserve a slot for the new clone
+                    self._num_clones += 1
+                    m = None
+
+            if m is None:
+                try:
+                    with contextlib.ExitStack() as cx:
+                        new = typing.cast(H, cx.enter_context(self.host.clone()))
+                        new_cx = cx.pop_all()
+                except BaseException:
+                    with self._cond:
+                        self._num_clones -= 1
+                        self._cond.notify()
+                    raise
+
+                with self._cond:
+                    self._clones[id(new)] = new_cx
+                return new
+
+            if not m.ch.closed:
+                return m
+            self._drop(m)
+
+    def _release(self, m: H) -> None:
+        with self._cond:
+            self._idle.append(m)
+            self._cond.notify()
+
+    def _drop(self, m: H) -> None:
+        with self._cond:
+            cx = self._clones.pop(id(m), None)
+            self._num_clones -= 1
+            self._cond.notify()
+
+        if cx is not None:
+            try:
+                cx.close()
+            except Exception:
+                # The clone is broken anyway, it does not matter how badly.
+                pass
+
+    def _is_healthy(self, m: H) -> bool:
+        if m.ch.closed:
+            return False
+        try:
+            # Not m.test() as that would wait forever for a hung shell
+            m.ch.sendline("true")
+            m.ch.read_until_prompt(timeout=self.health_check_timeout)
+        except Exception:
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def shell(self) -> typing.Iterator[H]:
+        """
+        Borrow one of the pooled shells for the duration of the ``with``-block.
+
+        Blocks until a shell is available.  If the block raises an exception,
+        the shell is checked for health and replaced if it stopped
+        responding.
+        """
+        m = self._acquire()
+        try:
+            yield m
+        except BaseException:
+            if self._is_healthy(m):
+                self._release(m)
+            else:
+                tbot.log.warning(f"Dropping unresponsive clone of {self.host.name!r}.")
+                self._drop(m)
+            raise
+        else:
+            self._release(m)
+
+    def submit(
+        self, fn: typing.Callable[..., T], *args: typing.Any, **kwargs: typing.Any
+    ) -> "concurrent.futures.Future[T]":
+        """
+        Run ``fn(shell, *args, **kwargs)`` on one of the pooled shells.
+
+        :returns: A :py:class:`concurrent.futures.Future` for the result.
+        """
+        if self._executor is None:
+            raise tbot.error.TbotException(
+                "ShellPool must be used as a context-manager"
+            )
+
+        nesting = tbot.log._nesting()
+        verbosity = tbot.log._verbosity()
+
+        def job() -> T:
+            with tbot.log.isolated_state(), tbot.log.with_verbosity(
+                verbosity, nesting=nesting
+            ), tbot.log.buffered(), self.shell() as m:
+                return fn(m, *args, **kwargs)
+
+        return self._executor.submit(job)
+
+    def map(
+        self,
+        fn: typing.Callable[[H, typing.Any], T],
+        items: typing.Iterable[typing.Any],
+    ) -> typing.List[T]:
+        """
+        Run ``fn(shell, item)`` for each item concurrently.
+
+        :returns: The results, in the order of ``items``.  If any call raised
+            an exception, the first one is re-raised after all calls finished.
+        """
+        futures = [self.submit(fn, item) for item in items]
+        concurrent.futures.wait(futures)
+        return [f.result() for f in futures]
+
+    def exec(
+        self, *args: ArgTypes
+    ) -> "concurrent.futures.Future[typing.Tuple[int, str]]":
+        """Run a command on one of the pooled shells, like :py:meth:`LinuxShell.exec`."""
+        return self.submit(lambda m: m.exec(*args))
+
+    def exec0(self, *args: ArgTypes) -> "concurrent.futures.Future[str]":
+        """Run a command on one of the pooled shells, like :py:meth:`LinuxShell.exec0`."""
+        return self.submit(lambda m: m.exec0(*args))
+
+    def exec_many(
+        self, commands: typing.Iterable[typing.Iterable[ArgTypes]]
+    ) -> typing.List[str]:
+        """
+        Run many commands concurrently, each like :py:meth:`LinuxShell.exec0`.
+
+        :returns: The output of each command, in order.
+        """
+        return self.map(lambda m, cmd: m.exec0(*cmd), [tuple(c) for c in commands])
+
+    def map_paths(
+        self,
+        fn: typing.Callable[[path.Path[H]], T],
+        paths: typing.Iterable[path.Path[H]],
+    ) -> typing.List[T]:
+        """
+        Run ``fn(path)`` for each path concurrently.
+
+        Each path is rebound to the pooled shell it is processed on, so all
+        methods of :py:class:`~tbot.machine.linux.Path` (like ``.exists()``
+        or ``.read_text()``) run on that shell.
+
+        :returns: The results, in the order of ``paths``.
+        """
+        return self.map(lambda m, p: fn(path.Path(m, p.at_host(m))), paths)
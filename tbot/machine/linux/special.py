@@ -140,8 +140,8 @@ class _Static(Special):
         return self.string
 
 
-AndThen = _Static("&&")
+AndThen: _Static = _Static("&&")
 Background: _Background = _Background()
-OrElse = _Static("||")
-Pipe = _Static("|")
-Then = _Static(";")
+OrElse: _Static = _Static("||")
+Pipe: _Static = _Static("|")
+Then: _Static = _Static(";")
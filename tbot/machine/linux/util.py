@@ -18,6 +18,7 @@ import typing
 from typing import Any
 
 import tbot.error
+import tbot.log_event
 from tbot import machine
 from tbot.machine import channel, linux
 
@@ -53,6 +54,28 @@ def posix_fetch_return_code(ch: channel.Channel, mach: M) -> int:
         raise tbot.error.InvalidRetcodeError(mach, retcode_str) from None
 
 
+async def posix_exec_async(
+    mach: M, *args: "typing.Union[str, linux.special.Special[M], linux.Path[M]]"
+) -> typing.Tuple[int, str]:
+    ach = channel.AsyncChannel(mach.ch)
+    cmd = mach.escape(*args)
+
+    with tbot.log_event.command(mach.name, cmd) as ev:
+        await ach.sendline(cmd, read_back=True)
+        with mach.ch.with_stream(ev, show_prompt=False):
+            out = await ach.read_until_prompt()
+        ev.data["stdout"] = out
+
+        await ach.sendline("echo $?", read_back=True)
+        retcode_str = await ach.read_until_prompt()
+        try:
+            retcode = int(retcode_str)
+        except ValueError:
+            raise tbot.error.InvalidRetcodeError(mach, retcode_str) from None
+
+    return (retcode, out)
+
+
 def posix_environment(
     mach: M, var: str, value: "typing.Union[str, linux.Path[M], None]" = None
 ) -> str:
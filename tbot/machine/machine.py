@@ -18,6 +18,8 @@ import abc
 import contextlib
 import re
 import typing
+
+import tbot
 import tbot.error
 from . import channel
 
@@ -150,26 +152,33 @@ class Machine(abc.ABC):
             # Run pre-connection init, if specified
             for cls in type(self).mro():
                 if PreConnectInitializer in cls.__bases__:
-                    self._cx.enter_context(getattr(cls, "_init_pre_connect")(self))
+                    with self._span("pre-connect", cls):
+                        self._cx.enter_context(getattr(cls, "_init_pre_connect")(self))
 
             # Run the connector
-            self.ch = self._cx.enter_context(self._connect())
+            with self._span("connect"):
+                self.ch = self._cx.enter_context(self._connect())
+            channel.record.auto_record(self.ch, self.name)
 
             # Run all initializers according to the MRO
             for cls in type(self).mro():
                 if Initializer in cls.__bases__:
-                    self._cx.enter_context(getattr(cls, "_init_machine")(self))
+                    with self._span("initializer", cls):
+                        self._cx.enter_context(getattr(cls, "_init_machine")(self))
 
             # Initialize the shell
-            self._cx.enter_context(self._init_shell())
+            with self._span("init-shell"):
+                self._cx.enter_context(self._init_shell())
 
             # Run post-shell init, if specified
             for cls in type(self).mro():
                 if PostShellInitializer in cls.__bases__:
-                    self._cx.enter_context(getattr(cls, "_init_post_shell")(self))
+                    with self._span("post-shell", cls):
+                        self._cx.enter_context(getattr(cls, "_init_post_shell")(self))
 
             # Run optional custom initialization code
-            self.init()
+            with self._span("init"):
+                self.init()
 
             # Nothing went wrong during init, we can pop `self` from the stack
             # now to keep the machine active when entering the actual context.
@@ -177,6 +186,14 @@ class Machine(abc.ABC):
 
         return self
 
+    def _span(
+        self, phase: str, cls: typing.Optional[type] = None
+    ) -> typing.ContextManager[None]:
+        name = f"{self.name}: {phase}"
+        if cls is not None:
+            name += f" ({cls.__name__})"
+        return tbot.log_event.span("machine", name, machine=self.name, phase=phase)
+
     def __exit__(self, *args: typing.Any) -> None:
         self._rc -= 1
 
@@ -156,6 +156,12 @@ def main() -> None:  # noqa: C901
         help="Write a log to `log/<lab>-<board>-NNNN.json`",
     )
 
+    parser.add_argument(
+        "--no-fact-cache",
+        action="store_true",
+        help="Do not persist cached board facts (like the RAM base) across runs",
+    )
+
     flags = [
         (["--list-testcases"], "list all testcases in the current search path."),
         (["--list-files"], "list all testcase files."),
@@ -212,6 +218,11 @@ def main() -> None:  # noqa: C901
     import tbot
     from tbot import loader
 
+    if args.no_fact_cache:
+        from tbot.machine.board import facts
+
+        facts.CACHE_FILE = None
+
     for flag in args.flags:
         tbot.flags.add(flag)
 
@@ -29,6 +29,23 @@ def load_config(config: str, ctx: "tbot.Context") -> None:
     getattr(config_module, "register_machines")(ctx, *args)
 
 
+def load_role(role: str) -> typing.Any:
+    import tbot.role
+
+    if "." not in role:
+        if not hasattr(tbot.role, role):
+            raise AttributeError(f"`tbot.role` does not contain `{role}`")
+        return getattr(tbot.role, role)
+
+    module_name, role_name = role.rsplit(".", 1)
+    module = importlib.import_module(module_name)
+
+    if not hasattr(module, role_name):
+        raise AttributeError(f"`{module_name}` does not contain `{role_name}`")
+
+    return getattr(module, role_name)
+
+
 def run_testcase(testcase: str) -> None:
     module_name, function_name = testcase.rsplit(".", 1)
     module = importlib.import_module(module_name)
@@ -129,6 +146,21 @@ def get_version() -> str:
     return "unknown"
 
 
+def parse_size(s: str) -> int:
+    """Parse a size with an optional ``K``, ``M``, or ``G`` suffix."""
+    factor = 1
+    for i, suffix in enumerate("KMG"):
+        if s.upper().endswith(suffix):
+            s = s[:-1]
+            factor = 1024 ** (i + 1)
+            break
+
+    try:
+        return int(s) * factor
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {s!r}") from None
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = TbotArgumentParser(
         prog="tbot",
@@ -166,10 +198,85 @@ def build_parser() -> argparse.ArgumentParser:
         help="keep machines alive for later tests to reacquire them",
     )
 
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="keep machines alive and run testcases for `--attach` clients",
+    )
+
+    parser.add_argument(
+        "--attach",
+        metavar="SOCKET",
+        help="run testcases in a tbot server started with `--serve`",
+    )
+
+    parser.add_argument(
+        "--prewarm",
+        metavar="ROLE",
+        action="append",
+        default=[],
+        help="initialize the machine for ROLE in the background right away",
+    )
+
     parser.add_argument(
         "--json-log-stream", metavar="LOGFILE", help="write a log to the specified file"
     )
 
+    parser.add_argument(
+        "--log-max-size",
+        metavar="SIZE",
+        type=parse_size,
+        help="rotate the log once a segment exceeds SIZE (e.g. 100M)",
+    )
+
+    parser.add_argument(
+        "--log-max-testcases",
+        metavar="N",
+        type=int,
+        help="rotate the log after N top-level testcases",
+    )
+
+    parser.add_argument(
+        "--log-spill-size",
+        metavar="SIZE",
+        type=parse_size,
+        help="store event data larger than SIZE in separate files next to the log",
+    )
+
+    parser.add_argument(
+        "--trace-channel",
+        action="store_true",
+        default=False,
+        help="also record channel waits as spans in the log",
+    )
+
+    parser.add_argument(
+        "--record-console",
+        metavar="DIR",
+        help="record raw console data of all machines with timestamps to DIR",
+    )
+
+    parser.add_argument(
+        "--no-fact-cache",
+        action="store_true",
+        default=False,
+        help="do not persist cached board facts (like the RAM base) across runs",
+    )
+
+    parser.add_argument(
+        "--console-interval",
+        metavar="SECONDS",
+        type=float,
+        help="batch console output and flush it at most once per interval",
+    )
+
+    parser.add_argument(
+        "--collapse-progress",
+        action="store_true",
+        default=False,
+        help="only show the latest state of lines overwritten with \\r on the console",
+    )
+
     parser.add_argument(
         "-v", dest="verbosity", action="count", default=0, help="increase the verbosity"
     )
@@ -202,6 +309,41 @@ class TbotArgumentParser(argparse.ArgumentParser):
         return [arg_line_expanded]
 
 
+def check_log_options(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> None:
+    log_options = [
+        ("--log-max-size", args.log_max_size),
+        ("--log-max-testcases", args.log_max_testcases),
+        ("--log-spill-size", args.log_spill_size),
+    ]
+    for option, value in log_options:
+        if value is None:
+            continue
+        if args.json_log_stream is None:
+            parser.error(f"{option} requires --json-log-stream")
+        if args.attach is not None:
+            parser.error(f"{option} is not supported with --attach")
+
+
+def open_logfile(args: argparse.Namespace) -> None:
+    import tbot.log
+
+    if (
+        args.log_max_size is not None
+        or args.log_max_testcases is not None
+        or args.log_spill_size is not None
+    ):
+        tbot.log.LOGFILE = tbot.log.RotatingLogFile(
+            args.json_log_stream,
+            max_size=args.log_max_size,
+            max_testcases=args.log_max_testcases,
+            spill_size=args.log_spill_size,
+        )
+    else:
+        tbot.log.LOGFILE = open(args.json_log_stream, "w")
+
+
 def main(argv: Optional[Sequence[str]] = None) -> None:
     parser = build_parser()
 
@@ -210,6 +352,8 @@ def main(argv: Optional[Sequence[str]] = None) -> None:
 
     args = parser.parse_args(argv)
 
+    check_log_options(parser, args)
+
     if args.workdir:
         os.chdir(args.workdir)
 
@@ -234,11 +378,30 @@ def main(argv: Optional[Sequence[str]] = None) -> None:
     import tbot.log
     import tbot.log_event
 
+    if args.attach is not None:
+        import tbot.daemon
+
+        success = tbot.daemon.attach(
+            args.attach,
+            args.testcase,
+            flags=args.flags,
+            verbosity=tbot.log.Verbosity.STDOUT + args.verbosity - args.quiet,
+            logfile=args.json_log_stream,
+        )
+        sys.exit(0 if success else 1)
+
     for flag in args.flags:
         tbot.flags.add(flag)
 
     if args.json_log_stream:
-        tbot.log.LOGFILE = open(args.json_log_stream, "w")
+        open_logfile(args)
+
+    tbot.log.TRACE_CHANNEL = args.trace_channel
+    tbot.machine.channel.record.RECORD_DIR = args.record_console
+    facts = tbot.machine.board.facts
+    facts.CACHE_FILE = None if args.no_fact_cache else facts.CACHE_FILE
+    tbot.log.CONSOLE_FLUSH_INTERVAL = args.console_interval
+    tbot.log.CONSOLE_COLLAPSE_PROGRESS = args.collapse_progress
 
     tbot.log.VERBOSITY = tbot.log.Verbosity(
         tbot.log.Verbosity.STDOUT + args.verbosity - args.quiet
@@ -247,7 +410,13 @@ def main(argv: Optional[Sequence[str]] = None) -> None:
     tbot.log_event.tbot_start()
 
     # Initialize tbot context with our settings
-    tbot.ctx = tbot.Context(add_defaults=True, keep_alive=args.keep_alive)
+    if args.serve is not None:
+        # The whole point of the server is keeping machines alive
+        tbot.ctx = tbot.Context(
+            add_defaults=True, keep_alive=True, reset_on_error_by_default=True
+        )
+    else:
+        tbot.ctx = tbot.Context(add_defaults=True, keep_alive=args.keep_alive)
 
     if args.lab is not None:
         load_config(args.lab, tbot.ctx)
@@ -258,8 +427,16 @@ def main(argv: Optional[Sequence[str]] = None) -> None:
 
     try:
         with tbot.ctx:
+            if args.prewarm != []:
+                tbot.ctx.prewarm(*(load_role(role) for role in args.prewarm))
+
             for testcase in args.testcase:
                 run_testcase(testcase)
+
+            if args.serve is not None:
+                import tbot.daemon
+
+                tbot.daemon.serve(args.serve, tbot.ctx)
     except Exception as e:
         import traceback
 
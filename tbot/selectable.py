@@ -44,9 +44,10 @@ def _inject_into_context(
             did_register = True
 
         manager = ctx._instances[type(instance)]
-        if not manager.is_alive():
-            manager.init(instance=instance)
-            did_inject = True
+        with manager.lock:
+            if not manager.is_alive():
+                manager.init(instance=instance)
+                did_inject = True
 
         yield None
     finally:
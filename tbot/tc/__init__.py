@@ -1,7 +1,10 @@
+import threading
 import typing
 import tbot
 import traceback
 
+F = typing.TypeVar("F", bound=typing.Callable[..., typing.Any])
+
 
 @tbot.testcase
 def testsuite(*args: typing.Callable, **kwargs: typing.Any) -> None:
@@ -53,6 +56,10 @@ def testsuite(*args: typing.Callable, **kwargs: typing.Any) -> None:
         except Exception:
             errors.append((test.__name__, traceback.format_exc()))
 
+    _report(errors, len(args))
+
+
+def _report(errors: typing.List[typing.Tuple[str, str]], total: int) -> None:
     with tbot.log.message(
         tbot.log.c(
             tbot.log.u(
@@ -64,13 +71,158 @@ def testsuite(*args: typing.Callable, **kwargs: typing.Any) -> None:
         if errors != []:
             ev.writeln(
                 tbot.log.c("Failure").red.bold
-                + f": {len(errors)}/{len(args)} tests failed\n"
+                + f": {len(errors)}/{total} tests failed\n"
             )
             for tc, err in errors:
                 tbot.log.message(tbot.log.c(tc).blue + ":\n" + err)
-            raise Exception(f"{len(errors)}/{len(args)} tests failed")
+            raise Exception(f"{len(errors)}/{total} tests failed")
         else:
             ev.writeln(
-                tbot.log.c("Success").green.bold
-                + f": {len(args)}/{len(args)} tests passed"
+                tbot.log.c("Success").green.bold + f": {total}/{total} tests passed"
             )
+
+
+def requires(*roles: typing.Any) -> typing.Callable[[F], F]:
+    """
+    Declare which :ref:`roles <tbot_role>` a testcase needs.
+
+    This information is used by :py:func:`parallel_testsuite` to decide which
+    testcases can run at the same time.
+
+    **Example**::
+
+        @tc.requires(BoardA, BoardALinux)
+        @tbot.testcase
+        def test_board_a() -> None:
+            with tbot.ctx.request(BoardALinux) as lnx:
+                lnx.exec0("uname", "-a")
+
+    .. versionadded:: UNRELEASED
+    """
+
+    def _requires(tc: F) -> F:
+        setattr(tc, "_tbot_requires", roles)
+        return tc
+
+    return _requires
+
+
+def _resources(test: typing.Callable) -> typing.Set[typing.Any]:
+    resources = set()
+    for role in getattr(test, "_tbot_requires", ()):
+        try:
+            # Roles which are served by the same machine are the same resource
+            resources.add(tbot.ctx.get_machine_class(role))
+        except KeyError:
+            resources.add(role)
+    return resources
+
+
+@tbot.testcase
+def parallel_testsuite(
+    *args: typing.Callable, workers: typing.Optional[int] = None, **kwargs: typing.Any
+) -> None:
+    """
+    Run a number of tests in parallel and report how many of them succeeded.
+
+    Works like :py:func:`testsuite` but runs testcases concurrently in a pool
+    of worker threads.  Testcases declare the roles they need using
+    :py:func:`requires`.  Two testcases whose roles are served by the same
+    machine never run at the same time; otherwise, testcases are started in
+    order as soon as a worker is free.  Testcases without declared roles may
+    run alongside anything else.
+
+    The console output and log events of each testcase are held back until it
+    finishes and then emitted in one piece, so the log stays properly nested.
+
+    .. note::
+
+        A machine is never used by two threads at once: a request for a
+        machine which another testcase is using waits until that testcase
+        is done with it (see :py:class:`tbot.Context`).  Declare every role
+        on which a testcase runs commands, so such testcases are not
+        scheduled at the same time instead of blocking a worker.
+
+        Machines which a board requests during initialization (like the
+        lab-host) are only used while the board is initialized or torn
+        down; the context takes care of that.  If a testcase runs commands
+        on such a machine itself (e.g. through ``board.host``), it must
+        request or declare that role as well.
+
+    :param args: Testcases
+    :param int workers: Maximum number of testcases running at the same time.
+        Defaults to running all testcases at once.
+    :param kwargs: Named-Arguments that should be given to each testcase.
+        Be aware that this requires all testcases to have compatible
+        signatures.
+
+    **Example**::
+
+        @tc.requires(BoardALinux)
+        @tbot.testcase
+        def test_board_a() -> None:
+            ...
+
+        @tc.requires(BoardBLinux)
+        @tbot.testcase
+        def test_board_b() -> None:
+            ...
+
+        @tbot.testcase
+        def all_tests() -> None:
+            # Both tests run at the same time
+            tc.parallel_testsuite(test_board_a, test_board_b)
+
+    .. versionadded:: UNRELEASED
+    """
+    pending = list(enumerate(args))
+    resources = [_resources(test) for test in args]
+    busy: typing.Set[typing.Any] = set()
+    errors: typing.List[typing.Tuple[int, str, str]] = []
+    cond = threading.Condition()
+
+    nesting = tbot.log._nesting()
+    verbosity = tbot.log._verbosity()
+
+    def next_test() -> typing.Optional[typing.Tuple[int, typing.Callable]]:
+        with cond:
+            while pending != []:
+                for i, (index, test) in enumerate(pending):
+                    if resources[index].isdisjoint(busy):
+                        busy.update(resources[index])
+                        return pending.pop(i)
+                cond.wait()
+            return None
+
+    def worker() -> None:
+        with tbot.log.isolated_state(), tbot.log.with_verbosity(
+            verbosity, nesting=nesting
+        ):
+            while True:
+                item = next_test()
+                if item is None:
+                    return
+                index, test = item
+
+                try:
+                    with tbot.log.buffered():
+                        test(**kwargs)
+                except Exception:
+                    with cond:
+                        errors.append((index, test.__name__, traceback.format_exc()))
+                finally:
+                    with cond:
+                        busy.difference_update(resources[index])
+                        cond.notify_all()
+
+    num_workers = min(workers or len(args), len(args))
+    threads = [
+        threading.Thread(target=worker, name=f"tbot-worker-{i}")
+        for i in range(num_workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    _report([(name, err) for _, name, err in sorted(errors)], len(args))
@@ -15,17 +15,20 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import contextlib
-import hashlib
 import os
 import select
+import shutil
+import socket
+import tempfile
 import typing
-import time
 
 import tbot
-from tbot.machine import board, channel, linux
+import tbot.error
+from tbot.machine import board, channel, connector, linux
 from tbot.tc import uboot as uboot_tc
 
 BH = typing.TypeVar("BH", bound=linux.Builder)
+H = typing.TypeVar("H", bound=linux.LinuxShell)
 
 HOOK_SCRIPTS = {
     # Hook which test/py uses to access the console:
@@ -81,6 +84,95 @@ echo "FAIL"
 }
 
 
+# Relay between test/py's console and tbot's socket.  Runs on the (local)
+# build-host instead of the `cat` loops of the FIFO hooks.
+RELAY_SCRIPT = """\
+import os
+import select
+import socket
+import sys
+
+BUFSIZE = 256 * 1024
+
+
+def write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, BUFSIZE)
+sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFSIZE)
+sock.connect(sys.argv[1])
+sock.sendall(sys.argv[2].encode() + b"\\n")
+
+if sys.argv[2] == "RESET":
+    # Wait until tbot finished the powercycle
+    sock.recv(16)
+    sys.exit(0)
+
+while True:
+    r, _, _ = select.select([0, sock], [], [])
+    if 0 in r:
+        data = os.read(0, BUFSIZE)
+        if data == b"":
+            break
+        sock.sendall(data)
+    if sock in r:
+        data = sock.recv(BUFSIZE)
+        if data == b"":
+            break
+        write_all(1, data)
+"""
+
+SOCKET_HOOK_SCRIPTS = {
+    "tbot-relay.py": RELAY_SCRIPT,
+    "u-boot-test-console": """\
+#!/usr/bin/env bash
+
+stty raw -echo 2>/dev/null
+exec python3 {relay} {socket} CONSOLE
+""",
+    "u-boot-test-reset": """\
+#!/usr/bin/env bash
+
+exec python3 {relay} {socket} RESET
+""",
+    "u-boot-test-flash": """\
+#!/usr/bin/env bash
+""",
+}
+
+
+def _deploy_hooks(
+    bh: H,
+    hookdir: linux.Path[H],
+    scripts: typing.Dict[str, str],
+    fifos: typing.List[linux.Path[H]] = [],
+) -> None:
+    # Everything is done in a single command to save round-trips to the
+    # build-host.  Rewriting the scripts each time is cheaper than checking
+    # whether they are up to date.
+    cmd: typing.List[typing.Any] = ["mkdir", "-p", hookdir]
+    if fifos != []:
+        cmd += [linux.AndThen, "rm", "-rf", *fifos, linux.AndThen, "mkfifo", *fifos]
+    for scriptname, script in scripts.items():
+        cmd += [
+            linux.AndThen,
+            "printf",
+            "%s",
+            script,
+            linux.RedirStdout(hookdir / scriptname),
+        ]
+    cmd += [linux.AndThen, "chmod", "+x", *(hookdir / name for name in scripts)]
+    cmd += [
+        linux.AndThen,
+        "export",
+        linux.Raw(f"PATH={bh.escape(hookdir)}:$PATH"),
+    ]
+    bh.exec0(*cmd)
+
+
 @tbot.named_testcase("uboot_setup_testhooks")
 def setup_testhooks(
     bh: BH, m_console: BH, m_command: BH
@@ -92,58 +184,22 @@ def setup_testhooks(
     which in turn communicates with the board.  The third FIFO is used for
     commands (currently only RESET).
 
-    This testcase tries to be smart and only rewrite the hooks when something
-    changed.  For this purpose a hash-value is stored on the build-host and
-    checked agains the locally computed one.
+    FIFOs and hook scripts are deployed and added to ``$PATH`` with a single
+    command on the build-host.
     """
 
     hookdir = bh.workdir / "uboot-testpy-tbot"
-    if not hookdir.is_dir():
-        bh.exec0("mkdir", hookdir)
-
-    # FIFOs --- {{{
-    tbot.log.message("Creating FIFOs ...")
 
     # This dict is used for resolving the paths in the scripts later on
-    fifos = {}
-    for fifoname in ["fifo_console_send", "fifo_console_recv", "fifo_commands"]:
-        fifo = hookdir / fifoname
-        bh.exec0("rm", "-rf", fifo)
-        bh.exec0("mkfifo", fifo)
-        fifos[fifoname] = fifo.at_host(bh)
-    # }}}
-
-    # Hook Scripts --- {{{
-
-    # Generate a hash for the version of the control files
-    script_hasher = hashlib.sha256()
-    for script in sorted(HOOK_SCRIPTS.values()):
-        script_hasher.update(script.encode("utf-8"))
-    script_hash = script_hasher.hexdigest()
-
-    hashfile = hookdir / "tbot-scripts.sha256"
-    try:
-        up_to_date = script_hash == hashfile.read_text().strip()
-    except Exception:
-        up_to_date = False
-
-    if up_to_date:
-        tbot.log.message("Hooks are up to date, skipping deployment ...")
-    else:
-        tbot.log.message("Updating hook scripts ...")
-
-        for scriptname, script in HOOK_SCRIPTS.items():
-            rendered = script.format(**fifos)
-            (hookdir / scriptname).write_text(rendered)
-            bh.exec0("chmod", "+x", hookdir / scriptname)
+    fifo_paths = {
+        fifoname: hookdir / fifoname
+        for fifoname in ["fifo_console_send", "fifo_console_recv", "fifo_commands"]
+    }
+    fifos = {name: fifo.at_host(bh) for name, fifo in fifo_paths.items()}
 
-        # Write checksum so we don't re-deploy next time
-        hashfile.write_text(script_hash)
-    # }}}
-
-    tbot.log.message("Adding hooks to $PATH ...")
-    oldpath = bh.env("PATH")
-    bh.env("PATH", f"{hookdir.at_host(bh)}:{oldpath}")
+    tbot.log.message("Deploying FIFOs and hook scripts ...")
+    scripts = {name: script.format(**fifos) for name, script in HOOK_SCRIPTS.items()}
+    _deploy_hooks(bh, hookdir, scripts, list(fifo_paths.values()))
 
     tbot.log.message("Open console & command channels ...")
     chan_console = m_console.open_channel(hookdir / "tbot-console")
@@ -152,6 +208,202 @@ def setup_testhooks(
     return (chan_console, chan_command)
 
 
+def _write_all(fd: int, data: bytes) -> None:
+    while data:
+        try:
+            data = data[os.write(fd, data) :]
+        except BlockingIOError:
+            select.select([], [fd], [])
+
+
+class SocketRelay:
+    """
+    In-process relay between test/py's hooks and the U-Boot channel.
+
+    Instead of FIFOs and helper shells on the build-host, test/py's hooks
+    connect to a unix socket of tbot directly.  This only works if test/py
+    runs on the same host as tbot.  Use :py:func:`setup_socket_testhooks` to
+    create it.
+
+    .. versionadded:: UNRELEASED
+    """
+
+    BUFSIZE = 256 * 1024
+    """Socket buffer and read size."""
+
+    MAX_PENDING = 1024 * 1024
+    """Maximum console output to keep while test/py's console is detached."""
+
+    def __init__(self) -> None:
+        self._tmpdir = tempfile.mkdtemp(prefix="tbot-testpy-")
+        self.path = os.path.join(self._tmpdir, "relay.sock")
+        """Path of the unix socket the hooks connect to."""
+
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen(4)
+        self._console: typing.Optional[socket.socket] = None
+        self._pending = bytearray()
+
+    def __enter__(self) -> "SocketRelay":
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the socket and remove it."""
+        if self._console is not None:
+            self._console.close()
+            self._console = None
+        self._listener.close()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _send_console(self, data: bytes) -> None:
+        if self._console is not None:
+            try:
+                self._console.sendall(data)
+                return
+            except (BrokenPipeError, ConnectionResetError):
+                # test/py's console went away, keep the data for the next one
+                self._console.close()
+                self._console = None
+
+        self._pending += data
+        del self._pending[: -self.MAX_PENDING]
+
+    def _accept(
+        self, chan_uboot: channel.Channel, reset: typing.Callable[[], None]
+    ) -> None:
+        conn, _ = self._listener.accept()
+        hello = bytearray()
+        try:
+            conn.settimeout(10.0)
+            while b"\n" not in hello:
+                new = conn.recv(16)
+                if new == b"":
+                    conn.close()
+                    return
+                hello += new
+        except OSError:
+            # A hook which does not say what it wants is ignored
+            conn.close()
+            return
+
+        # The hook may send data right after the first line
+        kind, _, data = bytes(hello).partition(b"\n")
+        if kind == b"CONSOLE":
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.BUFSIZE)
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.BUFSIZE)
+            conn.settimeout(None)
+            if self._console is not None:
+                self._console.close()
+            self._console = conn
+            if data != b"":
+                _write_all(chan_uboot.fileno(), data)
+            if self._pending != b"":
+                pending = bytes(self._pending)
+                self._pending.clear()
+                self._send_console(pending)
+        elif kind == b"RESET":
+            reset()
+            conn.sendall(b"OK\n")
+            conn.close()
+        else:
+            conn.close()
+            raise Exception(f"Got unknown command {kind!r}!")
+
+    def run(
+        self,
+        chan_uboot: channel.Channel,
+        chan_testpy: linux.RunCommandProxy,
+        reset: typing.Callable[[], None],
+    ) -> None:
+        """
+        Relay data until the test/py command ends.
+
+        :param chan_uboot: Channel to U-Boot.
+        :param chan_testpy: The running test/py command.
+        :param reset: Called when test/py wants to reset the board.
+        """
+        while True:
+            readfds: typing.List[typing.Any] = [self._listener, chan_uboot, chan_testpy]
+            if self._console is not None:
+                readfds.append(self._console)
+            r, _, _ = select.select(readfds, [], [])
+
+            if self._listener in r:
+                self._accept(chan_uboot, reset)
+            if self._console is not None and self._console in r:
+                # Send data to U-Boot
+                try:
+                    data = self._console.recv(self.BUFSIZE)
+                except ConnectionResetError:
+                    data = b""
+                if data == b"":
+                    self._console.close()
+                    self._console = None
+                else:
+                    _write_all(chan_uboot.fileno(), data)
+            if chan_uboot in r:
+                # Send data to test/py
+                self._send_console(os.read(chan_uboot.fileno(), self.BUFSIZE))
+            if chan_testpy in r:
+                # Read data so the log-event picks it up.  If a
+                # DeathStringException occurs here, test/py finished and we
+                # need to properly terminate the LinuxShell.run() context.
+                try:
+                    chan_testpy.read()
+                except linux.CommandEndedException:
+                    chan_testpy.terminate0()
+                    break
+
+
+def _pick_relay(bh: linux.LinuxShell, relay: str) -> str:
+    if relay == "auto":
+        if isinstance(bh, connector.SubprocessConnector):
+            return "socket"
+        return "fifo"
+    if relay not in ("fifo", "socket"):
+        raise ValueError(f"unknown relay {relay!r}")
+    return relay
+
+
+@tbot.named_testcase("uboot_setup_socket_testhooks")
+def setup_socket_testhooks(bh: linux.LinuxShell) -> SocketRelay:
+    """
+    Setup u-boot-test-* hook scripts which connect to an in-process relay.
+
+    The returned :py:class:`SocketRelay` must be closed after use.  ``bh``
+    must be a machine on the host tbot is running on.
+
+    .. versionadded:: UNRELEASED
+    """
+    if not isinstance(bh, connector.SubprocessConnector):
+        raise tbot.error.TbotException(
+            f"socket relay needs test/py to run on the local host, not {bh.name}"
+        )
+
+    hookdir = bh.workdir / "uboot-testpy-tbot"
+    relay = SocketRelay()
+    try:
+        tbot.log.message("Deploying hook scripts ...")
+        paths = {
+            "relay": bh.escape(hookdir / "tbot-relay.py"),
+            "socket": bh.escape(relay.path),
+        }
+        scripts = {
+            name: script if name == "tbot-relay.py" else script.format(**paths)
+            for name, script in SOCKET_HOOK_SCRIPTS.items()
+        }
+        _deploy_hooks(bh, hookdir, scripts)
+    except Exception:
+        relay.close()
+        raise
+
+    return relay
+
+
 @tbot.named_testcase("uboot_testpy")
 @tbot.with_lab
 def testpy(
@@ -161,6 +413,7 @@ def testpy(
     uboot_builder: typing.Optional[uboot_tc.UBootBuilder] = None,
     boardenv: typing.Optional[str] = None,
     testpy_args: typing.List[str] = [],
+    relay: str = "auto",
 ) -> None:
     """
     Run U-Boot's test/py test-framework against the selected board.
@@ -185,6 +438,12 @@ def testpy(
     :param list(str) testpy_args: Additional arguments to be passed to test/py.
         Can be used, for example, to limit which tests should be run (using
         ``testpy_args=["-k", "sf"]``).
+    :param str relay: How test/py's hooks talk to tbot.  ``"fifo"`` uses FIFOs
+        on the build-host, ``"socket"`` an in-process :py:class:`SocketRelay`
+        (only possible when the build-host is the local machine).  ``"auto"``
+        (the default) picks ``"socket"`` whenever possible.
+
+        .. versionadded:: UNRELEASED
 
     **Example**:
 
@@ -247,9 +506,13 @@ The build() method for the selected lab should not return `self` but instead `se
         # Spawn a subshell to not mess up the parent shell's environment and PWD
         cx.enter_context(bh.subshell())
 
-        chan_console, chan_command = setup_testhooks(
-            bh, cx.enter_context(bh.clone()), cx.enter_context(bh.clone())
-        )
+        relay = _pick_relay(bh, relay)
+        if relay == "socket":
+            socket_relay = cx.enter_context(setup_socket_testhooks(bh))
+        else:
+            chan_console, chan_command = setup_testhooks(
+                bh, cx.enter_context(bh.clone()), cx.enter_context(bh.clone())
+            )
 
         if uboot_builder is None:
             builder = uboot_tc.UBootBuilder._get_selected_builder()
@@ -310,6 +573,10 @@ The build() method for the selected lab should not return `self` but instead `se
             )
         )
 
+        if relay == "socket":
+            socket_relay.run(chan_uboot, chan_testpy, b.powercycle)
+            return
+
         # We have to deal with incoming data on any of the following channels.
         # The comments denote what needs to be done for each channel:
         readfds = [
@@ -335,10 +602,7 @@ The build() method for the selected lab should not return `self` but instead `se
                 msg = chan_command.read()
 
                 if msg[:2] == b"RE":
-                    b.poweroff()
-                    if b.powercycle_delay > 0:
-                        time.sleep(b.powercycle_delay)
-                    b.poweron()
+                    b.powercycle()
                 else:
                     raise Exception(f"Got unknown command {msg!r}!")
             if chan_testpy in r:
@@ -1,12 +1,15 @@
-import hashlib
 import os
 import select
-import time
 from typing import List, Optional, Tuple, TypeVar
 
 import tbot
 from tbot import machine
 from tbot.machine import channel, linux
+from tbot.tc.uboot.testpy import (
+    _deploy_hooks,
+    _pick_relay,
+    setup_socket_testhooks,
+)
 
 BH = TypeVar("BH", bound=linux.LinuxShell)
 
@@ -75,61 +78,25 @@ def setup_testhooks(
     which in turn communicates with the board.  The third FIFO is used for
     commands (currently only RESET).
 
-    This testcase tries to be smart and only rewrite the hooks when something
-    changed.  For this purpose a hash-value is stored on the build-host and
-    checked agains the locally computed one.
+    FIFOs and hook scripts are deployed and added to ``$PATH`` with a single
+    command on the build-host.
     """
 
     # m_console and m_command must not be the same machine
     assert id(m_console) != id(m_command), "testhook channels must be separate"
 
     hookdir = bh.workdir / "uboot-testpy-tbot"
-    if not hookdir.is_dir():
-        bh.exec0("mkdir", hookdir)
-
-    # FIFOs --- {{{
-    tbot.log.message("Creating FIFOs ...")
 
     # This dict is used for resolving the paths in the scripts later on
-    fifos = {}
-    for fifoname in ["fifo_console_send", "fifo_console_recv", "fifo_commands"]:
-        fifo = hookdir / fifoname
-        bh.exec0("rm", "-rf", fifo)
-        bh.exec0("mkfifo", fifo)
-        fifos[fifoname] = fifo.at_host(bh)
-    # }}}
-
-    # Hook Scripts --- {{{
-
-    # Generate a hash for the version of the control files
-    script_hasher = hashlib.sha256()
-    for script in sorted(HOOK_SCRIPTS.values()):
-        script_hasher.update(script.encode("utf-8"))
-    script_hash = script_hasher.hexdigest()
-
-    hashfile = hookdir / "tbot-scripts.sha256"
-    try:
-        up_to_date = script_hash == hashfile.read_text().strip()
-    except Exception:
-        up_to_date = False
-
-    if up_to_date:
-        tbot.log.message("Hooks are up to date, skipping deployment ...")
-    else:
-        tbot.log.message("Updating hook scripts ...")
-
-        for scriptname, script in HOOK_SCRIPTS.items():
-            rendered = script.format(**fifos)
-            (hookdir / scriptname).write_text(rendered)
-            bh.exec0("chmod", "+x", hookdir / scriptname)
-
-        # Write checksum so we don't re-deploy next time
-        hashfile.write_text(script_hash)
-    # }}}
-
-    tbot.log.message("Adding hooks to $PATH ...")
-    oldpath = bh.env("PATH")
-    bh.env("PATH", f"{hookdir.at_host(bh)}:{oldpath}")
+    fifo_paths = {
+        fifoname: hookdir / fifoname
+        for fifoname in ["fifo_console_send", "fifo_console_recv", "fifo_commands"]
+    }
+    fifos = {name: fifo.at_host(bh) for name, fifo in fifo_paths.items()}
+
+    tbot.log.message("Deploying FIFOs and hook scripts ...")
+    scripts = {name: script.format(**fifos) for name, script in HOOK_SCRIPTS.items()}
+    _deploy_hooks(bh, hookdir, scripts, list(fifo_paths.values()))
 
     tbot.log.message("Open console & command channels ...")
     chan_console = m_console.open_channel(hookdir / "tbot-console")
@@ -146,6 +113,7 @@ def testpy(
     uboot: Optional[tbot.role.BoardUBoot] = None,
     boardenv: Optional[str] = None,
     testpy_args: Optional[List[str]] = None,
+    relay: str = "auto",
 ) -> None:
     """
     Run U-Boot's test/py test-framework against a tbot-machine.
@@ -238,6 +206,13 @@ def testpy(
         test/py invocation.  For example, you can use ``["-k", "mmc"]`` to
         filter for mmc tests only.  Or ``["-v"]`` to show the names of all
         testcases as they are executed (or skipped).
+    :param str relay: How test/py's hooks talk to tbot.  ``"fifo"`` uses FIFOs
+        on the host where test/py runs, ``"socket"`` an in-process
+        :py:class:`tbot.tc.uboot.testpy.SocketRelay` with large buffers (only
+        possible when test/py runs on the local machine).  ``"auto"`` (the
+        default) picks ``"socket"`` whenever possible.
+
+        .. versionadded:: UNRELEASED
 
     .. versionadded:: 0.9.5
     """
@@ -259,9 +234,13 @@ def testpy(
         # Spawn a subshell to not mess up the parent shell's environment and PWD
         cx.enter_context(bh.subshell())
 
-        m_console: BH = cx.enter_context(bh.clone())  # type: ignore
-        m_command: BH = cx.enter_context(bh.clone())  # type: ignore
-        chan_console, chan_command = setup_testhooks(bh, m_console, m_command)
+        relay = _pick_relay(bh, relay)
+        if relay == "socket":
+            socket_relay = cx.enter_context(setup_socket_testhooks(bh))
+        else:
+            m_console: BH = cx.enter_context(bh.clone())  # type: ignore
+            m_command: BH = cx.enter_context(bh.clone())  # type: ignore
+            chan_console, chan_command = setup_testhooks(bh, m_console, m_command)
 
         assert (
             uboot_sources / ".config"
@@ -311,16 +290,21 @@ def testpy(
             )
         )
 
-        # We have to deal with incoming data on any of the following channels.
-        # The comments denote what needs to be done for each channel:
-        readfds = [
-            chan_console,  # Send data to U-Boot
-            chan_uboot,  # Send data to chan_console (test/py)
-            chan_command,  # Powercycle the board
-            chan_testpy,  # Read data so the log-event picks it up
-        ]
-
         try:
+            if relay == "socket":
+                socket_relay.run(chan_uboot, chan_testpy, b.powercycle)
+                return
+
+            # We have to deal with incoming data on any of the following
+            # channels.  The comments denote what needs to be done for each
+            # channel:
+            readfds = [
+                chan_console,  # Send data to U-Boot
+                chan_uboot,  # Send data to chan_console (test/py)
+                chan_command,  # Powercycle the board
+                chan_testpy,  # Read data so the log-event picks it up
+            ]
+
             while True:
                 r, _, _ = select.select(readfds, [], [])
 
@@ -337,10 +321,7 @@ def testpy(
                     msg = chan_command.read()
 
                     if msg[:2] == b"RE":
-                        b.poweroff()
-                        if b.powercycle_delay > 0:
-                            time.sleep(b.powercycle_delay)
-                        b.poweron()
+                        b.powercycle()
                     else:
                         raise Exception(f"Got unknown command {msg!r}!")
                 if chan_testpy in r: